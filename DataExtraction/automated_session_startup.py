@@ -2,18 +2,71 @@ from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 import keyboard
 import json
+import os
 import time
  #from Environment.send_key_inputs import press_button
 
+# extra speed-up on top of GAME_SPEED in turbo mode (scene clock, tweens and sprite animations)
+TURBO_TIME_SCALE = 4.0
 
-def setup_driver():
-    """Launches browser and injects save/settings."""
-    print("--- Launching PokeRogue Environment ---")
-    # Headless (optional)
-    options = Options()
-    # options.add_argument("--headless")
+# Turbo: Phaser-Uhren schneller laufen lassen und das Zeichnen der Szenen abschalten, die Spiellogik läuft weiter
+JS_APPLY_TURBO = """
+    const timeScale = arguments[0];
+    const scene = window.globalScene;
+    if (!scene) {
+        return false;
+    }
+    scene.time.timeScale = timeScale;
+    scene.tweens.timeScale = timeScale;
+    if (scene.anims) {
+        scene.anims.globalTimeScale = timeScale;
+    }
+    const game = scene.game;
+    if (game && game.scene && !game.__turboRenderingOff) {
+        game.scene.render = () => {};
+        game.__turboRenderingOff = true;
+    }
+    return true;
+"""
+
+
+def apply_turbo(driver, time_scale: float = TURBO_TIME_SCALE) -> bool:
+    """
+    Speeds up the running game beyond the settings menu and stops canvas rendering. Has to be repeated after a page reload.
+    :return: False if the game scene was not there yet
+    """
+    return bool(driver.execute_script(JS_APPLY_TURBO, time_scale))
 
-    driver = webdriver.Firefox(options=options)
+
+def setup_driver(profile_dir: str = None, turbo: bool = False, time_scale: float = TURBO_TIME_SCALE, backend: str = "selenium",
+                 worker_id: int = 0):
+    """
+    Launches browser and injects save/settings.
+    :param profile_dir: own firefox profile folder (e.g. one per env worker), so every browser keeps its own localStorage save
+    :param turbo: headless browser, faster game clock and no rendering (see apply_turbo)
+    :param time_scale: clock multiplier for turbo mode
+    :param backend: "selenium" (firefox via geckodriver) or "cdp" (chrome via one DevTools websocket, see Environment/browser_driver.py)
+    :param worker_id: index in an env pool, the cdp backend debugs on CDP_BASE_PORT + worker_id with its own profile
+    """
+    print("--- Launching PokeRogue Environment ---")
+    if backend == "cdp":
+        from Environment.browser_driver import CDP_BASE_PORT, CDPError, launch_chrome
+        driver = launch_chrome(port=CDP_BASE_PORT + worker_id, profile_dir=profile_dir or f"browser_profiles/cdp_{worker_id}", headless=turbo)
+        ignored_exceptions = (CDPError,)
+    elif backend == "selenium":
+        # Headless (optional)
+        options = Options()
+        # options.add_argument("--headless")
+        if turbo:
+            options.add_argument("--headless")
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            options.add_argument("-profile")
+            options.add_argument(os.path.abspath(profile_dir))
+        driver = webdriver.Firefox(options=options)
+        ignored_exceptions = None
+    else:
+        raise ValueError(f"Unbekanntes Backend: {backend}")
     driver.get("http://localhost:8000")
 
     settings = {"PLAYER_GENDER":0,"gameVersion":"1.11.3","MASTER_VOLUME":0,"LANGUAGE":0,"GAME_SPEED":7,"HP_BAR_SPEED":3,"EXP_GAINS_SPEED":3,"EXP_PARTY_DISPLAY":2,"SKIP_SEEN_DIALOGUES":1,"EGG_SKIP":2,"HIDE_IVS":1,"TUTORIALS":0,"VIBRATION":1,"MOVE_ANIMATIONS":0,"SHOW_LEVEL_UP_STATS":0,"SHOW_ARENA_FLYOUT":0,"SHOW_MOVESET_FLYOUT":0,"TIME_OF_DAY_ANIMATION":1,"TYPE_HINTS":1,"SHOW_BGM_BAR":0,"SHOP_OVERLAY_OPACITY":8,"ENABLE_RETRIES":0}
@@ -34,10 +87,12 @@ def setup_driver():
     driver.refresh()
 
     from selenium.webdriver.support.ui import WebDriverWait
-    WebDriverWait(driver, timeout=10).until(
+    WebDriverWait(driver, timeout=10, ignored_exceptions=ignored_exceptions).until(
         lambda d: d.execute_script("return typeof window.__GLOBAL_SCENE_DATA__ === 'function';")
     )
     time.sleep(2)
+    if turbo:
+        apply_turbo(driver, time_scale)
     return driver
 
 
@@ -3,13 +3,52 @@ import Embeddings.moves.compute_move_data as move_data
 import json
 
 
+def create_meta_data(dict) -> dict:
+    """meta_data of a scene, hp_values are filled in by the encoder"""
+    return {"phaseName": dict["phase"]["phaseName"], "phase_seq": dict["phase"].get("seq", 0), "stage": dict["metaData"]["waveIndex"],
+            "hp_values": {"enemies": {}, "players": {}}, "is_double_fight": dict["metaData"]["isDoubleFight"],
+            "shop_items": dict["shopItems"], "learn_move_phase": {"move_id": dict["phase"]["moveId"],
+                                                                  "member_move_count": len(dict["player"][dict["phase"]["partyMemberIndex"]]["moveset"])
+                                                                  if dict["phase"]["partyMemberIndex"] else False},
+            "action_mask": create_action_mask(dict), "second_pokemon_acts": pokemon_acts(dict, 1)}
+
+
+def pokemon_acts(dict, slot: int) -> bool:
+    """if party slot 0/1 gets a command this turn: slot 1 only in double fights, fainted pokemon don't act"""
+    party = dict["player"]
+    return slot < len(party) and party[slot]["hp"] > 0 and (slot == 0 or bool(dict["metaData"]["isDoubleFight"]))
+
+
+def create_action_mask(dict) -> list:
+    """
+    Valid actions of the MultiDiscrete([4, 2, 4, 2]) action space as 12 bools
+    [P1 moves 0-3, P1 targets 0-1, P2 moves 0-3, P2 targets 0-1], in the format of sb3_contrib's MaskablePPO.
+    A head that is not used (no target selection in single fights, no second pokemon) only allows 0,
+    every head keeps at least one valid action.
+    """
+    enemies = dict["enemy"]
+    targets = [bool(dict["metaData"]["isDoubleFight"]) and slot < len(enemies) and enemies[slot]["hp"] > 0 for slot in range(2)]
+    if not any(targets):
+        targets = [True, False]
+    unused_moves = [True, False, False, False]
+    unused_targets = [True, False]
+
+    mask = []
+    for slot in range(2):
+        if pokemon_acts(dict, slot):
+            moveset = dict["player"][slot]["moveset"]
+            # pp is False if the page does not send it
+            moves = [move_slot < len(moveset) and (moveset[move_slot].get("pp", False) is False or moveset[move_slot]["pp"] > 0)
+                     for move_slot in range(4)]
+            mask += (moves if any(moves) else unused_moves) + targets  # no pp left at all -> Struggle via the first slot
+        else:
+            mask += unused_moves + unused_targets
+    return mask
+
+
 def create_input_vector(dict, pokemon_embeddings_data: dict, move_embeddings_data: dict) -> tuple:
     input_vector = []
-    meta_data = {"phaseName": dict["phase"]["phaseName"], "stage": dict["metaData"]["waveIndex"],
-                 "hp_values": {"enemies": {}, "players": {}}, "is_double_fight": dict["metaData"]["isDoubleFight"],
-                 "shop_items": dict["shopItems"], "learn_move_phase": {"move_id": dict["phase"]["moveId"],
-                                                                       "member_move_count": len(dict["player"][dict["phase"]["partyMemberIndex"]]["moveset"])
-                                                                       if dict["phase"]["partyMemberIndex"] else False}}
+    meta_data = create_meta_data(dict)
     for pkm in dict["enemy"]:
         pkm_embedding = pkm_data.get_pokemon_embedding(pkm["dex_nr"], pkm["formIndex"], pokemon_embeddings_data)
         current_hp = pkm["hp"] / pkm["stats"][0]
@@ -0,0 +1,356 @@
+"""
+Faster drop-in for create_input.create_input_vector.
+The embedding dicts are turned into dense float32 tables once, lookups are plain int indexing
+((dex, form) -> row, move_id -> row) and every call writes into the same preallocated 210-float buffer.
+With type_effectiveness=True the vector gets the 16 floats of Embeddings/type_effectiveness.py appended (226 floats).
+IdObservationEncoder writes the table rows instead of the embeddings (id layout of observation_schema, 82 floats).
+"""
+import array
+import json
+import time
+
+import numpy as np
+
+import DataExtraction.create_input as input_creator
+
+from DataExtraction.observation_schema import (ENEMY_SLOTS, ENEMY_SLOT_SIZE, ID_ENEMY_SLOT_SIZE, ID_PARTY_SLOT_SIZE, MOVE_EMBEDDING_SIZE,
+                                               MOVE_SLOTS, PARTY_SLOTS, PARTY_SLOT_SIZE, POKEMON_EMBEDDING_SIZE, obs_size, offset)
+
+# field offsets inside a slot, see observation_schema
+ENEMY_START = offset("enemies")
+PARTY_START = offset("party")
+HP = offset("party", 0, "hp") - PARTY_START  # same position in enemy slots
+STATS = offset("party", 0, "stats") - PARTY_START
+MOVES = offset("party", 0, "moves") - PARTY_START
+VISIBLE = offset("party", 0, "visible") - PARTY_START
+# same for the id layout
+ID_ENEMY_START = offset("enemies", ids=True)
+ID_PARTY_START = offset("party", ids=True)
+ID_HP = offset("party", 0, "hp", ids=True) - ID_PARTY_START
+ID_STATS = offset("party", 0, "stats", ids=True) - ID_PARTY_START
+ID_MOVES = offset("party", 0, "moves", ids=True) - ID_PARTY_START
+ID_VISIBLE = offset("party", 0, "visible", ids=True) - ID_PARTY_START
+
+
+class ObservationEncoder:
+    ids = False  # layout of observation_schema that encode writes
+
+    def __init__(self, pokemon_table: np.ndarray, pokemon_index: np.ndarray, move_table: np.ndarray, move_index: np.ndarray,
+                 type_effectiveness: bool = False):
+        """
+        :param pokemon_table: (rows, 8) pokemon embeddings
+        :param pokemon_index: [dex, form] -> row in pokemon_table, -1 = unknown pokemon
+        :param move_table: (rows, 4) move embeddings, row 0 is the zero vector for unknown moves
+        :param move_index: [move_id] -> row in move_table
+        :param type_effectiveness: append the effectiveness of the active pokemon's moves against both enemies
+        """
+        self.pokemon_table = pokemon_table
+        self.pokemon_index = pokemon_index
+        self.move_table = move_table
+        self.move_index = move_index
+        self.obs_size = obs_size(type_effectiveness, self.ids)
+        self._effectiveness_start = offset("effectiveness", ids=self.ids)
+        self.effectiveness = None
+        if type_effectiveness:
+            from Embeddings.type_effectiveness import TypeEffectiveness
+
+            self.effectiveness = TypeEffectiveness.for_encoder_tables(pokemon_index, move_index)
+            # list mirrors again: 16 scalar lookups per call are cheaper in python than one small numpy gather
+            self._effectiveness_table = self.effectiveness.padded_table.tolist()
+            self._pokemon_combinations = self.effectiveness.pokemon_combinations.tolist()
+            self._move_types = self.effectiveness.move_types.tolist()
+        # the vector is written into a float32 array.array, self.buffer is a numpy view on the same memory:
+        # slice copies between array.arrays are much cheaper than small numpy assignments and nothing is converted at the end
+        self._values = array.array("f", bytes(4 * self.obs_size))
+        self._zeros = array.array("f", bytes(4 * self.obs_size))
+        self.buffer = np.frombuffer(self._values, dtype=np.float32)
+        # python mirrors of the dense arrays, element access on them is much cheaper than on numpy scalars
+        # (dex, form) -> row as dict, a list mirror of the mostly empty dense index would cost megabytes per worker
+        self._pokemon_index = {(int(dex), int(form)): int(pokemon_index[dex, form]) for dex, form in zip(*np.nonzero(pokemon_index >= 0))}
+        self._move_index = move_index.tolist()
+        self._pokemon_rows = [array.array("f", row.tobytes()) for row in pokemon_table]
+        self._move_rows = [array.array("f", row.tobytes()) for row in move_table]
+
+    @classmethod
+    def from_embeddings(cls, pokemon_embeddings_data: dict, move_embeddings_data: dict, **kwargs):
+        """Builds the dense tables from the dicts of pokemon_embeddings.json and move_embeddings.json"""
+        pokemon_keys = [tuple(int(part) for part in key.split("-")) for key in pokemon_embeddings_data.keys()]
+        pokemon_table = np.array(list(pokemon_embeddings_data.values()), dtype=np.float32)
+        pokemon_index = np.full((max(dex for dex, _ in pokemon_keys) + 1, max(form for _, form in pokemon_keys) + 1), -1, dtype=np.int32)
+        for row, (dex, form) in enumerate(pokemon_keys):
+            pokemon_index[dex, form] = row
+
+        move_ids = [int(move_id) for move_id in move_embeddings_data.keys()]
+        move_table = np.zeros((len(move_ids) + 1, MOVE_EMBEDDING_SIZE), dtype=np.float32)
+        move_table[1:] = np.array(list(move_embeddings_data.values()), dtype=np.float32)
+        move_index = np.zeros(max(move_ids) + 1, dtype=np.int32)
+        move_index[move_ids] = np.arange(1, len(move_ids) + 1)
+        return cls(pokemon_table, pokemon_index, move_table, move_index, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """Uses the (memory-mapped) tables of an Embeddings.embedding_store.EmbeddingStore, its move row 0 is already the zero row"""
+        return cls(store.pokemon_table, store.pokemon_index, store.move_table, store.move_index, **kwargs)
+
+    def pokemon_row(self, dex: int, form_index: int) -> int:
+        try:
+            return self._pokemon_index[dex, form_index]
+        except KeyError:
+            raise KeyError(f"{dex}-{form_index}")  # same as get_pokemon_embedding
+
+    def move_row(self, move_id: int) -> int:
+        try:
+            return self._move_index[move_id] if move_id >= 0 else 0
+        except (IndexError, TypeError):
+            return 0  # zero vector, same as get_move_embedding
+
+    def cache_stats(self) -> dict:
+        return {}  # no cache, see IncrementalObservationEncoder
+
+    def _write_enemy_slot(self, values, offset: int, pkm: dict):
+        values[offset:offset + POKEMON_EMBEDDING_SIZE] = self._pokemon_rows[self.pokemon_row(pkm["dex_nr"], pkm["formIndex"])]
+
+    def _write_party_slot(self, values, offset: int, pkm: dict):
+        """everything of a party slot except hp and visible"""
+        values[offset:offset + POKEMON_EMBEDDING_SIZE] = self._pokemon_rows[self.pokemon_row(pkm["dex_nr"], pkm["formIndex"])]
+        stats = pkm["stats"]
+        stat_sum = sum(stats)
+        for stat_slot, value in enumerate(stats, offset + STATS):
+            values[stat_slot] = value / stat_sum
+        moveset = pkm["moveset"]
+        move_rows = self._move_rows
+        # same slot rule as create_input_vector: the last known move is left out
+        for move_slot in range(min(MOVE_SLOTS, len(moveset) - 1)):
+            move_offset = offset + MOVES + move_slot * MOVE_EMBEDDING_SIZE
+            values[move_offset:move_offset + MOVE_EMBEDDING_SIZE] = move_rows[self.move_row(moveset[move_slot]["id"])]
+
+    def _write_effectiveness(self, dict, meta_data: dict):
+        """
+        Effectiveness block: party slots 0 (and 1 in a double fight) x their first 4 moves x both enemy slots.
+        Unlike the move embeddings this uses all 4 moves, move k is what action k selects.
+        """
+        values = self._values
+        table = self._effectiveness_table
+        move_types = self._move_types
+        no_type = len(table) - 1
+        combinations = [self._pokemon_combinations[self.pokemon_row(pkm["dex_nr"], pkm["formIndex"])] for pkm in dict["enemy"][:ENEMY_SLOTS]]
+        combinations += [len(table[0]) - 1] * (ENEMY_SLOTS - len(combinations))
+        party = dict["player"][:2 if meta_data["is_double_fight"] else 1]
+        index = self._effectiveness_start
+        for slot in range(2):
+            moveset = party[slot]["moveset"] if slot < len(party) else ()
+            for move_slot in range(MOVE_SLOTS):
+                row = table[move_types[self.move_row(moveset[move_slot]["id"])] if move_slot < len(moveset) else no_type]
+                values[index] = row[combinations[0]]
+                values[index + 1] = row[combinations[1]]
+                index += 2
+
+    def _result(self, meta_data: dict, out: np.ndarray) -> tuple:
+        if out is not None:
+            out[:] = self.buffer
+            return out, meta_data
+        return self.buffer, meta_data
+
+    def encode(self, dict, out: np.ndarray = None) -> tuple:
+        """
+        Same (input_vector, meta_data) as create_input_vector for up to 2 enemies and 6 party members.
+        :param out: float32 array of obs_size to copy the result into, default is the encoder's own buffer
+                    (overwritten by the next call)
+        """
+        values = self._values
+        values[:] = self._zeros
+        meta_data = input_creator.create_meta_data(dict)
+
+        enemy_hp = meta_data["hp_values"]["enemies"]
+        for slot, pkm in enumerate(dict["enemy"][:ENEMY_SLOTS]):
+            offset = ENEMY_START + slot * ENEMY_SLOT_SIZE
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            enemy_hp[pkm["id"]] = current_hp
+            self._write_enemy_slot(values, offset, pkm)
+            values[offset + HP] = current_hp
+
+        player_hp = meta_data["hp_values"]["players"]
+        for slot, pkm in enumerate(dict["player"][:PARTY_SLOTS]):
+            offset = PARTY_START + slot * PARTY_SLOT_SIZE
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            player_hp[pkm["id"]] = current_hp
+            self._write_party_slot(values, offset, pkm)
+            values[offset + HP] = current_hp
+            values[offset + VISIBLE] = 1.0 if pkm["visible"] else 0.0
+
+        if self.effectiveness is not None:
+            self._write_effectiveness(dict, meta_data)
+        return self._result(meta_data, out)
+
+
+class IncrementalObservationEncoder(ObservationEncoder):
+    """
+    Keeps the vector of the previous call and only rewrites the slots whose stable inputs changed
+    (enemy: id, dex, form, stats; party: additionally the move ids). For unchanged slots only hp and visible are patched.
+    The output stays identical to ObservationEncoder.encode.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+        self.reset_cache()
+
+    def reset_cache(self):
+        self._enemy_keys = [None] * ENEMY_SLOTS
+        self._party_keys = [None] * PARTY_SLOTS
+        self._values[:] = self._zeros
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def encode(self, dict, out: np.ndarray = None) -> tuple:
+        values = self._values
+        zeros = self._zeros
+        meta_data = input_creator.create_meta_data(dict)
+
+        enemy_hp = meta_data["hp_values"]["enemies"]
+        enemies = dict["enemy"][:ENEMY_SLOTS]
+        for slot in range(ENEMY_SLOTS):
+            offset = ENEMY_START + slot * ENEMY_SLOT_SIZE
+            if slot >= len(enemies):
+                if self._enemy_keys[slot] is not None:
+                    values[offset:offset + ENEMY_SLOT_SIZE] = zeros[:ENEMY_SLOT_SIZE]
+                    self._enemy_keys[slot] = None
+                continue
+            pkm = enemies[slot]
+            key = (pkm["id"], pkm["dex_nr"], pkm["formIndex"], tuple(pkm["stats"]))
+            if key == self._enemy_keys[slot]:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._enemy_keys[slot] = None  # in case the lookup raises
+                self._write_enemy_slot(values, offset, pkm)
+                self._enemy_keys[slot] = key
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            enemy_hp[pkm["id"]] = current_hp
+            values[offset + HP] = current_hp
+
+        player_hp = meta_data["hp_values"]["players"]
+        party = dict["player"][:PARTY_SLOTS]
+        for slot in range(PARTY_SLOTS):
+            offset = PARTY_START + slot * PARTY_SLOT_SIZE
+            if slot >= len(party):
+                if self._party_keys[slot] is not None:
+                    values[offset:offset + PARTY_SLOT_SIZE] = zeros[:PARTY_SLOT_SIZE]
+                    self._party_keys[slot] = None
+                continue
+            pkm = party[slot]
+            key = (pkm["id"], pkm["dex_nr"], pkm["formIndex"], tuple(pkm["stats"]), tuple(move["id"] for move in pkm["moveset"]))
+            if key == self._party_keys[slot]:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._party_keys[slot] = None
+                values[offset:offset + PARTY_SLOT_SIZE] = zeros[:PARTY_SLOT_SIZE]  # fewer moves than before
+                self._write_party_slot(values, offset, pkm)
+                self._party_keys[slot] = key
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            player_hp[pkm["id"]] = current_hp
+            values[offset + HP] = current_hp
+            values[offset + VISIBLE] = 1.0 if pkm["visible"] else 0.0
+
+        if self.effectiveness is not None:
+            self._write_effectiveness(dict, meta_data)
+        return self._result(meta_data, out)
+
+
+class IdObservationEncoder(ObservationEncoder):
+    """
+    Same slots as ObservationEncoder, but with the rows of the embedding tables instead of the embeddings:
+    pokemon row + 1 (0 = empty slot) and move row (0 = no/unknown move). The embedding lookup happens in the policy,
+    see Environment/v2PLUS/embedding_features.py, which gets the tables this encoder indexes.
+    """
+    ids = True
+
+    def encode(self, dict, out: np.ndarray = None) -> tuple:
+        values = self._values
+        values[:] = self._zeros
+        meta_data = input_creator.create_meta_data(dict)
+
+        enemy_hp = meta_data["hp_values"]["enemies"]
+        for slot, pkm in enumerate(dict["enemy"][:ENEMY_SLOTS]):
+            offset = ID_ENEMY_START + slot * ID_ENEMY_SLOT_SIZE
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            enemy_hp[pkm["id"]] = current_hp
+            values[offset] = self.pokemon_row(pkm["dex_nr"], pkm["formIndex"]) + 1
+            values[offset + ID_HP] = current_hp
+
+        player_hp = meta_data["hp_values"]["players"]
+        for slot, pkm in enumerate(dict["player"][:PARTY_SLOTS]):
+            offset = ID_PARTY_START + slot * ID_PARTY_SLOT_SIZE
+            current_hp = pkm["hp"] / pkm["stats"][0]
+            player_hp[pkm["id"]] = current_hp
+            values[offset] = self.pokemon_row(pkm["dex_nr"], pkm["formIndex"]) + 1
+            values[offset + ID_HP] = current_hp
+            stats = pkm["stats"]
+            stat_sum = sum(stats)
+            for stat_slot, value in enumerate(stats, offset + ID_STATS):
+                values[stat_slot] = value / stat_sum
+            moveset = pkm["moveset"]
+            # same slot rule as create_input_vector: the last known move is left out
+            for move_slot in range(min(MOVE_SLOTS, len(moveset) - 1)):
+                values[offset + ID_MOVES + move_slot] = self.move_row(moveset[move_slot]["id"])
+            values[offset + ID_VISIBLE] = 1.0 if pkm["visible"] else 0.0
+
+        if self.effectiveness is not None:
+            self._write_effectiveness(dict, meta_data)
+        return self._result(meta_data, out)
+
+
+def benchmark(pokemon_embeddings_data: dict, move_embeddings_data: dict, scene: dict, n: int = 10000) -> dict:
+    """Per-call time of create_input_vector (+ float32 conversion like the env does) vs. ObservationEncoder.encode"""
+    encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data)
+    results = dict()
+
+    start = time.perf_counter()
+    for _ in range(n):
+        input_vector, _ = input_creator.create_input_vector(scene, pokemon_embeddings_data, move_embeddings_data)
+        np.array(input_vector, dtype=np.float32)
+    results["create_input_vector"] = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    for _ in range(n):
+        encoder.encode(scene)
+    results["ObservationEncoder"] = (time.perf_counter() - start) / n * 1e6
+
+    incremental = IncrementalObservationEncoder(encoder.pokemon_table, encoder.pokemon_index, encoder.move_table, encoder.move_index)
+    start = time.perf_counter()
+    for _ in range(n):
+        incremental.encode(scene)
+    results["Incremental"] = (time.perf_counter() - start) / n * 1e6
+
+    for name, micro_seconds in results.items():
+        print(f"{name:>20}: {micro_seconds:.1f} µs per call")
+    print(f"speed-up: {results['create_input_vector'] / results['ObservationEncoder']:.1f}x | "
+          f"incremental: {results['create_input_vector'] / results['Incremental']:.1f}x, {incremental.cache_stats()}")
+    return results
+
+
+SAMPLE_SCENE = {
+    "phase": {"phaseName": "CommandPhase", "moveId": False, "partyMemberIndex": False, "seq": 1},
+    "metaData": {"waveIndex": 3, "isDoubleFight": True},
+    "shopItems": [],
+    "enemy": [{"id": 11, "dex_nr": 263, "formIndex": 0, "hp": 14, "stats": [14, 5, 6, 6, 6, 8]},
+              {"id": 12, "dex_nr": 16, "formIndex": 0, "hp": 9, "stats": [15, 7, 6, 5, 5, 9]}],
+    "player": [{"id": 1, "dex_nr": 702, "formIndex": 0, "hp": 22, "moveset": [{"id": 39}, {"id": 609}, {"id": 33}, {"id": 586}], "stats": [22, 12, 11, 14, 13, 16], "visible": True},
+               {"id": 2, "dex_nr": 704, "formIndex": 0, "hp": 20, "moveset": [{"id": 33}, {"id": 71}, {"id": 55}, {"id": 692}], "stats": [20, 11, 10, 10, 14, 10], "visible": True},
+               {"id": 3, "dex_nr": 434, "formIndex": 0, "hp": 22, "moveset": [{"id": 10}, {"id": 139}, {"id": 364}, {"id": 845}], "stats": [22, 12, 13, 9, 10, 13], "visible": False},
+               {"id": 4, "dex_nr": 921, "formIndex": 0, "hp": 20, "moveset": [{"id": 10}, {"id": 45}, {"id": 84}, {"id": 409}], "stats": [20, 13, 7, 10, 8, 12], "visible": False},
+               {"id": 5, "dex_nr": 211, "formIndex": 0, "hp": 0, "moveset": [{"id": 33}, {"id": 40}], "stats": [23, 17, 12, 12, 12, 14], "visible": False},
+               {"id": 6, "dex_nr": 165, "formIndex": 0, "hp": 20, "moveset": [{"id": 33}, {"id": 48}, {"id": 676}, {"id": 575}], "stats": [20, 9, 8, 10, 14, 11], "visible": False}],
+}
+
+
+if __name__ == "__main__":
+    with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+        pokemon_embeddings_data = json.loads(f.read())
+    with open("Embeddings/moves/move_embeddings.json", "r") as f:
+        move_embeddings_data = json.loads(f.read())
+    benchmark(pokemon_embeddings_data, move_embeddings_data, SAMPLE_SCENE)
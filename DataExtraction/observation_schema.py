@@ -0,0 +1,142 @@
+"""
+Layout of the observation vector of create_input.create_input_vector / ObservationEncoder, declared once.
+Everything else (numpy structured dtype, gym Box, offsets, named views) is generated from SLOTS.
+
+    view = observation_view(obs)          # no copy, obs stays a plain float32 array for SB3
+    view["enemies"]["hp"]                 # shape (2,), or (batch, 2) for a batch of observations
+    view["party"]["moves"][0, 1]          # move embedding of move slot 1 of party member 0
+
+With ids=True the same slots carry integer ids (stored as floats) instead of the embeddings, the embedding lookup
+happens in the policy (Environment/v2PLUS/embedding_features.py). 82 instead of 210 floats per observation.
+"""
+import numpy as np
+
+POKEMON_EMBEDDING_SIZE = 8
+MOVE_EMBEDDING_SIZE = 4
+MOVE_SLOTS = 4
+STAT_COUNT = 6  # hp, atk, def, spatk, spdef, speed
+
+# (field, shape) in the order they appear in the vector
+ENEMY_FIELDS = [("embedding", (POKEMON_EMBEDDING_SIZE,)), ("hp", ())]
+PARTY_FIELDS = [("embedding", (POKEMON_EMBEDDING_SIZE,)), ("hp", ()), ("stats", (STAT_COUNT,)),
+                ("moves", (MOVE_SLOTS, MOVE_EMBEDDING_SIZE)), ("visible", ())]
+# (segment, fields, number of slots)
+SLOTS = [("enemies", ENEMY_FIELDS, 2), ("party", PARTY_FIELDS, 6)]
+# optional, appended after SLOTS: type effectiveness multiplier of the moves of the two active party members
+# against both enemy slots (Embeddings/type_effectiveness.py)
+EFFECTIVENESS_SLOTS = [("effectiveness", [("moves", (MOVE_SLOTS, 2))], 2)]
+
+# id layout: "pokemon" = row in the pokemon embedding table + 1 (0 = empty slot), "moves" = row in the move table (0 = no/unknown move)
+ID_ENEMY_FIELDS = [("pokemon", ()), ("hp", ())]
+ID_PARTY_FIELDS = [("pokemon", ()), ("hp", ()), ("stats", (STAT_COUNT,)), ("moves", (MOVE_SLOTS,)), ("visible", ())]
+ID_SLOTS = [("enemies", ID_ENEMY_FIELDS, 2), ("party", ID_PARTY_FIELDS, 6)]
+ID_FIELDS = ["pokemon", "moves"]
+ID_HIGH = 2 ** 16  # observation space bound of the id fields
+
+
+def _slot_dtype(fields: list) -> np.dtype:
+    return np.dtype([(name, np.float32, shape) for name, shape in fields])
+
+
+ENEMY_DTYPE = _slot_dtype(ENEMY_FIELDS)
+PARTY_DTYPE = _slot_dtype(PARTY_FIELDS)
+
+
+def observation_dtype(type_effectiveness: bool = False, ids: bool = False) -> np.dtype:
+    slots = ID_SLOTS if ids else SLOTS
+    if type_effectiveness:
+        slots = slots + EFFECTIVENESS_SLOTS
+    return np.dtype([(segment, _slot_dtype(fields), (count,)) for segment, fields, count in slots])
+
+
+OBSERVATION_DTYPE = observation_dtype()
+EFFECTIVENESS_OBSERVATION_DTYPE = observation_dtype(type_effectiveness=True)
+ID_OBSERVATION_DTYPE = observation_dtype(ids=True)
+ID_EFFECTIVENESS_OBSERVATION_DTYPE = observation_dtype(type_effectiveness=True, ids=True)
+
+ENEMY_SLOTS = OBSERVATION_DTYPE["enemies"].shape[0]
+PARTY_SLOTS = OBSERVATION_DTYPE["party"].shape[0]
+ENEMY_SLOT_SIZE = ENEMY_DTYPE.itemsize // 4
+PARTY_SLOT_SIZE = PARTY_DTYPE.itemsize // 4
+OBS_SIZE = OBSERVATION_DTYPE.itemsize // 4
+EFFECTIVENESS_OBS_SIZE = EFFECTIVENESS_OBSERVATION_DTYPE.itemsize // 4
+ID_ENEMY_SLOT_SIZE = ID_OBSERVATION_DTYPE["enemies"].base.itemsize // 4
+ID_PARTY_SLOT_SIZE = ID_OBSERVATION_DTYPE["party"].base.itemsize // 4
+ID_OBS_SIZE = ID_OBSERVATION_DTYPE.itemsize // 4
+ID_EFFECTIVENESS_OBS_SIZE = ID_EFFECTIVENESS_OBSERVATION_DTYPE.itemsize // 4
+
+_DTYPES = {OBS_SIZE: OBSERVATION_DTYPE, EFFECTIVENESS_OBS_SIZE: EFFECTIVENESS_OBSERVATION_DTYPE,
+           ID_OBS_SIZE: ID_OBSERVATION_DTYPE, ID_EFFECTIVENESS_OBS_SIZE: ID_EFFECTIVENESS_OBSERVATION_DTYPE}
+
+
+def obs_size(type_effectiveness: bool = False, ids: bool = False) -> int:
+    return observation_dtype(type_effectiveness, ids).itemsize // 4
+
+
+def offset(segment: str, slot: int = 0, field: str = None, ids: bool = False) -> int:
+    """
+    Float index in the flat vector, e.g. offset("party", 1, "hp") == 58.
+    :param field: None = start of the slot
+    :param ids: offset in the id layout
+    """
+    # the optional segments come after the base ones, so the extended dtype has the same offsets for everything else
+    dtype = ID_EFFECTIVENESS_OBSERVATION_DTYPE if ids else EFFECTIVENESS_OBSERVATION_DTYPE
+    segment_offset = dtype.fields[segment][1] // 4
+    slot_dtype = dtype[segment].base
+    index = segment_offset + slot * slot_dtype.itemsize // 4
+    if field is not None:
+        index += slot_dtype.fields[field][1] // 4
+    return index
+
+
+def observation_view(obs: np.ndarray) -> np.ndarray:
+    """
+    Named view on one observation (shape (OBS_SIZE,)) or a batch (shape (..., OBS_SIZE)), shares the memory of obs.
+    Writing into the view writes into obs. Observations with the effectiveness block also have view["effectiveness"].
+    The layout (embeddings or ids, with or without effectiveness) is told apart by the size of the last axis.
+    """
+    if obs.dtype != np.float32 or obs.shape[-1] not in _DTYPES:
+        raise ValueError(f"Expected float32 observations with {' / '.join(str(size) for size in _DTYPES)} values in the last axis, "
+                         f"got {obs.dtype} {obs.shape}")
+    return obs.view(_DTYPES[obs.shape[-1]])[..., 0]
+
+
+def enemy_hp(obs: np.ndarray) -> np.ndarray:
+    """hp ratio of both enemy slots, 0 for empty slots"""
+    return observation_view(obs)["enemies"]["hp"]
+
+
+def party_hp(obs: np.ndarray) -> np.ndarray:
+    """hp ratio of all 6 party slots, the first two are the active ones in a double fight"""
+    return observation_view(obs)["party"]["hp"]
+
+
+def id_columns(field: str, type_effectiveness: bool = False) -> np.ndarray:
+    """flat indices of an id field ("pokemon" or "moves") over all slots of the id layout"""
+    columns = np.arange(obs_size(type_effectiveness, ids=True), dtype=np.float32)
+    view = observation_view(columns)
+    return np.concatenate([view[segment][field].reshape(-1) for segment in ("enemies", "party") if field in view[segment].dtype.names]).astype(np.int64)
+
+
+def observation_space(low: float = -100, high: float = 100, type_effectiveness: bool = False, ids: bool = False):
+    """gym Box of the flat vector, as used by the envs"""
+    from gymnasium import spaces
+
+    if not ids:
+        return spaces.Box(low=low, high=high, shape=(obs_size(type_effectiveness),), dtype=np.float32)
+    lows = np.full(obs_size(type_effectiveness, ids=True), low, dtype=np.float32)
+    highs = np.full(obs_size(type_effectiveness, ids=True), high, dtype=np.float32)
+    for field in ID_FIELDS:
+        lows[id_columns(field, type_effectiveness)] = 0
+        highs[id_columns(field, type_effectiveness)] = ID_HIGH
+    return spaces.Box(low=lows, high=highs, dtype=np.float32)
+
+
+if __name__ == "__main__":
+    for ids, slots in ((False, SLOTS), (True, ID_SLOTS)):
+        print("ids:" if ids else "embeddings:")
+        for segment, fields, count in slots + EFFECTIVENESS_SLOTS:
+            for slot in range(count):
+                print(f"  {segment}[{slot}]: " + ", ".join(f"{name}@{offset(segment, slot, name, ids)}" for name, _ in fields))
+    print(f"OBS_SIZE = {OBS_SIZE}, with type effectiveness {EFFECTIVENESS_OBS_SIZE}")
+    print(f"ID_OBS_SIZE = {ID_OBS_SIZE}, with type effectiveness {ID_EFFECTIVENESS_OBS_SIZE}")
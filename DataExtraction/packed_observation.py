@@ -0,0 +1,46 @@
+"""
+Python side of __GLOBAL_SCENE_PACKED__ (DataExtraction/v3/global-scene.ts).
+The page builds the 210 floats of create_input.create_input_vector itself and only sends the raw float32 bytes
+(base64) plus a tiny header, instead of the whole nested scene dict.
+"""
+import base64
+
+import numpy as np
+
+import settings
+from DataExtraction.observation_schema import OBS_SIZE
+from Environment.v2PLUS.phaseManagerSkippy import phases_skip_logic
+
+# phase name -> phaseId in the packed header, -1 = phase not in this list
+PHASE_NAMES = sorted(set(settings.phases["nothing_to_do"] + settings.phases["skip_information"] + settings.phases["complicated"]
+                         + list(phases_skip_logic.keys())))
+
+
+def install_embedding_tables(driver, pokemon_embeddings_data: dict, move_embeddings_data: dict) -> int:
+    """
+    Sends the embedding tables to the page once, __GLOBAL_SCENE_PACKED__ needs them to build the vector in-page.
+    Has to be repeated after a page reload.
+    :return: number of floats the page will pack
+    """
+    tables = {"pokemon": pokemon_embeddings_data, "moves": move_embeddings_data, "phases": PHASE_NAMES}
+    packed_size = driver.execute_script("return window.__SET_EMBEDDING_TABLES__(arguments[0]);", tables)
+    if packed_size != OBS_SIZE:
+        raise ValueError(f"Page packs {packed_size} floats, expected {OBS_SIZE}")
+    return packed_size
+
+
+def decode_packed_observation(packed: dict) -> tuple:
+    """
+    :param packed: return value of __GLOBAL_SCENE_PACKED__
+    :return: (read-only float32 view on the decoded bytes, no copy; header dict)
+    """
+    obs = np.frombuffer(base64.b64decode(packed["obs"]), dtype="<f4")
+    phase_id = packed["phaseId"]
+    header = {"phaseName": PHASE_NAMES[phase_id] if phase_id >= 0 else "UNKNOWN", "phase_id": phase_id,
+              "phase_seq": packed["phaseSeq"], "stage": packed["waveIndex"], "is_double_fight": packed["isDoubleFight"]}
+    return obs, header
+
+
+def get_packed_obs(driver) -> tuple:
+    """Fetches and decodes one packed observation, see decode_packed_observation."""
+    return decode_packed_observation(driver.execute_script("return window.__GLOBAL_SCENE_PACKED__();"))
@@ -7,40 +7,203 @@ export function initGlobalScene(scene: BattleScene): void {
   window.globalScene = globalScene;
 
   function serializePartyPokemon(p) {
+    if (!p) return false;
     return {
-      formIndex: p.formIndex,
-      dex_nr: p.species?.speciesId,
-      hp: p.hp,
-      stats: p.stats,
-      visible: p._visible,
-      moveset: p.moveset?.map(m => ({
-        id: m.moveId,
-      })),
-      level: p.level,
-      luck: p.luck,
-      isTerastallized: p.isTerastallized,
-      nature: p.nature,
-      passive: p.passive,
-      abilityIndex: p.abilityIndex,
-      gender: p.gender,
-      ivs: p.ivs,
-      teraType: p.teraType,
+      formIndex: p.formIndex ?? false,
+      dex_nr: p.species?.speciesId ?? false,
+      hp: p.hp ?? false,
+      stats: p.stats ?? false,
+      id: p.id ?? false,
+      visible: p._visible ?? false,
+      moveset: p.moveset
+        ? p.moveset.map(m => ({
+            id: m?.moveId ?? false,
+            pp: m ? m.getMovePp() - m.ppUsed : false,
+          }))
+        : [],
+      level: p.level ?? false,
+      luck: p.luck ?? false,
+      isTerastallized: p.isTerastallized ?? false,
+      nature: p.nature ?? false,
+      passive: p.passive ?? false,
+      abilityIndex: p.abilityIndex ?? false,
+      gender: p.gender ?? false,
+      ivs: p.ivs ?? false,
+      teraType: p.teraType ?? false,
     };
   }
 
   function serializeEnemyPokemon(p) {
+    if (!p) return false;
     return {
-      formIndex: p.formIndex,
-      dex_nr: p.species?.speciesId,
-      hp: p.hp,
-      stats: p.stats,
-      luck: p.luck,
+      formIndex: p.formIndex ?? false,
+      dex_nr: p.species?.speciesId ?? false,
+      hp: p.hp ?? false,
+      stats: p.stats ?? false,
+      id: p.id ?? false,
+      luck: p.luck ?? false,
     };
   }
 
-  globalThis.__GLOBAL_SCENE_DATA__ = () => ({
-    player: scene.party.map(serializePartyPokemon),
-    enemy: scene.currentBattle.enemyParty.map(serializeEnemyPokemon)
-    phase: scene.phaseManager.currentPhase.phaseName
-  });
+  // --- phase tracking: every change of phaseManager.currentPhase gets a sequence number ---
+  const PHASE_LOG_SIZE = 64;
+  const phaseLog = [];  // ring buffer of the last transitions
+  const phaseWaiters = [];  // pending __WAIT_FOR_PHASE_CHANGE__ callbacks
+  let lastPhase = undefined;
+  let phaseSeq = 0;
+
+  function recordPhaseChange() {
+    const phase = scene?.phaseManager?.currentPhase;
+    // compare the phase object, so a new MessagePhase after a MessagePhase is a change as well
+    if (phase === lastPhase) return;
+    const entry = {
+      seq: ++phaseSeq,
+      from: lastPhase?.phaseName ?? false,
+      phaseName: phase?.phaseName ?? false,
+      time: performance.now(),
+    };
+    lastPhase = phase;
+    phaseLog.push(entry);
+    if (phaseLog.length > PHASE_LOG_SIZE) phaseLog.shift();
+    for (const waiter of phaseWaiters.splice(0)) {
+      if (entry.seq > waiter.since) waiter.resolve(entry);
+      else phaseWaiters.push(waiter);
+    }
+  }
+
+  // checked once per game frame, the phase manager has no event for phase starts
+  scene.events.on("postupdate", recordPhaseChange);
+
+  globalThis.__PHASE_LOG__ = (since = 0) => phaseLog.filter(entry => entry.seq > since);
+
+  globalThis.__WAIT_FOR_PHASE_CHANGE__ = (since, timeoutMs, callback) => {
+    recordPhaseChange();
+    const latest = phaseLog[phaseLog.length - 1];
+    if (latest && latest.seq > since) {
+      callback(latest);
+      return;
+    }
+    const waiter = { since: since, resolve: null };
+    const timer = setTimeout(() => {
+      const index = phaseWaiters.indexOf(waiter);
+      if (index >= 0) phaseWaiters.splice(index, 1);
+      callback(false);
+    }, timeoutMs);
+    waiter.resolve = entry => {
+      clearTimeout(timer);
+      callback(entry);
+    };
+    phaseWaiters.push(waiter);
+  };
+
+  function getPhaseData() {
+    const phase = scene?.phaseManager?.currentPhase;
+    recordPhaseChange();
+    return {
+      phaseName: phase?.phaseName ?? false,
+      moveId: phase?.moveId ?? false,
+      partyMemberIndex: phase?.partyMemberIndex ?? false,
+      seq: phaseSeq,
+    };
+  }
+
+  function getMetaData() {
+    const battle = scene?.currentBattle;
+    return {
+      waveIndex: battle?.waveIndex ?? false,
+      isDoubleFight: battle?.double ?? false,
+    };
+  }
+
+  globalThis.__GLOBAL_SCENE_DATA__ = () => {
+    const battle = scene?.currentBattle;
+
+    return {
+      player: scene?.party?.length
+        ? scene.party.map(serializePartyPokemon)
+        : [],
+
+      enemy: battle?.enemyParty?.length
+        ? battle.enemyParty.map(serializeEnemyPokemon)
+        : [],
+
+      phase: getPhaseData(),
+
+      metaData: getMetaData(),
+
+      shopItems:
+        scene?.phaseManager?.currentPhase?.typeOptions?.map(option => ({
+          id: option?.type?.id ?? false,
+          tier: option?.type?.tier ?? false,
+        })) ?? [],
+    };
+  };
+
+  // --- packed observation: same 210 floats as create_input.create_input_vector, built in the page ---
+  const ENEMY_SLOTS = 2;
+  const ENEMY_SLOT_SIZE = 9;  // embedding 8 + hp
+  const PARTY_SLOTS = 6;
+  const PARTY_SLOT_SIZE = 32;  // embedding 8 + hp + stats 6 + moves 4x4 + visible
+  const PACKED_SIZE = ENEMY_SLOTS * ENEMY_SLOT_SIZE + PARTY_SLOTS * PARTY_SLOT_SIZE;
+  const packedObs = new Float32Array(PACKED_SIZE);
+  const packedBytes = new Uint8Array(packedObs.buffer);
+  let embeddingTables = null;
+
+  // injected once from python: { pokemon: {"dex-form": [8]}, moves: {moveId: [4]}, phases: [phaseName] }
+  globalThis.__SET_EMBEDDING_TABLES__ = tables => {
+    embeddingTables = {
+      pokemon: tables.pokemon,
+      moves: tables.moves,
+      phaseIds: Object.fromEntries(tables.phases.map((name, index) => [name, index])),
+    };
+    return PACKED_SIZE;
+  };
+
+  function writePokemonEmbedding(p, offset) {
+    const embedding = embeddingTables.pokemon[`${p.species?.speciesId}-${p.formIndex}`];
+    if (!embedding) throw new Error(`no embedding for ${p.species?.speciesId}-${p.formIndex}`);
+    packedObs.set(embedding, offset);
+  }
+
+  globalThis.__GLOBAL_SCENE_PACKED__ = () => {
+    if (!embeddingTables) throw new Error("call __SET_EMBEDDING_TABLES__ first");
+    const battle = scene?.currentBattle;
+    const phase = getPhaseData();
+    packedObs.fill(0);
+
+    const enemies = battle?.enemyParty ?? [];
+    enemies.slice(0, ENEMY_SLOTS).forEach((p, slot) => {
+      const offset = slot * ENEMY_SLOT_SIZE;
+      writePokemonEmbedding(p, offset);
+      packedObs[offset + 8] = p.hp / p.stats[0];
+    });
+
+    const party = scene?.party ?? [];
+    party.slice(0, PARTY_SLOTS).forEach((p, slot) => {
+      const offset = ENEMY_SLOTS * ENEMY_SLOT_SIZE + slot * PARTY_SLOT_SIZE;
+      writePokemonEmbedding(p, offset);
+      packedObs[offset + 8] = p.hp / p.stats[0];
+      const statSum = p.stats.reduce((a, b) => a + b, 0);
+      p.stats.forEach((value, index) => (packedObs[offset + 9 + index] = value / statSum));
+      const moveset = p.moveset ?? [];
+      for (let moveSlot = 0; moveSlot < 4; moveSlot++) {
+        // same slot rule as create_input_vector: the last known move is left out
+        if (moveSlot + 1 < moveset.length) {
+          const embedding = embeddingTables.moves[moveset[moveSlot]?.moveId];
+          if (embedding) packedObs.set(embedding, offset + 15 + moveSlot * 4);
+        }
+      }
+      packedObs[offset + 31] = p._visible ? 1.0 : 0.0;
+    });
+
+    let binary = "";
+    for (let i = 0; i < packedBytes.length; i++) binary += String.fromCharCode(packedBytes[i]);
+    return {
+      obs: btoa(binary),
+      phaseId: embeddingTables.phaseIds[phase.phaseName] ?? -1,
+      phaseSeq: phase.seq,
+      waveIndex: battle?.waveIndex ?? false,
+      isDoubleFight: battle?.double ?? false,
+    };
+  };
 }
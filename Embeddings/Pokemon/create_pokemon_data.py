@@ -1,52 +1,34 @@
-import re
-import ast
 import json
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import settings
+from Embeddings.Pokemon.pokedex_js import iter_pokedex_js, write_json
 
 
-def save_js_to_json():
-    input_file = "pokedex_data.js"
-    output_file = "pokedex_data.json"
-
-    with open(input_file, "r", encoding="utf-8") as f:
-        js = f.read()
-
-    # 1. Extrahiere das Array hinter "const items ="
-    array_text = re.search(r"const\s+items\s*=\s*(\[.*\]);?", js, re.DOTALL).group(1)
-
-    # 2. JS → Python-Dict-konvertierbar machen
-    #    a) Keys mit Anführungszeichen versehen
-    array_text = re.sub(r'(\w+):', r'"\1":', array_text)
-
-    # 3. In Python-Daten laden
-    py_data = ast.literal_eval(array_text)
+def save_js_to_json(input_file: str = "pokedex_data.js", output_file: str = "pokedex_data.json"):
+    # streamt Record für Record, die numerischen Keys werden schon beim Parsen verworfen
+    write_json(iter_pokedex_js(input_file), output_file, indent=2)
+    print("Konvertiert → gespeichert als", output_file)
 
-    # 4. Als JSON ausgeben
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(py_data, f, ensure_ascii=False, indent=2)
 
-    print("Konvertiert → gespeichert als", output_file)
+def without_numerical_keys(pokemon: dict) -> dict:
+    return {key: value for key, value in pokemon.items() if not str(key).isnumeric()}
 
 
-def delete_numerical_keys():
-    pokedex_data_cropped = list()
-    with open("pokedex_data.json", "r") as f:
+def delete_numerical_keys(path: str = "pokedex_data.json"):
+    """only needed for json files converted with the old literal_eval version of save_js_to_json"""
+    with open(path, "r") as f:
         data = json.loads(f.read())
-        for pokemon in data:
-            pokedex_data_cropped.append(dict())
-            for key in pokemon.keys():
-                if not key.isnumeric():
-                    pokedex_data_cropped[-1][key] = pokemon[key]
-    with open("pokedex_data.json", "w") as f:
+    pokedex_data_cropped = [without_numerical_keys(pokemon) for pokemon in data]
+    with open(path, "w") as f:
         f.write(json.dumps(pokedex_data_cropped))
 
 
-def create_pokemon_embeddings():
-    with open("pokedex_data.json", "r") as f:
-        pkm_data = json.loads(f.read())
-
+def pokemon_feature_vectors(pkm_data: list) -> tuple:
+    """
+    Feature vector and "dex-form" key of every pokedex record, the input of the scaler + PCA.
+    :return: (pkm_ids, pkm_data_list)
+    """
     pkm_data_list = []
     pkm_ids = []
     form_counter = 0
@@ -97,6 +79,14 @@ def create_pokemon_embeddings():
             new_key = str(pkm["dex"]) + "-" + str(form_counter)
         form_counter += 1
         pkm_ids.append(new_key)
+    return pkm_ids, pkm_data_list
+
+
+def create_pokemon_embeddings(input_file: str = "pokedex_data.json", output_file: str = "pokemon_embeddings.json"):
+    with open(input_file, "r") as f:
+        pkm_data = json.loads(f.read())
+
+    pkm_ids, pkm_data_list = pokemon_feature_vectors(pkm_data)
 
     scaler = StandardScaler()
     scaled_data = scaler.fit_transform(pkm_data_list)
@@ -108,7 +98,7 @@ def create_pokemon_embeddings():
     for index, move_id in enumerate(pkm_ids):
         move_embedding_dict[move_id] = move_embeddings[index].tolist()
 
-    with open("pokemon_embeddings.json", "w") as f:
+    with open(output_file, "w") as f:
         f.write(json.dumps(move_embedding_dict))
 
 
@@ -117,26 +107,32 @@ def get_pokemon_embedding(dex: int, form_index: int, embeddings_data: dict = Non
     return embeddings_data[pkm_key_name]
 
 
-def get_similar_pokemon_embeddings(dex: int, form_index: int, top_k: int = 5, embeddings_data: dict = None):
-    from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
+# (embeddings_data, PokemonEmbeddingIndex): keyed on the identity and length of the dict, not its values,
+# so hashing the embeddings does not cost as much as the query. Values changed in place are served stale,
+# pass a new dict (or call clear_index_cache) after changing embeddings.
+_index_cache = (None, None)
 
-    pkm_key_name = str(dex) + "-" + str(form_index)
 
-    target_embedding = np.array(embeddings_data[pkm_key_name]).reshape(1, -1)
-    all_embeddings = []
-    all_keys = []
-    for key, emb in embeddings_data.items():
-        if key != pkm_key_name:
-            all_embeddings.append(emb)
-            all_keys.append(key)
+def clear_index_cache():
+    global _index_cache
+    _index_cache = (None, None)
+
 
-    all_embeddings = np.array(all_embeddings)
-    similarities = cosine_similarity(target_embedding, all_embeddings).flatten()
-    top_indices = similarities.argsort()[-top_k:][::-1]
+def _get_index(embeddings_data: dict):
+    from Embeddings.Pokemon.embedding_index import PokemonEmbeddingIndex
 
-    similar_pokemons = [(all_keys[i], similarities[i]) for i in top_indices]
-    return similar_pokemons
+    global _index_cache
+    if _index_cache[0] is not embeddings_data or len(_index_cache[1].keys) != len(embeddings_data):
+        _index_cache = (embeddings_data, PokemonEmbeddingIndex.from_embeddings(embeddings_data))
+    return _index_cache[1]
+
+
+def get_similar_pokemon_embeddings(dex: int, form_index: int, top_k: int = 5, embeddings_data: dict = None):
+    """
+    :return: [(key, cosine similarity)] of the top_k most similar pokemon, for many queries use PokemonEmbeddingIndex.top_k
+    The index is cached per embeddings_data dict, see _index_cache.
+    """
+    return _get_index(embeddings_data).top_k([(dex, form_index)], k=top_k)[0]
 
 
 def get_distance_between_pokemon(dex1: int, form_index1: int, dex2: int, form_index2: int, embeddings_data: dict = None):
@@ -152,9 +148,18 @@ def get_distance_between_pokemon(dex1: int, form_index1: int, dex2: int, form_in
     return distance
 
 
+def get_distances_between_pokemon(pokemon1: list, pokemon2: list = None, embeddings_data: dict = None):
+    """
+    Bulk version of get_distance_between_pokemon.
+    :param pokemon1: (dex, form_index) tuples
+    :param pokemon2: (dex, form_index) tuples, None = pokemon1
+    :return: (len(pokemon1), len(pokemon2)) matrix of euclidean distances
+    """
+    return _get_index(embeddings_data).distances(pokemon1, pokemon2)
+
+
 if __name__ == "__main__":
     # save_js_to_json()
-    # delete_numerical_keys()
     # create_pokemon_embeddings()
     with open("pokemon_embeddings.json", "r") as f:
         embeddings_data = json.loads(f.read())
@@ -0,0 +1,117 @@
+"""
+k-NN index over the pokemon embeddings for similarity queries (team composition analysis, get_similar_pokemon_embeddings).
+The embeddings are normalized once, a batch of queries is one matrix product plus argpartition,
+instead of rebuilding the matrix from the dict and sorting all similarities for every single query.
+
+    index = PokemonEmbeddingIndex.load("Embeddings/Pokemon/pokemon_index.npz")
+    index.top_k([(6, 0), (25, 0)], k=10)     # [[("6-1", 0.99), ...], [...]]
+"""
+import json
+import time
+
+import numpy as np
+
+INDEX_PATH = "Embeddings/Pokemon/pokemon_index.npz"
+QUERY_CHUNK = 1024  # queries per matrix product, bounds the (queries, pokemon) similarity matrix
+
+
+def pokemon_key(key) -> str:
+    """(dex, form) or "dex-form" -> "dex-form", the key format of pokemon_embeddings.json"""
+    if isinstance(key, str):
+        return key
+    dex, form_index = key
+    return f"{dex}-{form_index}"
+
+
+class PokemonEmbeddingIndex:
+    def __init__(self, keys: list, embeddings: np.ndarray):
+        """
+        :param keys: "dex-form" per row
+        :param embeddings: (rows, 8) raw embeddings
+        """
+        self.keys = list(keys)
+        self.key_rows = {key: row for row, key in enumerate(self.keys)}
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        self.normalized = self.embeddings / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def from_embeddings(cls, embeddings_data: dict):
+        """:param embeddings_data: dict of pokemon_embeddings.json"""
+        return cls(embeddings_data.keys(), np.array(list(embeddings_data.values()), dtype=np.float32))
+
+    @classmethod
+    def from_store(cls, store):
+        """:param store: Embeddings.embedding_store.EmbeddingStore"""
+        return cls(store.index["tables"]["pokemon"]["keys"], store.pokemon_table)
+
+    def save(self, path: str = INDEX_PATH):
+        np.savez(path, keys=np.array(self.keys), embeddings=self.embeddings)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH):
+        with np.load(path) as data:
+            return cls(data["keys"].tolist(), data["embeddings"])
+
+    def rows(self, keys: list) -> np.ndarray:
+        """row of every (dex, form) / "dex-form" key, KeyError for unknown pokemon"""
+        return np.array([self.key_rows[pokemon_key(key)] for key in keys], dtype=np.int64)
+
+    def similarities(self, keys: list) -> np.ndarray:
+        """(queries, rows) cosine similarity of every query against every pokemon"""
+        return self.normalized[self.rows(keys)] @ self.normalized.T
+
+    def top_k(self, keys: list, k: int = 5, exclude_self: bool = True) -> list:
+        """
+        Most similar pokemon for many queries at once.
+        :param exclude_self: leave the queried pokemon itself out (other forms with the same embedding stay in)
+        :return: per query a list of (key, cosine similarity), most similar first
+        """
+        rows = self.rows(keys)
+        k = min(k, len(self.keys) - (1 if exclude_self else 0))
+        results = []
+        for start in range(0, len(rows), QUERY_CHUNK):
+            chunk = rows[start:start + QUERY_CHUNK]
+            similarities = self.normalized[chunk] @ self.normalized.T
+            if exclude_self:
+                similarities[np.arange(len(chunk)), chunk] = -np.inf
+            # k best unsorted in O(n), then only those k are sorted
+            best = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            best_similarities = np.take_along_axis(similarities, best, axis=1)
+            order = np.argsort(-best_similarities, axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_similarities = np.take_along_axis(best_similarities, order, axis=1)
+            results.extend([(self.keys[row], float(similarity)) for row, similarity in zip(query_rows, query_similarities)]
+                           for query_rows, query_similarities in zip(best.tolist(), best_similarities.tolist()))
+        return results
+
+    def distances(self, keys1: list, keys2: list = None) -> np.ndarray:
+        """
+        Pairwise euclidean distances of the raw embeddings, bulk version of get_distance_between_pokemon.
+        :param keys2: None = keys1
+        :return: (len(keys1), len(keys2))
+        """
+        return pairwise_distances(self.embeddings[self.rows(keys1)], self.embeddings[self.rows(keys1 if keys2 is None else keys2)])
+
+
+def pairwise_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(n, d), (m, d) -> (n, m) euclidean distances"""
+    # float64, in float32 the expanded form loses too much for near-identical pokemon
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    squared = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * a @ b.T
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+if __name__ == "__main__":
+    with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+        embeddings_data = json.loads(f.read())
+    index = PokemonEmbeddingIndex.from_embeddings(embeddings_data)
+    index.save()
+    index = PokemonEmbeddingIndex.load()
+
+    print(index.top_k([(6, 0)], k=10)[0])
+    start = time.perf_counter()
+    results = index.top_k(index.keys, k=10)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} top-10 queries in {elapsed * 1000:.1f} ms ({len(results) / elapsed:.0f} queries/s)")
@@ -0,0 +1,191 @@
+"""
+Streaming reader for pokedex_data.js (the "const items=[{dex:1,img:"1",t1:9,...,876:204,...}, ...];" dump of the game).
+One pass over the file in chunks: a regex tokenizer plus a small recursive descent parser that yields one pokemon
+record at a time. Numerical keys (move learn levels etc., not used anywhere) are dropped while parsing, so only the
+records of pokedex_data.json are ever built - no regex over the whole text and no ast.literal_eval of a 1 MB literal.
+
+    for pokemon in iter_pokedex_js("Embeddings/Pokemon/pokedex_data.js"):
+        ...
+    write_json(iter_pokedex_js(path), "pokedex_data.json")      # streams, record by record
+    save_columns(iter_pokedex_js(path), "pokedex_columns.npz")  # int32 column per scalar field
+"""
+import json
+import re
+import time
+import tracemalloc
+
+import numpy as np
+
+POKEDEX_JS_PATH = "Embeddings/Pokemon/pokedex_data.js"
+CHUNK_SIZE = 1 << 16
+
+# scalar fields of pokedex_data_explainer.txt, missing values are -1 in the columnar output
+COLUMN_FIELDS = ["dex", "t1", "t2", "a1", "a2", "ha", "pa", "bst", "hp", "atk", "def", "spa", "spd", "spe",
+                 "e1", "e2", "e3", "e4", "co", "et", "sh", "ge", "st", "fa", "fs"]
+
+_TOKEN_PATTERN = r"""
+    \s+|//[^\n]*
+    |(?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<name>[A-Za-z_$][\w$]*)
+    |(?P<punct>[{}\[\]:,;=])
+    |(?P<error>.)
+"""
+_TOKEN = re.compile(_TOKEN_PATTERN, re.VERBOSE | re.DOTALL)
+# most of the file are numerical key: number entries, they are skipped by the regex itself without becoming tokens
+_TOKEN_DROPPING = re.compile(r"(?<=[{,])\d+:-?\d+(?=[,}])|" + _TOKEN_PATTERN, re.VERBOSE | re.DOTALL)
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+def _tokens(f, chunk_size: int = CHUNK_SIZE, drop_numerical_keys: bool = False):
+    """(kind, text) of every token, reads f chunk by chunk"""
+    pattern = _TOKEN_DROPPING if drop_numerical_keys else _TOKEN
+    buffer = ""
+    eof = False
+    while not eof:
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+        position = 0
+        for match in pattern.finditer(buffer):
+            kind = match.lastgroup
+            # a token touching the end of the buffer (or an unterminated string) may continue in the next chunk
+            if not eof and (match.end() == len(buffer) or kind == "error"):
+                break
+            position = match.end()
+            if kind == "error":
+                raise ValueError(f"Unexpected character {match.group()!r} in pokedex js")
+            if kind is not None:
+                yield kind, match.group(kind)
+        buffer = buffer[position:]
+
+
+def _value(kind: str, text: str, tokens, drop_numerical_keys: bool):
+    if kind == "number":
+        return float(text) if "." in text or "e" in text or "E" in text else int(text)
+    if kind == "string":
+        return json.loads(text) if text[0] == '"' else json.loads('"' + text[1:-1].replace('"', '\\"') + '"')
+    if kind == "name" and text in _LITERALS:
+        return _LITERALS[text]
+    if text == "{":
+        return _object(tokens, drop_numerical_keys)
+    if text == "[":
+        return _array(tokens, drop_numerical_keys)
+    raise ValueError(f"Unexpected token {text!r} in pokedex js")
+
+
+def _object(tokens, drop_numerical_keys: bool) -> dict:
+    """rest of an object after its "{" """
+    result = {}
+    for kind, text in tokens:
+        if text == "}":
+            return result
+        if text == ",":
+            continue
+        key_kind, key = kind, _value(kind, text, tokens, False) if kind == "string" else text
+        if next(tokens)[1] != ":":
+            raise ValueError(f"Expected ':' after key {key!r} in pokedex js")
+        value = _value(*next(tokens), tokens, drop_numerical_keys)
+        if not (drop_numerical_keys and (key_kind == "number" or key.isnumeric())):
+            result[key] = value
+    raise ValueError("Unterminated object in pokedex js")
+
+
+def _array(tokens, drop_numerical_keys: bool) -> list:
+    """rest of an array after its "[" """
+    result = []
+    for kind, text in tokens:
+        if text == "]":
+            return result
+        if text != ",":
+            result.append(_value(kind, text, tokens, drop_numerical_keys))
+    raise ValueError("Unterminated array in pokedex js")
+
+
+def iter_pokedex_js(path: str = POKEDEX_JS_PATH, drop_numerical_keys: bool = True, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields the pokemon records of pokedex_data.js one at a time.
+    :param drop_numerical_keys: leave out the numerical keys (on every level), same records as pokedex_data.json
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tokens = _tokens(f, chunk_size, drop_numerical_keys)
+        # skip the "const items =" before the array
+        for kind, text in tokens:
+            if text == "[":
+                break
+        else:
+            raise ValueError(f"No array found in {path}")
+        for kind, text in tokens:
+            if text == "]":
+                return
+            if text == "{":
+                yield _object(tokens, drop_numerical_keys)
+            elif text != ",":
+                raise ValueError(f"Expected a pokemon record in {path}, got {text!r}")
+        raise ValueError(f"Unterminated array in {path}")
+
+
+def write_json(records, output_file: str, indent: int = None):
+    """
+    Writes the records as a JSON list without holding them all in memory.
+    Same bytes as json.dump(list(records), ensure_ascii=False, indent=indent); indent None = compact.
+    """
+    separators = (",", ":") if indent is None else None
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("[")
+        index = -1
+        for index, record in enumerate(records):
+            if indent is None:
+                f.write(("," if index else "") + json.dumps(record, ensure_ascii=False, separators=separators))
+            else:
+                text = json.dumps(record, ensure_ascii=False, indent=indent).replace("\n", "\n" + " " * indent)
+                f.write(("," if index else "") + "\n" + " " * indent + text)
+        f.write("]" if indent is None or index < 0 else "\n]")
+
+
+def pokedex_columns(records, fields: list = COLUMN_FIELDS) -> dict:
+    """field -> int32 array with one value per record, -1 where the record does not have the field"""
+    columns = {field: [] for field in fields}
+    for record in records:
+        for field in fields:
+            columns[field].append(record.get(field, -1))
+    return {field: np.array(values, dtype=np.int32) for field, values in columns.items()}
+
+
+def save_columns(records, output_file: str, fields: list = COLUMN_FIELDS):
+    np.savez(output_file, **pokedex_columns(records, fields))
+
+
+def benchmark(path: str = POKEDEX_JS_PATH):
+    """time and peak memory of the streaming parser vs. the old regex + ast.literal_eval conversion"""
+    import ast
+
+    def old():
+        with open(path, "r", encoding="utf-8") as f:
+            js = f.read()
+        array_text = re.sub(r'(\w+):', r'"\1":', re.search(r"const\s+items\s*=\s*(\[.*\]);?", js, re.DOTALL).group(1))
+        return [{key: value for key, value in pokemon.items() if not key.isnumeric()} for pokemon in ast.literal_eval(array_text)]
+
+    def new():
+        return list(iter_pokedex_js(path))
+
+    def stream():
+        count = 0
+        for _ in iter_pokedex_js(path):
+            count += 1
+        return count
+
+    for name, function in [("regex + literal_eval", old), ("streaming, list", new), ("streaming, one at a time", stream)]:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>26}: {elapsed * 1000:7.1f} ms, peak {peak / 2 ** 20:6.1f} MiB")
+    assert old() == new()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,218 @@
+"""
+One build command for all embedding artifacts, replaces running the __main__ steps of create_pokemon_data.py,
+compute_move_data.py and type_embeddings.py by hand:
+
+    pokedex_data.js --> pokedex_data.json --> pokemon_embeddings.json (+ scaler/PCA)
+    collected_move_data.json ------------> move_embeddings.json (+ scaler/PCA)
+    settings.type_matrix ----------------> type_embeddings.json (+ PCA)
+    all three embedding tables ----------> embedding_store.npy/.json
+
+Every stage hashes its inputs, a stage whose inputs and outputs are unchanged since the last build
+(build/manifest.json) is skipped. The fitted scaler/PCA models are pickled and reused: a changed pokedex or move
+list (a game update) is transformed with the stored model, so existing embeddings stay where they are and new forms
+are projected into the same space. Refitting moves every embedding (PCA signs can flip) and breaks trained policies,
+it only happens with --refit, without a stored model or when the feature layout changed.
+
+Usage (from the repo root): python -m Embeddings.build_embeddings [--force] [--refit]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import settings
+from Embeddings import embedding_store
+from Embeddings.Pokemon import create_pokemon_data
+from Embeddings.Pokemon.pokedex_js import iter_pokedex_js, write_json
+from Embeddings.moves import compute_move_data
+
+BUILD_VERSION = 2  # raise to force a rebuild of every stage after changing the feature code
+BUILD_DIR = "Embeddings/build"
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+
+POKEDEX_JS_PATH = "Embeddings/Pokemon/pokedex_data.js"
+POKEDEX_JSON_PATH = "Embeddings/Pokemon/pokedex_data.json"
+COLLECTED_MOVES_PATH = "Embeddings/moves/collected_move_data.json"
+POKEMON_MODEL_PATH = os.path.join(BUILD_DIR, "pokemon_model.pkl")
+MOVE_MODEL_PATH = os.path.join(BUILD_DIR, "move_model.pkl")
+TYPE_MODEL_PATH = os.path.join(BUILD_DIR, "type_model.pkl")
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_inputs(stage: str, paths: list, extra=None) -> str:
+    digest = hashlib.sha256(f"{stage}:{BUILD_VERSION}".encode())
+    for path in paths:
+        digest.update(hash_file(path).encode())
+    if extra is not None:
+        digest.update(json.dumps(extra, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data, **kwargs):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(path + ".tmp", path)
+
+
+def _write_model(path: str, model: dict):
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(model, f)
+    os.replace(path + ".tmp", path)
+
+
+def _fit(feature_vectors: list, n_components: int, scale: bool = True) -> tuple:
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler() if scale else None
+    data = scaler.fit_transform(feature_vectors) if scale else feature_vectors
+    pca = PCA(n_components=n_components)
+    return {"scaler": scaler, "pca": pca}, pca.fit_transform(data)
+
+
+def load_model(path: str) -> dict:
+    """:return: {"scaler": fitted StandardScaler or None, "pca": fitted PCA}"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _transform(model: dict, feature_vectors: list):
+    data = model["scaler"].transform(feature_vectors) if model["scaler"] is not None else feature_vectors
+    return model["pca"].transform(data)
+
+
+def _fit_or_project(model_path: str, feature_vectors: list, n_components: int, scale: bool = True, refit: bool = False):
+    """
+    Embeds with the stored model of model_path, fits and stores a new one only with refit, without a stored model
+    or when the feature layout (number of features/components) changed.
+    :return: embeddings in the order of feature_vectors
+    """
+    if not refit and os.path.exists(model_path):
+        model = load_model(model_path)
+        if model["pca"].n_features_in_ == len(feature_vectors[0]) and model["pca"].n_components_ == n_components:
+            return _transform(model, feature_vectors)
+        print(f"{model_path}: feature layout changed ({model['pca'].n_features_in_} -> {len(feature_vectors[0])} features), refitting")
+    model, embeddings = _fit(feature_vectors, n_components, scale)
+    _write_model(model_path, model)
+    return embeddings
+
+
+# --- stages: each reads its inputs, writes its outputs ---
+
+def build_pokedex_json():
+    # same format as the checked-in file
+    write_json(iter_pokedex_js(POKEDEX_JS_PATH), POKEDEX_JSON_PATH + ".tmp", indent=2)
+    os.replace(POKEDEX_JSON_PATH + ".tmp", POKEDEX_JSON_PATH)
+
+
+def build_pokemon_embeddings(refit: bool = False):
+    with open(POKEDEX_JSON_PATH, "r") as f:
+        pkm_ids, feature_vectors = create_pokemon_data.pokemon_feature_vectors(json.loads(f.read()))
+    embeddings = _fit_or_project(POKEMON_MODEL_PATH, feature_vectors, n_components=8, refit=refit)
+    _write_json(embedding_store.POKEMON_EMBEDDINGS_PATH, {key: embedding.tolist() for key, embedding in zip(pkm_ids, embeddings)})
+
+
+def build_move_embeddings(refit: bool = False):
+    with open(COLLECTED_MOVES_PATH, "r") as f:
+        move_names, feature_vectors = compute_move_data.move_feature_vectors(json.loads(f.read()))
+    embeddings = _fit_or_project(MOVE_MODEL_PATH, feature_vectors, n_components=4, refit=refit)
+    _write_json(embedding_store.MOVE_EMBEDDINGS_PATH, {key: embedding.tolist() for key, embedding in zip(move_names, embeddings)})
+
+
+def build_type_embeddings(refit: bool = False):
+    # same PCA as type_embeddings.fit_embeddings, without scaler
+    embeddings = _fit_or_project(TYPE_MODEL_PATH, list(settings.type_matrix.values()), n_components=4, scale=False, refit=refit)
+    _write_json(embedding_store.TYPE_EMBEDDINGS_PATH, {name: embedding.tolist() for name, embedding in zip(settings.type_matrix.keys(), embeddings)}, indent=2)
+
+
+def build_store():
+    embedding_store.export_from_json(embedding_store.STORE_PATH)
+
+
+def stages(refit: bool = False) -> list:
+    """
+    (name, build function, input files, extra hashed input, outputs, rebuild anyway) in dependency order
+    :param refit: the stages with a scaler/PCA model refit it and are rebuilt even if unchanged
+    """
+    return [
+        ("pokedex_json", build_pokedex_json, [POKEDEX_JS_PATH], None, [POKEDEX_JSON_PATH], False),
+        ("pokemon", functools.partial(build_pokemon_embeddings, refit=refit), [POKEDEX_JSON_PATH], None,
+         [embedding_store.POKEMON_EMBEDDINGS_PATH, POKEMON_MODEL_PATH], refit),
+        ("moves", functools.partial(build_move_embeddings, refit=refit), [COLLECTED_MOVES_PATH], None,
+         [embedding_store.MOVE_EMBEDDINGS_PATH, MOVE_MODEL_PATH], refit),
+        ("types", functools.partial(build_type_embeddings, refit=refit), [], settings.type_matrix,
+         [embedding_store.TYPE_EMBEDDINGS_PATH, TYPE_MODEL_PATH], refit),
+        ("store", build_store, [embedding_store.POKEMON_EMBEDDINGS_PATH, embedding_store.MOVE_EMBEDDINGS_PATH, embedding_store.TYPE_EMBEDDINGS_PATH],
+         None, [embedding_store.STORE_PATH, embedding_store.index_path(embedding_store.STORE_PATH)], False),
+    ]
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"stages": {}}
+    with open(path, "r") as f:
+        return json.loads(f.read())
+
+
+def _is_current(entry: dict, input_hash: str, outputs: list) -> bool:
+    if not entry or entry["input_hash"] != input_hash:
+        return False
+    # outputs deleted or edited by hand -> rebuild
+    return all(os.path.exists(path) and hash_file(path) == entry["outputs"].get(path) for path in outputs)
+
+
+def build(force: bool = False, manifest_path: str = MANIFEST_PATH, refit: bool = False) -> list:
+    """
+    Runs all stages whose inputs changed (or all with force).
+    :param refit: fit new scaler/PCA models instead of projecting with the stored ones, moves every embedding
+    :return: names of the stages that were rebuilt
+    """
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+    rebuilt = []
+    for name, build_stage, inputs, extra, outputs, rebuild in stages(refit):
+        # inputs are hashed right before the stage, so they include what earlier stages just wrote
+        input_hash = hash_inputs(name, inputs, extra)
+        if not (force or rebuild) and _is_current(manifest["stages"].get(name), input_hash, outputs):
+            print(f"{name:>12}: unchanged")
+            continue
+        start = time.perf_counter()
+        build_stage()
+        manifest["stages"][name] = {"input_hash": input_hash, "outputs": {path: hash_file(path) for path in outputs}}
+        _write_json(manifest_path, manifest, indent=2)
+        rebuilt.append(name)
+        print(f"{name:>12}: rebuilt in {time.perf_counter() - start:.2f}s")
+    return rebuilt
+
+
+def project_pokemon(pokedex_records: list, model_path: str = POKEMON_MODEL_PATH) -> dict:
+    """
+    Embeds pokedex records (e.g. new forms after a game update) with the already fitted scaler/PCA,
+    all existing embeddings stay as they are.
+    :param pokedex_records: records in the pokedex_data.json format, forms of one dex number in a row
+    :return: "dex-form" -> embedding
+    """
+    model = load_model(model_path)
+    pkm_ids, feature_vectors = create_pokemon_data.pokemon_feature_vectors(pokedex_records)
+    embeddings = _transform(model, feature_vectors)
+    return {key: embedding.tolist() for key, embedding in zip(pkm_ids, embeddings)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build all embedding artifacts, unchanged stages are skipped")
+    parser.add_argument("--force", action="store_true", help="rebuild every stage (still with the stored scaler/PCA models)")
+    parser.add_argument("--refit", action="store_true", help="fit new scaler/PCA models, every embedding moves, retrain the policies")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    rebuilt = build(force=args.force, refit=args.refit)
+    print(f"Done in {time.perf_counter() - start:.2f}s, rebuilt: {', '.join(rebuilt) or 'nothing'}")
@@ -0,0 +1,185 @@
+"""
+Binary embedding store: pokemon_embeddings.json, move_embeddings.json and type_embeddings.json as one float32 .npy
+plus a small JSON index (which rows belong to which id).
+The loader maps the .npy read-only (np.load(mmap_mode="r")), so all env worker processes share the same page cache copy
+instead of each holding the dicts of python floats, and loading takes milliseconds instead of json.loads.
+
+The index records a hash of every JSON the store was exported from, load_current() only hands out a store that
+still matches them, so a re-run of create_pokemon_data/compute_move_data/type_embeddings never leaves a stale store in use.
+
+Export (from the repo root): python -m Embeddings.embedding_store
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+STORE_PATH = "Embeddings/embedding_store.npy"
+POKEMON_EMBEDDINGS_PATH = "Embeddings/Pokemon/pokemon_embeddings.json"
+MOVE_EMBEDDINGS_PATH = "Embeddings/moves/move_embeddings.json"
+TYPE_EMBEDDINGS_PATH = "Embeddings/type_embeddings.json"
+
+logger = logging.getLogger(__name__)
+
+
+def index_path(path: str) -> str:
+    """JSON sidecar of a store, e.g. embedding_store.npy -> embedding_store.json"""
+    return os.path.splitext(path)[0] + ".json"
+
+
+def source_paths() -> dict:
+    """table name -> embedding JSON it is exported from"""
+    return {"pokemon": POKEMON_EMBEDDINGS_PATH, "moves": MOVE_EMBEDDINGS_PATH, "types": TYPE_EMBEDDINGS_PATH}
+
+
+def source_hashes() -> dict:
+    """:return: table name -> sha256 of its embedding JSON, tables without JSON file are left out"""
+    hashes = dict()
+    for name, json_path in source_paths().items():
+        if os.path.exists(json_path):
+            with open(json_path, "rb") as f:
+                hashes[name] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+
+def export_store(pokemon_embeddings_data: dict, move_embeddings_data: dict, type_embeddings_data: dict,
+                 path: str = STORE_PATH, sources: dict = None) -> dict:
+    """
+    Writes the three tables into one flat float32 .npy and the id index next to it.
+    The move table gets a zero row 0 for unknown moves (same as get_move_embedding), the ids map to rows 1..N.
+    :param sources: source_hashes() of the JSONs the tables come from, checked by load_current
+    :return: the index that was written
+    """
+    tables = {"pokemon": (list(pokemon_embeddings_data.keys()), list(pokemon_embeddings_data.values())),
+              "moves": (["unknown"] + list(move_embeddings_data.keys()),
+                        [[0.0] * len(next(iter(move_embeddings_data.values())))] + list(move_embeddings_data.values())),
+              "types": (list(type_embeddings_data.keys()), list(type_embeddings_data.values()))}
+
+    index = {"version": 1, "tables": dict(), "sources": sources or dict()}
+    blocks = []
+    offset = 0
+    for name, (keys, rows) in tables.items():
+        block = np.asarray(rows, dtype=np.float32)
+        index["tables"][name] = {"offset": offset, "rows": block.shape[0], "width": block.shape[1], "keys": keys}
+        blocks.append(block.ravel())
+        offset += block.size
+
+    # erst in Temp-Dateien schreiben, laufende Worker sollen nie eine halbe Datei mappen
+    np.save(path + ".tmp.npy", np.concatenate(blocks))
+    with open(index_path(path) + ".tmp", "w") as f:
+        f.write(json.dumps(index))
+    os.replace(path + ".tmp.npy", path)
+    os.replace(index_path(path) + ".tmp", index_path(path))
+    return index
+
+
+def export_from_json(path: str = STORE_PATH) -> dict:
+    """Reads the three embedding JSON files of the repo and exports them, see export_store."""
+    data = []
+    for json_path in (POKEMON_EMBEDDINGS_PATH, MOVE_EMBEDDINGS_PATH, TYPE_EMBEDDINGS_PATH):
+        with open(json_path, "r") as f:
+            data.append(json.loads(f.read()))
+    return export_store(*data, path=path, sources=source_hashes())
+
+
+def load_current(path: str = STORE_PATH, mmap: bool = True):
+    """
+    The store, if it exists and still matches the embedding JSONs it was exported from.
+    :return: EmbeddingStore, None if there is none or it is stale (with a warning), the caller falls back to the JSONs
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    store = EmbeddingStore.load(path, mmap)
+    stale = store.stale_tables()
+    if stale:
+        logger.warning(f"{path} does not match {', '.join(source_paths()[name] for name in stale)} any more, using the JSON files. "
+                       f"Re-export with: python -m Embeddings.build_embeddings")
+        return None
+    return store
+
+
+class EmbeddingStore:
+    def __init__(self, data: np.ndarray, index: dict):
+        """
+        :param data: flat float32 array of all tables (usually a read-only memmap)
+        :param index: content of the JSON sidecar
+        """
+        self.data = data
+        self.index = index
+        self.tables = dict()
+        for name, table in index["tables"].items():
+            # reshape of a slice is a view, nothing is copied out of the mapping
+            self.tables[name] = data[table["offset"]:table["offset"] + table["rows"] * table["width"]].reshape(table["rows"], table["width"])
+
+        pokemon_keys = [tuple(int(part) for part in key.split("-")) for key in index["tables"]["pokemon"]["keys"]]
+        self.pokemon_index = np.full((max(dex for dex, _ in pokemon_keys) + 1, max(form for _, form in pokemon_keys) + 1), -1, dtype=np.int32)
+        for row, (dex, form) in enumerate(pokemon_keys):
+            self.pokemon_index[dex, form] = row
+
+        move_ids = [int(move_id) for move_id in index["tables"]["moves"]["keys"][1:]]
+        self.move_index = np.zeros(max(move_ids) + 1, dtype=np.int32)
+        self.move_index[move_ids] = np.arange(1, len(move_ids) + 1)
+
+        self.type_index = {type_name: row for row, type_name in enumerate(index["tables"]["types"]["keys"])}
+
+    @classmethod
+    def load(cls, path: str = STORE_PATH, mmap: bool = True):
+        """
+        :param mmap: map the file read-only instead of reading it into process memory
+        """
+        data = np.load(path, mmap_mode="r" if mmap else None)
+        with open(index_path(path), "r") as f:
+            index = json.loads(f.read())
+        return cls(data, index)
+
+    def stale_tables(self) -> list:
+        """:return: tables whose embedding JSON changed since the export (all of them for a store without hashes)"""
+        exported = self.index.get("sources", dict())
+        return [name for name, current in source_hashes().items() if exported.get(name) != current]
+
+    @property
+    def pokemon_table(self) -> np.ndarray:
+        return self.tables["pokemon"]
+
+    @property
+    def move_table(self) -> np.ndarray:
+        return self.tables["moves"]
+
+    @property
+    def type_table(self) -> np.ndarray:
+        return self.tables["types"]
+
+    def get_pokemon_embedding(self, dex: int, form_index: int) -> np.ndarray:
+        """Same values as create_pokemon_data.get_pokemon_embedding, KeyError for unknown pokemon"""
+        if 0 <= dex < self.pokemon_index.shape[0] and 0 <= form_index < self.pokemon_index.shape[1]:
+            row = self.pokemon_index[dex, form_index]
+            if row >= 0:
+                return self.pokemon_table[row]
+        raise KeyError(f"{dex}-{form_index}")
+
+    def get_move_embedding(self, move_id: int) -> np.ndarray:
+        """Same values as compute_move_data.get_move_embedding, zero vector for unknown moves"""
+        row = self.move_index[move_id] if 0 <= move_id < self.move_index.shape[0] else 0
+        return self.move_table[row]
+
+    def get_type_embedding(self, type_name: str) -> np.ndarray:
+        return self.type_table[self.type_index[type_name]]
+
+
+if __name__ == "__main__":
+    index = export_from_json()
+    for name, table in index["tables"].items():
+        print(f"{name:>8}: {table['rows']} x {table['width']}")
+
+    start = time.perf_counter()
+    for json_path in (POKEMON_EMBEDDINGS_PATH, MOVE_EMBEDDINGS_PATH, TYPE_EMBEDDINGS_PATH):
+        with open(json_path, "r") as f:
+            json.loads(f.read())
+    json_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    EmbeddingStore.load()
+    store_ms = (time.perf_counter() - start) * 1000
+    print(f"json.loads: {json_ms:.1f} ms | EmbeddingStore.load: {store_ms:.1f} ms")
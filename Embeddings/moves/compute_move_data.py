@@ -3,50 +3,144 @@ import json
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+POKEAPI_MOVE_URL = "https://pokeapi.co/api/v2/move/"
+MOVE_COUNT = 938
+CACHE_DIR = "move_cache"  # one raw PokeAPI response per move id, makes collecting resumable
+MISSING = "missing"  # cache entry of move ids the API does not know (404)
 
-def collect_move_data():
-    """Collects move data from the PokeAPI and stores it in a dictionary."""
-    moves_dict = {}
 
-    for move_id in range(938):
-        url = "https://pokeapi.co/api/v2/move/" + str(move_id + 1)
-        response = requests.get(url)
-        if response.status_code != 200:
+def _optional_int(value) -> int:
+    return int(value) if value is not None else 0
+
+
+def _id_from_url(resource: dict) -> int:
+    return int(resource["url"].split("/")[-2])
+
+
+def _parse_move(move_data: dict):
+    """One PokeAPI move response -> our move dict, None for moves without meta data (e.g. shadow moves)"""
+    meta = move_data["meta"]
+    if meta is None:
+        return None
+    return {"accuracy": _optional_int(move_data.get("accuracy")),
+            "damage_class": _id_from_url(move_data["damage_class"]),
+            "power": _optional_int(move_data["power"]),
+            "pp": _optional_int(move_data["pp"]),
+            "ailment": _id_from_url(meta["ailment"]),
+            "ailment_chance": _optional_int(meta["ailment_chance"]),
+            "category": _id_from_url(meta["category"]),
+            "crit_rate": _optional_int(meta["crit_rate"]),
+            "drain": _optional_int(meta["drain"]),
+            "flinch_chance": _optional_int(meta["flinch_chance"]),
+            "healing": _optional_int(meta["healing"]),
+            "min_hits": _optional_int(meta["min_hits"]),
+            "max_hits": _optional_int(meta["max_hits"]),
+            "min_turns": _optional_int(meta["min_turns"]),
+            "max_turns": _optional_int(meta["max_turns"]),
+            "stat_chance": _optional_int(meta["stat_chance"]),
+            "priority": _optional_int(move_data["priority"]),
+            "target": _id_from_url(move_data["target"]),
+            "type": _id_from_url(move_data["type"])}
+
+
+def http_fetcher(base_url: str = POKEAPI_MOVE_URL, timeout: float = 10.0, retries: int = 3, backoff: float = 1.0):
+    """
+    Default fetcher of collect_move_data: GET base_url + move_id with retries.
+    :return: fetch(move_id) -> response JSON, None if the move does not exist (404); raises after the last failed retry
+    """
+    sessions = threading.local()  # requests.Session is not thread safe, one per pool thread
+
+    def fetch(move_id: int):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        for attempt in range(retries + 1):
+            try:
+                response = sessions.session.get(base_url + str(move_id), timeout=timeout)
+                if response.status_code == 404:
+                    return None
+                if response.status_code == 200:
+                    return response.json()
+                error = requests.HTTPError(f"HTTP {response.status_code} for move {move_id}")
+            except requests.RequestException as e:
+                error = e
+            if attempt < retries:
+                time.sleep(backoff * 2 ** attempt)
+        raise error
+    return fetch
+
+
+def _cache_path(cache_dir: str, move_id: int) -> str:
+    return os.path.join(cache_dir, f"{move_id}.json")
+
+
+def _write_cache(cache_dir: str, move_id: int, move_data):
+    path = _cache_path(cache_dir, move_id)
+    with open(path + ".tmp", "w") as f:
+        f.write(json.dumps(move_data if move_data is not None else MISSING))
+    os.replace(path + ".tmp", path)  # an interrupted run never leaves a half written entry
+
+
+def collect_move_data(move_ids=None, output_file: str = "collected_move_data.json", cache_dir: str = CACHE_DIR, fetch=None,
+                      max_workers: int = 8, offline: bool = False) -> dict:
+    """
+    Collects move data from the PokeAPI and stores it in a dictionary.
+    Every response is cached in cache_dir first, a second run only fetches the moves that are still missing.
+    :param move_ids: default 1..MOVE_COUNT
+    :param fetch: fetch(move_id) -> response JSON or None for unknown moves, default http_fetcher()
+    :param max_workers: concurrent requests
+    :param offline: don't fetch anything, rebuild output_file from the cache only
+    :return: move_id -> move dict; output_file is only (over)written once every requested move is cached
+    """
+    move_ids = list(move_ids) if move_ids is not None else list(range(1, MOVE_COUNT + 1))
+    os.makedirs(cache_dir, exist_ok=True)
+    to_fetch = [move_id for move_id in move_ids if not os.path.exists(_cache_path(cache_dir, move_id))]
+
+    failed = []
+    if to_fetch and not offline:
+        fetch = fetch or http_fetcher()
+        print(f"Fetching {len(to_fetch)} of {len(move_ids)} moves ({len(move_ids) - len(to_fetch)} cached)...")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(fetch, move_id): move_id for move_id in to_fetch}
+            for future in as_completed(futures):
+                move_id = futures[future]
+                try:
+                    _write_cache(cache_dir, move_id, future.result())
+                except Exception as e:
+                    failed.append(move_id)
+                    print(f"Move {move_id} failed: {e}")
+    elif to_fetch:
+        failed = to_fetch
+
+    moves_dict = {}
+    for move_id in move_ids:
+        if not os.path.exists(_cache_path(cache_dir, move_id)):
             continue
-        move_data = response.json()
-        if move_data["meta"] is None:
+        with open(_cache_path(cache_dir, move_id), "r") as f:
+            move_data = json.loads(f.read())
+        if move_data == MISSING:
             continue
-        moves_dict[move_id + 1] = {"accuracy": int(move_data.get("accuracy")) if move_data.get("accuracy") is not None else 0,
-                                   "damage_class": int(move_data["damage_class"]["url"].split("/")[-2]),
-                                   "power": int(move_data["power"]) if move_data["power"] is not None else 0,
-                                   "pp": int(move_data["pp"]) if move_data["pp"] is not None else 0,
-                                   "ailment": int(move_data["meta"]["ailment"]["url"].split("/")[-2]),
-                                   "ailment_chance": int(move_data["meta"]["ailment_chance"]) if move_data["meta"][
-                                                                                                     "ailment_chance"] is not None else 0,
-                                   "category": int(move_data["meta"]["category"]["url"].split("/")[-2]),
-                                   "crit_rate": int(move_data["meta"]["crit_rate"]) if move_data["meta"]["crit_rate"] is not None else 0,
-                                   "drain": int(move_data["meta"]["drain"]) if move_data["meta"]["drain"] is not None else 0,
-                                   "flinch_chance": int(move_data["meta"]["flinch_chance"]) if move_data["meta"]["flinch_chance"] is not None else 0,
-                                   "healing": int(move_data["meta"]["healing"]) if move_data["meta"]["healing"] is not None else 0,
-                                   "min_hits": int(move_data["meta"]["min_hits"]) if move_data["meta"]["min_hits"] is not None else 0,
-                                   "max_hits": int(move_data["meta"]["max_hits"]) if move_data["meta"]["max_hits"] is not None else 0,
-                                   "min_turns": int(move_data["meta"]["min_turns"]) if move_data["meta"]["min_turns"] is not None else 0,
-                                   "max_turns": int(move_data["meta"]["max_turns"]) if move_data["meta"]["max_turns"] is not None else 0,
-                                   "stat_chance": int(move_data["meta"]["stat_chance"]) if move_data["meta"]["stat_chance"] is not None else 0,
-                                   "priority": int(move_data["priority"]) if move_data["priority"] is not None else 0,
-                                   "target": int(move_data["target"]["url"].split("/")[-2]),
-                                   "type": int(move_data["type"]["url"].split("/")[-2])}
-
-    with open("collected_move_data.json", "w") as f:
+        move = _parse_move(move_data)
+        if move is not None:
+            moves_dict[move_id] = move
+
+    if failed:
+        # a partial output_file would silently shrink the move embeddings, keep the old one
+        print(f"{len(failed)} moves are not cached yet, {output_file} is not written, run again to resume: {sorted(failed)[:20]}")
+        return moves_dict
+    with open(output_file, "w") as f:
         f.write(json.dumps(moves_dict))
+    return moves_dict
 
 
-def create_move_embeddings():
-    """Creates move embeddings from the collected move data."""
-    with open("collected_move_data.json", "r") as f:
-        moves_dict = json.loads(f.read())
-
+def move_feature_vectors(moves_dict: dict) -> tuple:
+    """
+    Feature vector of every collected move, the input of the scaler + PCA.
+    :return: (move_names, move_data_list)
+    """
     move_data_list = []
     move_names = []
     for move_id, data in moves_dict.items():
@@ -57,6 +151,15 @@ def create_move_embeddings():
                        data["priority"], data["target"], data["type"]]
         move_data_list.append(move_vector)
         move_names.append(move_id)
+    return move_names, move_data_list
+
+
+def create_move_embeddings(input_file: str = "collected_move_data.json", output_file: str = "move_embeddings.json"):
+    """Creates move embeddings from the collected move data."""
+    with open(input_file, "r") as f:
+        moves_dict = json.loads(f.read())
+
+    move_names, move_data_list = move_feature_vectors(moves_dict)
 
     scaler = StandardScaler()
     scaled_data = scaler.fit_transform(move_data_list)
@@ -68,7 +171,7 @@ def create_move_embeddings():
     for index, move_id in enumerate(move_names):
         move_embedding_dict[move_id] = move_embeddings[index].tolist()
 
-    with open("move_embeddings.json", "w") as f:
+    with open(output_file, "w") as f:
         f.write(json.dumps(move_embedding_dict))
 
 
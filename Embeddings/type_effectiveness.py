@@ -0,0 +1,114 @@
+"""
+Type effectiveness as one precomputed table: attacking type (18) x defending type combination (171 = 18 single + 153 dual).
+Built from settings.type_matrix. With the defender combination of every pokemon (pokedex_data.json) and the type of
+every move (collected_move_data.json) the encoder gets "how effective is move m of our pokemon s against enemy t"
+with plain array indexing.
+
+There are three type orders in the repo, everything is mapped by name onto TYPE_NAMES:
+- TYPE_NAMES: pokedex_data.json t1/t2 (alphabetical)
+- POKEAPI_TYPE_NAMES: "type" in collected_move_data.json (PokeAPI ids, 1-based)
+- settings.type_matrix: its own key order, rows = attacker, columns in key order
+"""
+import itertools
+import json
+
+import numpy as np
+
+import settings
+
+POKEDEX_PATH = "Embeddings/Pokemon/pokedex_data.json"
+MOVE_DATA_PATH = "Embeddings/moves/collected_move_data.json"
+
+TYPE_NAMES = sorted(settings.type_matrix.keys())
+POKEAPI_TYPE_NAMES = ["normal", "fighting", "flying", "poison", "ground", "rock", "bug", "ghost", "steel", "fire", "water", "grass",
+                      "electric", "psychic", "ice", "dragon", "dark", "fairy"]
+STATUS_DAMAGE_CLASS = 1  # PokeAPI move damage class: 1 status, 2 physical, 3 special
+
+# defender combinations: first the 18 single types, then all dual types (t1 < t2)
+COMBINATIONS = [(t, t) for t in range(len(TYPE_NAMES))] + list(itertools.combinations(range(len(TYPE_NAMES)), 2))
+COMBINATION_INDEX = np.zeros((len(TYPE_NAMES), len(TYPE_NAMES)), dtype=np.int32)  # [t1, t2] -> column, symmetric
+for _index, (_t1, _t2) in enumerate(COMBINATIONS):
+    COMBINATION_INDEX[_t1, _t2] = COMBINATION_INDEX[_t2, _t1] = _index
+
+NO_TYPE = len(TYPE_NAMES)  # extra row: status move / empty move slot
+NO_COMBINATION = len(COMBINATIONS)  # extra column: empty enemy slot
+
+
+def build_effectiveness_table() -> np.ndarray:
+    """(18, 171) damage multiplier of every attacking type against every single and dual type"""
+    matrix_order = list(settings.type_matrix.keys())
+    to_matrix = [matrix_order.index(name) for name in TYPE_NAMES]
+    matrix = np.array(list(settings.type_matrix.values()), dtype=np.float32)[np.ix_(to_matrix, to_matrix)]
+    t1, t2 = np.array(COMBINATIONS).T
+    table = matrix[:, t1] * matrix[:, t2]
+    single = t1 == t2
+    table[:, single] = matrix[:, t1[single]]  # single types count once
+    return table
+
+
+def pokedex_form_keys(pokedex_data: list) -> list:
+    """"dex-form" key of every pokedex record, same numbering as create_pokemon_embeddings"""
+    keys = []
+    form_counter = 0
+    for index, pkm in enumerate(pokedex_data):
+        form_counter = form_counter + 1 if index and pkm["dex"] == pokedex_data[index - 1]["dex"] else 0
+        keys.append(f"{pkm['dex']}-{form_counter}")
+    return keys
+
+
+class TypeEffectiveness:
+    def __init__(self, table: np.ndarray, pokemon_combinations: np.ndarray, move_types: np.ndarray):
+        """
+        :param table: (18, 171) from build_effectiveness_table
+        :param pokemon_combinations: [pokemon row] -> defender combination column
+        :param move_types: [move row] -> attacking type, NO_TYPE for status moves and unknown moves
+        """
+        self.table = table
+        # padded copy, so status moves and empty enemy slots index a 0 instead of needing a branch
+        self.padded_table = np.zeros((table.shape[0] + 1, table.shape[1] + 1), dtype=np.float32)
+        self.padded_table[:table.shape[0], :table.shape[1]] = table
+        self.pokemon_combinations = pokemon_combinations
+        self.move_types = move_types
+
+    @classmethod
+    def for_encoder_tables(cls, pokemon_index: np.ndarray, move_index: np.ndarray, pokedex_data: list = None, move_data: dict = None):
+        """
+        Aligns types with the rows of an ObservationEncoder / EmbeddingStore.
+        :param pokemon_index: [dex, form] -> pokemon row
+        :param move_index: [move_id] -> move row (row 0 = unknown move)
+        """
+        if pokedex_data is None:
+            with open(POKEDEX_PATH, "r") as f:
+                pokedex_data = json.loads(f.read())
+        if move_data is None:
+            with open(MOVE_DATA_PATH, "r") as f:
+                move_data = json.loads(f.read())
+
+        pokemon_combinations = np.full(int(pokemon_index.max()) + 1, NO_COMBINATION, dtype=np.int32)
+        for key, pkm in zip(pokedex_form_keys(pokedex_data), pokedex_data):
+            dex, form = (int(part) for part in key.split("-"))
+            if dex < pokemon_index.shape[0] and form < pokemon_index.shape[1] and pokemon_index[dex, form] >= 0:
+                pokemon_combinations[pokemon_index[dex, form]] = COMBINATION_INDEX[pkm["t1"], pkm.get("t2", pkm["t1"])]
+
+        move_types = np.full(int(move_index.max()) + 1, NO_TYPE, dtype=np.int32)
+        for move_id, move in move_data.items():
+            move_id = int(move_id)
+            if move_id < move_index.shape[0] and move_index[move_id] > 0 and move["damage_class"] != STATUS_DAMAGE_CLASS:
+                move_types[move_index[move_id]] = TYPE_NAMES.index(POKEAPI_TYPE_NAMES[move["type"] - 1])
+        return cls(build_effectiveness_table(), pokemon_combinations, move_types)
+
+    def block(self, move_rows: np.ndarray, enemy_rows: np.ndarray) -> np.ndarray:
+        """
+        :param move_rows: (attackers, moves) move rows, 0 = no move
+        :param enemy_rows: (targets,) pokemon rows, -1 = empty slot
+        :return: (attackers, moves, targets) multipliers, 0 for status moves, empty move slots and empty enemy slots
+        """
+        combinations = np.where(enemy_rows >= 0, self.pokemon_combinations[enemy_rows], NO_COMBINATION)
+        return self.padded_table[self.move_types[move_rows][:, :, None], combinations[None, None, :]]
+
+
+if __name__ == "__main__":
+    table = build_effectiveness_table()
+    print(table.shape)
+    fire, grass, steel, water = (TYPE_NAMES.index(name) for name in ("fire", "grass", "steel", "water"))
+    print(f"fire -> grass/steel: {table[fire, COMBINATION_INDEX[grass, steel]]}, fire -> water: {table[fire, COMBINATION_INDEX[water, water]]}")
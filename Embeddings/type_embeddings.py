@@ -3,19 +3,24 @@ from settings import type_matrix
 import json
 
 
-def create_embeddings():
+def fit_embeddings() -> tuple:
+    """:return: (fitted PCA, embeddings in type_matrix key order)"""
     pca = PCA(n_components=4)
     values = [x for x in type_matrix.values()]
     embeddings = pca.fit_transform(values)
-    return embeddings
+    return pca, embeddings
+
+
+def create_embeddings():
+    return fit_embeddings()[1]
 
 
-def create_json(embeddings):
+def create_json(embeddings, output_file: str = "type_embeddings.json"):
     type_embeddings_dict = dict()
     for index, type_name in enumerate(type_matrix.keys()):
         type_embeddings_dict[type_name] = embeddings[index].tolist()
     print(type_embeddings_dict)
-    with open("type_embeddings.json", "w") as f:
+    with open(output_file, "w") as f:
         f.write(json.dumps(type_embeddings_dict))
 
 
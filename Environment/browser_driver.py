@@ -0,0 +1,237 @@
+"""
+Driver abstraction for talking to the game page: execute, execute_async and press_button.
+Both backends also offer the selenium names (execute_script, execute_async_script, get, refresh, quit),
+so PokeRogueEnv, phase_handler and send_key_inputs work with either of them.
+
+- SeleniumDriver: wraps a selenium WebDriver, every call is one HTTP round trip to geckodriver/chromedriver
+- CDPDriver: one persistent Chrome DevTools Protocol websocket, requests are pipelined by id
+  (needs a Chromium based browser or the PokeRogue app started with --remote-debugging-port, firefox has no CDP)
+"""
+import abc
+import itertools
+import json
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import requests
+from websocket import create_connection
+
+from Environment.send_key_inputs import press_sequence
+
+# worker i of an env pool debugs on CDP_BASE_PORT + i, two browsers can not share a port
+CDP_BASE_PORT = 9222
+
+
+class CDPError(Exception):
+    """JavaScript exception or protocol error reported by the browser."""
+
+
+class BrowserDriver(abc.ABC):
+    @abc.abstractmethod
+    def execute(self, script: str, *args):
+        pass
+
+    @abc.abstractmethod
+    def execute_async(self, script: str, *args):
+        pass
+
+    def press_button(self, button_name: str):
+        press_sequence(self, [button_name])
+
+    # selenium names, so existing code can use a BrowserDriver like a WebDriver
+    def execute_script(self, script: str, *args):
+        return self.execute(script, *args)
+
+    def execute_async_script(self, script: str, *args):
+        return self.execute_async(script, *args)
+
+
+class SeleniumDriver(BrowserDriver):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def execute(self, script: str, *args):
+        return self.driver.execute_script(script, *args)
+
+    def execute_async(self, script: str, *args):
+        return self.driver.execute_async_script(script, *args)
+
+    def __getattr__(self, name):
+        # get, refresh, quit, ... go straight to selenium
+        return getattr(self.driver, name)
+
+
+class CDPDriver(BrowserDriver):
+    def __init__(self, ws_url: str, timeout: float = 30.0, process: subprocess.Popen = None):
+        """
+        :param ws_url: webSocketDebuggerUrl of the page target
+        :param timeout: seconds until a call without answer fails, like selenium's script timeout
+        :param process: browser process to terminate on quit(), if we started it ourselves
+        """
+        self.timeout = timeout
+        self.process = process
+        self.ws = create_connection(ws_url, suppress_origin=True)
+        self._ids = itertools.count(1)
+        self._pending = dict()
+        self._pending_lock = threading.Lock()  # the caller registers requests, the reader resolves them
+        self._closed = False
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def connect(cls, host: str = "localhost", port: int = CDP_BASE_PORT, url_filter: str = "localhost:8000", **kwargs):
+        """Connects to the first page target whose url contains url_filter (see http://host:port/json)."""
+        targets = requests.get(f"http://{host}:{port}/json").json()
+        pages = [target for target in targets if target.get("type") == "page" and url_filter in target.get("url", "")]
+        if not pages:
+            raise CDPError(f"Keine Seite mit '{url_filter}' gefunden. Läuft der Browser mit --remote-debugging-port={port}?")
+        return cls(pages[0]["webSocketDebuggerUrl"], **kwargs)
+
+    def _read_loop(self):
+        while True:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception as e:
+                with self._pending_lock:
+                    self._closed = True
+                    pending, self._pending = self._pending, dict()
+                for future in pending.values():
+                    future.set_exception(CDPError(f"CDP connection closed: {e}"))
+                return
+            with self._pending_lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future is None:
+                continue  # events, we did not enable any
+            if "error" in message:
+                future.set_exception(CDPError(message["error"].get("message", message["error"])))
+            else:
+                future.set_result(message["result"])
+
+    def _send(self, method: str, params: dict = None) -> tuple:
+        request_id = next(self._ids)
+        future = Future()
+        with self._pending_lock:
+            if self._closed:
+                raise CDPError(f"{method}: CDP connection is closed")
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self.ws.send(json.dumps({"id": request_id, "method": method, "params": params or {}}))
+        except Exception as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise CDPError(f"{method}: sending failed: {e}") from e
+        return request_id, future
+
+    def send(self, method: str, params: dict = None) -> Future:
+        """Sends one CDP request without waiting, the answer resolves the returned Future."""
+        return self._send(method, params)[1]
+
+    def call(self, method: str, params: dict = None):
+        request_id, future = self._send(method, params)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)  # a late answer is dropped by the read loop
+            raise CDPError(f"{method}: no answer within {self.timeout}s")
+
+    def _evaluate(self, expression: str):
+        result = self.call("Runtime.evaluate", {"expression": expression, "returnByValue": True, "awaitPromise": True})
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description", details.get("text")))
+        return result["result"].get("value")
+
+    def execute(self, script: str, *args):
+        # same calling convention as selenium: body with `return`, parameters in `arguments`
+        return self._evaluate(f"(function() {{ {script} }}).apply(null, {json.dumps(list(args))})")
+
+    def execute_async(self, script: str, *args):
+        # selenium passes the callback as last argument, here it resolves the promise CDP waits for
+        return self._evaluate(f"new Promise(resolve => {{ (function() {{ {script} }}).apply(null, {json.dumps(list(args))}.concat([resolve])); }})")
+
+    def _wait_for_load(self):
+        # like selenium, get/refresh only return once the new document is loaded
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            try:
+                if self.execute("return document.readyState;") == "complete":
+                    return
+            except CDPError:
+                pass  # old execution context is gone while navigating
+            time.sleep(0.05)
+        raise CDPError(f"Page did not finish loading within {self.timeout}s")
+
+    def get(self, url: str):
+        self.call("Page.navigate", {"url": url})
+        self._wait_for_load()
+
+    def refresh(self):
+        self.call("Page.reload")
+        self._wait_for_load()
+
+    def quit(self):
+        self.ws.close()
+        if self.process is not None:
+            self.process.terminate()
+            self.process = None
+
+
+def launch_chrome(chrome_binary: str = "chrome", port: int = CDP_BASE_PORT, profile_dir: str = "browser_profiles/cdp",
+                  url: str = "http://localhost:8000", headless: bool = False) -> CDPDriver:
+    """Starts a chromium based browser with remote debugging on the game page and connects a CDPDriver to it."""
+    command = [chrome_binary, f"--remote-debugging-port={port}", f"--user-data-dir={profile_dir}", "--remote-allow-origins=*", url]
+    if headless:
+        command.insert(1, "--headless=new")
+    process = subprocess.Popen(command)
+    for _ in range(50):
+        try:
+            return CDPDriver.connect(port=port, url_filter=url.split("//")[-1], process=process)
+        except (requests.ConnectionError, CDPError):
+            time.sleep(0.2)
+    process.terminate()
+    raise CDPError(f"{chrome_binary} did not open a debugging port on {port}")
+
+
+def compare_latency(drivers: dict, script: str = "return window.__GLOBAL_SCENE_DATA__();", n: int = 200) -> dict:
+    """
+    Runs the same query n times on every backend.
+    :param drivers: name -> BrowserDriver
+    :return: name -> {"mean_ms", "median_ms", "p95_ms"}
+    """
+    results = dict()
+    for name, driver in drivers.items():
+        driver.execute(script)  # warm-up
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            driver.execute(script)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {"mean_ms": statistics.mean(timings), "median_ms": statistics.median(timings),
+                         "p95_ms": timings[int(0.95 * (n - 1))]}
+        print(f"{name:>8}: mean {results[name]['mean_ms']:.2f} ms | median {results[name]['median_ms']:.2f} ms | "
+              f"p95 {results[name]['p95_ms']:.2f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    # same chrome page for both backends: chromedriver for selenium, a second CDP client on the debugging port
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument(f"--remote-debugging-port={CDP_BASE_PORT}")
+    options.add_argument("--remote-allow-origins=*")
+    selenium_driver = webdriver.Chrome(options=options)
+    selenium_driver.get("http://localhost:8000")
+    input("Press Enter when the game is loaded...")
+
+    cdp_driver = CDPDriver.connect(port=CDP_BASE_PORT)
+    compare_latency({"selenium": SeleniumDriver(selenium_driver), "cdp": cdp_driver})
+    cdp_driver.quit()
+    selenium_driver.quit()
@@ -22,6 +22,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
 import DataExtraction.create_input as input_creator
+import DataExtraction.observation_schema as obs_schema
 
 class PokeRogueEnv(gym.Env):
     def __init__(self):
@@ -33,8 +34,8 @@ class PokeRogueEnv(gym.Env):
         # [P1 Move (0-3), P1 Target (0-1), P2 Move (0-3), P2 Target (0-1)]
         self.action_space = spaces.MultiDiscrete([4, 2, 4, 2])
         # --- 2. Define Observation Space ---
-        # Size 82 floats as calculated
-        self.observation_space = spaces.Box(low=-100, high=100, shape=(82,), dtype=np.float32)
+        # Layout and size see DataExtraction/observation_schema.py
+        self.observation_space = obs_schema.observation_space()
         self.last_obs = []
         self.new_obs = []
         self.terminated = False
@@ -144,18 +145,18 @@ class PokeRogueEnv(gym.Env):
     def _get_reward(self) -> float:
         """
         Calculates reward based on HP delta.
-        Enemies: 8, 17
-        Players: 26, 58
+        Enemies: both enemy slots
+        Players: the two active party slots
         """
         # Extract HPs
-        old_enemy_hp = self.last_obs[8] + self.last_obs[17]
+        old_enemy_hp = obs_schema.enemy_hp(self.last_obs).sum()
         print(f"Old Enemy HP: {old_enemy_hp}")
-        new_enemy_hp = self.new_obs[8] + self.new_obs[17]
+        new_enemy_hp = obs_schema.enemy_hp(self.new_obs).sum()
         print(f"New Enemy HP: {new_enemy_hp}")
         
-        old_player_hp = self.last_obs[26] + self.last_obs[58]
+        old_player_hp = obs_schema.party_hp(self.last_obs)[:2].sum()
         print(f"Old Player HP: {old_player_hp}")
-        new_player_hp = self.new_obs[26] + self.new_obs[58]
+        new_player_hp = obs_schema.party_hp(self.new_obs)[:2].sum()
         print(f"New Player HP: {new_player_hp}")
 
         # Reward: Damage Dealt - Damage Taken
@@ -186,9 +187,9 @@ class PokeRogueEnv(gym.Env):
         t2_str = "Right Enemy" if p2_target == 1 else "Left Enemy"
 
         # --- DEBUG INFO ---
-        # Get raw HP for display (Player 26+58, Enemy 8+17)
-        p_hp = (self.last_obs[26] + self.last_obs[58]) * 100
-        e_hp = (self.last_obs[8] + self.last_obs[17]) * 100
+        # Get raw HP for display (two active party slots, both enemies)
+        p_hp = obs_schema.party_hp(self.last_obs)[:2].sum() * 100
+        e_hp = obs_schema.enemy_hp(self.last_obs).sum() * 100
         
         print("\n" + "="*40)
         print(f"📊 DEBUG STATE:")
@@ -217,18 +218,18 @@ class PokeRogueEnv(gym.Env):
                 
                 # If the script returned null or valid data wasn't found
                 if not isinstance(raw_data, dict) or 'enemy' not in raw_data:
-                    return np.zeros(82, dtype=np.float32)
+                    return np.zeros(obs_schema.OBS_SIZE, dtype=np.float32)
 
-                self.new_obs = input_creator.create_input_vector(raw_data, self.pokemon_embeddings_data, self.move_embeddings_data)
+                self.new_obs, _ = input_creator.create_input_vector(raw_data, self.pokemon_embeddings_data, self.move_embeddings_data)
                 self.new_obs = np.array(self.new_obs, dtype=np.float32)
                 
             except WebDriverException as e:
                 # Catch "scene.currentBattle is null" errors silently
-                self.new_obs = np.zeros(82, dtype=np.float32)
+                self.new_obs = np.zeros(obs_schema.OBS_SIZE, dtype=np.float32)
                 
             except Exception as e:
                 # Catch other Python errors
                 print(f" Warning in _get_obs: {e}")
-                self.new_obs = np.zeros(82, dtype=np.float32)
+                self.new_obs = np.zeros(obs_schema.OBS_SIZE, dtype=np.float32)
                 
             return self.new_obs
\ No newline at end of file
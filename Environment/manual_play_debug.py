@@ -1,10 +1,21 @@
-import time
+import argparse
+import os
+import sys
 import numpy as np
-from environment_20 import PokeRogueEnv
 
-def main():
+# run from the repo root (python Environment/manual_play_debug.py), the env loads its data relative to it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Environment.v2PLUS.environmentv2PLUS import PokeRogueEnv
+import DataExtraction.observation_schema as obs_schema
+from trajectory_store import TRAJECTORY_DIR
+
+def main(trajectory_dir: str = TRAJECTORY_DIR):
     # 1. Start the Environment (Opens Browser)
-    env = PokeRogueEnv()
+    # every command typed in a CommandPhase is recorded (trajectory_store.py), pretrain_bc.py clones it
+    env = PokeRogueEnv(trajectory_dir=trajectory_dir)
+    if env.recorder is not None:
+        print(f"Recording to {env.recorder.path}")
     
     print("\n" + "="*40)
     print("      POKEROGUE MANUAL CONTROL      ")
@@ -26,9 +37,9 @@ def main():
     
     while True:
         # --- DISPLAY INFO (Optional: Decode the obs to see HP) ---
-        # Based on your indices:
-        p1_hp = obs[26] * 100 # Approx %
-        enemy_hp = obs[8] * 100 # Approx %
+        # Named fields, see DataExtraction/observation_schema.py
+        p1_hp = obs_schema.party_hp(obs)[0] * 100 # Approx %
+        enemy_hp = obs_schema.enemy_hp(obs)[0] * 100 # Approx %
         print(f"--- Current State ---")
         print(f"Player 1 HP: {p1_hp:.1f}% | Enemy 1 HP: {enemy_hp:.1f}%")
 
@@ -63,7 +74,7 @@ def main():
 
             if terminated:
                 print("Game Over / Battle Finished!")
-                env.reset()
+                obs, _ = env.reset()
                 total_reward = 0
 
         except ValueError:
@@ -71,7 +82,11 @@ def main():
         except Exception as e:
             print(f"Error: {e}")
 
-    env.close()
+    env.close()  # writes the last chunk of the recording
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play PokeRogue by hand through the env")
+    parser.add_argument("--record-dir", default=TRAJECTORY_DIR, help="folder for the recording of the played games")
+    parser.add_argument("--no-record", action="store_true")
+    args = parser.parse_args()
+    main(None if args.no_record else args.record_dir)
\ No newline at end of file
@@ -2,6 +2,37 @@ from settings import BUTTON_KEYCODES
 import time
 
 
+# JS für eine komplette Tastenfolge: wird mit execute_async_script ausgeführt und spielt die keyDown/keyUp Events
+# auf der Spieluhr (globalScene.time) ab. Der letzte Parameter ist der Selenium-Callback, der erst nach der letzten
+# Taste aufgerufen wird -> nur ein Round Trip pro Kombination.
+JS_PRESS_SEQUENCE = """
+    const keycodes = arguments[0];
+    const holdMs = arguments[1];
+    const gapMs = arguments[2];
+    const done = arguments[arguments.length - 1];
+    const scene = window.globalScene;
+    if (!scene || !scene.inputController) {
+        done(false);
+        return;
+    }
+    const delay = (ms, fn) => (scene.time ? scene.time.delayedCall(ms, fn) : setTimeout(fn, ms));
+    let index = 0;
+    function next() {
+        if (index >= keycodes.length) {
+            done(true);
+            return;
+        }
+        const keyCode = keycodes[index++];
+        scene.inputController.keyboardKeyDown({ keyCode: keyCode });
+        delay(holdMs, () => {
+            scene.inputController.keyboardKeyUp({ keyCode: keyCode });
+            delay(gapMs, next);
+        });
+    }
+    next();
+"""
+
+
 def press_button(driver, button_name: str, hold_ms: int = 50):
     if button_name not in BUTTON_KEYCODES:
         raise ValueError(f"Unbekannter Button: {button_name}")
@@ -32,3 +63,23 @@ def press_button(driver, button_name: str, hold_ms: int = 50):
     driver.execute_script(js_up)
 
     time.sleep(0.1)
+
+
+def press_sequence(driver, buttons: list, hold_ms: int = 50, gap_ms: int = 100) -> bool:
+    """
+    Sends a whole button combination to the browser in one call. The page replays the keyDown/keyUp events on the
+    game's own clock, python only waits once until the last key was released.
+    :param driver: the selenium driver
+    :param buttons: button names from settings.BUTTON_KEYCODES, e.g. button_combinations.FIRST_SAVE
+    :param hold_ms: how long every key is held down (game time)
+    :param gap_ms: pause after every key release (game time), same as the sleep in press_button
+    :return: False if the game had no inputController to send the keys to
+    """
+    unknown_buttons = [button_name for button_name in buttons if button_name not in BUTTON_KEYCODES]
+    if unknown_buttons:
+        raise ValueError(f"Unbekannte Buttons: {unknown_buttons}")
+    if not buttons:
+        return True
+
+    keycodes = [BUTTON_KEYCODES[button_name] for button_name in buttons]
+    return bool(driver.execute_async_script(JS_PRESS_SEQUENCE, keycodes, hold_ms, gap_ms))
@@ -0,0 +1,477 @@
+"""
+Headless battle simulator with the interface of PokeRogueEnv, for pretraining and hyperparameter search without a browser.
+
+The simulator builds scene dicts in the shape of __GLOBAL_SCENE_DATA__ (DataExtraction/v3/global-scene.ts), so the
+observation (ObservationEncoder, same floats as create_input_vector), the action space MultiDiscrete([4, 2, 4, 2]),
+the action mask and the reward (reward.reward_components) are exactly the ones of the real env.
+Data: base stats and types from pokedex_data.json, power/accuracy/type/priority/pp/hits/drain from collected_move_data.json,
+type effectiveness from settings.type_matrix (Embeddings/type_effectiveness.py).
+
+A simplified PokeRogue run:
+- party of party_size pokemon (bst <= STARTER_MAX_BST) with up to four attacking moves, level START_LEVEL
+- every wave 1 enemy (2 in a double fight) of level START_LEVEL + wave - 1, stronger species in later waves
+- damage formula of the main games (STAB, type effectiveness, crits, random factor), order by priority and speed
+- fainted actives are replaced by a random alive party member (like phase_handler's SwitchPhase), the party gains a
+  level per cleared wave and is healed when a tenth wave starts (the reward expects that), the run ends when all fainted
+Not simulated: status moves, abilities, items, stat stages, weather, catching and the shop.
+
+    env = SimulatedPokeRogueEnv()
+    vec_env = make_simulated_vec_env(16)        # 16 simulators in one process, subprocess=True for several cores
+    env.step(env.simulator.greedy_action())    # heuristic policy, record_heuristic_games.py records it for pretrain_bc.py
+    python -m Environment.v2PLUS.battle_simulator   # steps/sec
+"""
+import bisect
+import functools
+import json
+import random
+import time
+from collections import namedtuple
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+
+import DataExtraction.observation_schema as obs_schema
+from DataExtraction.observation_encoder import IdObservationEncoder, IncrementalObservationEncoder
+from Embeddings import embedding_store
+from Embeddings.type_effectiveness import (COMBINATION_INDEX, MOVE_DATA_PATH, NO_TYPE, POKEAPI_TYPE_NAMES, POKEDEX_PATH, STATUS_DAMAGE_CLASS,
+                                           TYPE_NAMES, build_effectiveness_table, pokedex_form_keys)
+from Environment.v2PLUS import reward as reward_function
+from telemetry import TelemetryWriter
+from trajectory_store import TrajectoryRecorder
+
+START_LEVEL = 5
+MAX_LEVEL = 100
+IV = 15
+STARTER_MAX_BST = 420
+SPECIAL_DAMAGE_CLASS = 3  # PokeAPI: 1 status, 2 physical, 3 special
+CRIT_CHANCE = [1 / 24, 1 / 8, 1 / 2, 1.0]  # per crit stage
+
+Species = namedtuple("Species", ["dex", "types", "combination", "base_stats", "bst"])
+Move = namedtuple("Move", ["id", "power", "accuracy", "type", "special", "priority", "pp", "min_hits", "max_hits", "drain", "crit_rate"])
+# used when no move has pp left, typeless with recoil
+STRUGGLE = Move(165, 50, 0, NO_TYPE, False, 0, 1, 0, 0, -25, 0)
+
+
+class BattleData:
+    """Species and moves as the simulator needs them, loaded once per process (load_battle_data)"""
+
+    def __init__(self, pokedex_data: list, move_data: dict):
+        self.effectiveness = build_effectiveness_table().tolist()  # [attacking type][defender combination]
+        self.species = []
+        for key, pkm in zip(pokedex_form_keys(pokedex_data), pokedex_data):
+            if not key.endswith("-0"):
+                continue  # forms (mega, gigantamax, ...) are not spawned
+            types = (pkm["t1"], pkm.get("t2", pkm["t1"]))
+            base_stats = (pkm["hp"], pkm["atk"], pkm["def"], pkm["spa"], pkm["spd"], pkm["spe"])
+            self.species.append(Species(pkm["dex"], types, int(COMBINATION_INDEX[types]), base_stats, pkm["bst"]))
+        self.species.sort(key=lambda species: species.bst)
+
+        self.moves = {}
+        for move_id, move in move_data.items():
+            # status moves and moves without fixed power (OHKO, fixed damage, ...) are left out
+            if (move["damage_class"] == STATUS_DAMAGE_CLASS or move["power"] <= 0 or not 1 <= move["type"] <= len(POKEAPI_TYPE_NAMES)
+                    or int(move_id) == STRUGGLE.id):
+                continue
+            self.moves[int(move_id)] = Move(int(move_id), move["power"], move["accuracy"], TYPE_NAMES.index(POKEAPI_TYPE_NAMES[move["type"] - 1]),
+                                            move["damage_class"] == SPECIAL_DAMAGE_CLASS, move["priority"], max(1, move["pp"]),
+                                            move["min_hits"], move["max_hits"], move["drain"], move["crit_rate"])
+
+    def known_to(self, encoder):
+        """only species and moves the encoder has embeddings for, :return: (species sorted by bst, moves sorted by power)"""
+        species = [entry for entry in self.species if (entry.dex, 0) in encoder._pokemon_index]
+        moves = sorted((move for move in self.moves.values() if encoder.move_row(move.id) > 0), key=lambda move: move.power)
+        return species, moves
+
+
+@functools.lru_cache(maxsize=1)
+def load_battle_data(pokedex_path: str = POKEDEX_PATH, move_data_path: str = MOVE_DATA_PATH) -> BattleData:
+    with open(pokedex_path, "r") as f:
+        pokedex_data = json.loads(f.read())
+    with open(move_data_path, "r") as f:
+        move_data = json.loads(f.read())
+    return BattleData(pokedex_data, move_data)
+
+
+def create_encoder(type_effectiveness: bool = False, id_observations: bool = False):
+    """same encoder as PokeRogueEnv, from the embedding store if it is up to date"""
+    encoder_class = IdObservationEncoder if id_observations else IncrementalObservationEncoder
+    store = embedding_store.load_current()
+    if store is not None:
+        return encoder_class.from_store(store, type_effectiveness=type_effectiveness)
+    pokemon_embeddings_data, move_embeddings_data = _load_embedding_dicts()
+    return encoder_class.from_embeddings(pokemon_embeddings_data, move_embeddings_data, type_effectiveness=type_effectiveness)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_embedding_dicts() -> tuple:
+    with open(embedding_store.POKEMON_EMBEDDINGS_PATH, "r") as f:
+        pokemon_embeddings_data = json.loads(f.read())
+    with open(embedding_store.MOVE_EMBEDDINGS_PATH, "r") as f:
+        move_embeddings_data = json.loads(f.read())
+    return pokemon_embeddings_data, move_embeddings_data
+
+
+def calculate_stats(base_stats: tuple, level: int) -> list:
+    """[hp, atk, def, spa, spd, spe] with fixed IVs, no EVs and a neutral nature"""
+    stats = [(2 * base + IV) * level // 100 + 5 for base in base_stats]
+    stats[0] += level + 5  # hp: + level + 10 instead of + 5
+    return stats
+
+
+class Combatant:
+    __slots__ = ["id", "species", "level", "stats", "hp", "moves", "pp"]
+
+    def __init__(self, pkm_id: int, species: Species, level: int, moves: list):
+        self.id = pkm_id
+        self.species = species
+        self.level = level
+        self.stats = calculate_stats(species.base_stats, level)
+        self.hp = self.stats[0]
+        self.moves = moves
+        self.pp = [move.pp for move in moves]
+
+    def level_up(self):
+        if self.level >= MAX_LEVEL:
+            return
+        old_max_hp = self.stats[0]
+        self.level += 1
+        self.stats = calculate_stats(self.species.base_stats, self.level)  # new list, the encoder cache keys on the values
+        if self.hp > 0:
+            self.hp += self.stats[0] - old_max_hp
+
+    def heal(self):
+        self.hp = self.stats[0]
+        self.pp = [move.pp for move in self.moves]
+
+    def usable_move(self, slot: int) -> int:
+        """the chosen slot if it has pp left, else the first that has, -1 = only Struggle"""
+        if slot < len(self.moves) and self.pp[slot] > 0:
+            return slot
+        for other, pp in enumerate(self.pp):
+            if pp > 0:
+                return other
+        return -1
+
+
+class BattleSimulator:
+    def __init__(self, data: BattleData, encoder, party_size: int = 6, double_fight_chance: float = 0.25):
+        """
+        :param encoder: only species and moves with an embedding in it are used
+        :param party_size: pokemon in the party at the start of a run, 1-6
+        :param double_fight_chance: probability of a wave being a double fight
+        """
+        self.data = data
+        self.species, self.moves = data.known_to(encoder)
+        self._species_bst = [species.bst for species in self.species]
+        self._move_power = [move.power for move in self.moves]
+        self._moves_by_type = {}
+        for move in self.moves:
+            self._moves_by_type.setdefault(move.type, []).append(move)
+        self.party_size = party_size
+        self.double_fight_chance = double_fight_chance
+        self.rng = random.Random()
+        self.party = []
+        self.enemies = []
+        self.wave = 1
+        self.double = False
+        self.seq = 0
+        self._next_id = 1
+
+    def new_run(self, rng: random.Random = None):
+        if rng is not None:
+            self.rng = rng
+        self.wave = 1
+        self._next_id = 1
+        starters = self.species[:max(1, bisect.bisect_right(self._species_bst, STARTER_MAX_BST))]
+        self.party = [self._create(self.rng.choice(starters), START_LEVEL) for _ in range(self.party_size)]
+        self._spawn_wave()
+
+    def _create(self, species: Species, level: int) -> Combatant:
+        pkm_id = self._next_id
+        self._next_id += 1
+        return Combatant(pkm_id, species, level, self._moveset(species, level))
+
+    def _moveset(self, species: Species, level: int) -> list:
+        """up to two attacking moves of its own types, the rest random, move power grows with the level"""
+        max_power = 40 + 2 * level
+        candidates = self.moves[:max(4, bisect.bisect_right(self._move_power, max_power))]
+        stab = [move for move_type in set(species.types) for move in self._moves_by_type.get(move_type, []) if move.power <= max_power]
+        moves = self.rng.sample(stab, min(2, len(stab)))
+        while len(moves) < 4:
+            move = self.rng.choice(candidates)
+            if move not in moves:
+                moves.append(move)
+        return moves
+
+    def _spawn_wave(self):
+        self.double = self.rng.random() < self.double_fight_chance
+        level = min(MAX_LEVEL, START_LEVEL + self.wave - 1)
+        max_bst = 300 + 10 * self.wave
+        pool = self.species[:max(1, bisect.bisect_right(self._species_bst, max_bst))]
+        self.enemies = [self._create(self.rng.choice(pool), level) for _ in range(2 if self.double else 1)]
+        self._replace_fainted()
+
+    @property
+    def actives(self) -> int:
+        return 2 if self.double else 1
+
+    def _replace_fainted(self):
+        """fainted actives are switched with a random alive party member behind them"""
+        for slot in range(min(self.actives, len(self.party))):
+            if self.party[slot].hp <= 0:
+                bench = [index for index in range(self.actives, len(self.party)) if self.party[index].hp > 0]
+                if bench:
+                    index = self.rng.choice(bench)
+                    self.party[slot], self.party[index] = self.party[index], self.party[slot]
+
+    def damage(self, attacker: Combatant, defender: Combatant, move: Move) -> int:
+        multiplier = self.data.effectiveness[move.type][defender.species.combination] if move.type != NO_TYPE else 1.0
+        if multiplier == 0:
+            return 0
+        if move.type in attacker.species.types:
+            multiplier *= 1.5
+        if self.rng.random() < CRIT_CHANCE[min(move.crit_rate, 3)]:
+            multiplier *= 1.5
+        attack, defense = (attacker.stats[3], defender.stats[4]) if move.special else (attacker.stats[1], defender.stats[2])
+        base = (2 * attacker.level / 5 + 2) * move.power * attack / max(1, defense) / 50 + 2
+        return max(1, int(base * multiplier * self.rng.uniform(0.85, 1.0)))
+
+    def expected_damage(self, attacker: Combatant, defender: Combatant, move: Move) -> float:
+        """damage without crits and random factor, weighted by accuracy and hits; does not touch the rng"""
+        multiplier = self.data.effectiveness[move.type][defender.species.combination] if move.type != NO_TYPE else 1.0
+        if move.type in attacker.species.types:
+            multiplier *= 1.5
+        attack, defense = (attacker.stats[3], defender.stats[4]) if move.special else (attacker.stats[1], defender.stats[2])
+        hits = (move.min_hits + move.max_hits) / 2 if move.max_hits > 1 else 1
+        accuracy = move.accuracy / 100 if move.accuracy else 1.0
+        return ((2 * attacker.level / 5 + 2) * move.power * attack / max(1, defense) / 50 + 2) * multiplier * hits * accuracy
+
+    def greedy_action(self) -> np.ndarray:
+        """
+        Heuristic policy: every active uses the move and target with the highest expected_damage.
+        :return: action of play_turn, [P1 move, P1 target, P2 move, P2 target]
+        """
+        action = np.zeros(4, dtype=np.int64)
+        for slot, pkm in enumerate(self.party[:self.actives]):
+            best = 0.0
+            for move_slot, move in enumerate(pkm.moves):
+                if pkm.pp[move_slot] <= 0:
+                    continue
+                for target, enemy in enumerate(self.enemies):
+                    damage = self.expected_damage(pkm, enemy, move)
+                    if damage > best:
+                        best = damage
+                        action[2 * slot:2 * slot + 2] = move_slot, target
+        return action
+
+    def _use_move(self, attacker: Combatant, slot: int, targets: list, target: int):
+        """
+        :param slot: move slot, -1 = Struggle
+        :param targets: active pokemon of the other side, target is the index in it, a fainted target is replaced by the other one
+        """
+        alive = [pkm for pkm in targets if pkm.hp > 0]
+        if not alive:
+            return
+        defender = targets[target] if target < len(targets) and targets[target].hp > 0 else self.rng.choice(alive)
+        if slot >= 0:
+            move = attacker.moves[slot]
+            attacker.pp[slot] -= 1
+        else:
+            move = STRUGGLE
+        if move.accuracy and self.rng.random() * 100 >= move.accuracy:
+            return
+        hits = self.rng.randint(move.min_hits, move.max_hits) if move.max_hits > 1 else 1
+        dealt = 0
+        for _ in range(hits):
+            damage = min(defender.hp, self.damage(attacker, defender, move))
+            defender.hp -= damage
+            dealt += damage
+            if defender.hp <= 0:
+                break
+        if move.drain:
+            attacker.hp = max(0, min(attacker.stats[0], attacker.hp + dealt * move.drain // 100))
+
+    def play_turn(self, action) -> bool:
+        """
+        One CommandPhase: our actives use the moves of action, every enemy a random move on a random active.
+        :param action: [P1 move, P1 target, P2 move, P2 target]
+        :return: True if the whole party fainted (game over)
+        """
+        rng = self.rng
+        actives = [pkm for pkm in self.party[:self.actives]]
+        turns = []  # (priority, speed, tie break, attacker, move slot, targets, target)
+        for slot, pkm in enumerate(actives):
+            if pkm.hp > 0:
+                move_slot = pkm.usable_move(int(action[2 * slot]))
+                target = int(action[2 * slot + 1]) if self.double else 0
+                turns.append((pkm.moves[move_slot].priority if move_slot >= 0 else 0, pkm.stats[5], rng.random(), pkm, move_slot, self.enemies, target))
+        for pkm in self.enemies:
+            if pkm.hp > 0:
+                move_slot = pkm.usable_move(rng.randrange(len(pkm.moves)))
+                turns.append((pkm.moves[move_slot].priority if move_slot >= 0 else 0, pkm.stats[5], rng.random(), pkm, move_slot, actives,
+                              rng.randrange(len(actives))))
+        turns.sort(key=lambda turn: turn[:3], reverse=True)
+        for _, _, _, attacker, move_slot, targets, target in turns:
+            if attacker.hp > 0:
+                self._use_move(attacker, move_slot, targets, target)
+
+        self.seq += 1
+        if all(pkm.hp <= 0 for pkm in self.party):
+            return True
+        self.enemies = [pkm for pkm in self.enemies if pkm.hp > 0]  # fainted enemies leave the field
+        if not self.enemies:
+            self.wave += 1
+            for pkm in self.party:
+                pkm.level_up()
+                if self.wave % 10 == 0:
+                    pkm.heal()
+            self._spawn_wave()
+        else:
+            self._replace_fainted()
+        return False
+
+    def scene(self, phase_name: str = "CommandPhase") -> dict:
+        """state in the shape of __GLOBAL_SCENE_DATA__"""
+        return {
+            "phase": {"phaseName": phase_name, "moveId": False, "partyMemberIndex": False, "seq": self.seq},
+            "metaData": {"waveIndex": self.wave, "isDoubleFight": self.double},
+            "shopItems": [],
+            "enemy": [{"id": pkm.id, "dex_nr": pkm.species.dex, "formIndex": 0, "hp": pkm.hp, "stats": pkm.stats} for pkm in self.enemies],
+            "player": [{"id": pkm.id, "dex_nr": pkm.species.dex, "formIndex": 0, "hp": pkm.hp,
+                        "moveset": [{"id": move.id, "pp": pp} for move, pp in zip(pkm.moves, pkm.pp)], "stats": pkm.stats,
+                        "visible": slot < self.actives} for slot, pkm in enumerate(self.party)],
+        }
+
+
+class SimulatedPokeRogueEnv(gym.Env):
+    def __init__(self, worker_id: int = 0, type_effectiveness: bool = False, id_observations: bool = False, party_size: int = 6,
+                 double_fight_chance: float = 0.25, max_waves: int = None, telemetry_dir: str = None, trajectory_dir: str = None):
+        """
+        Same spaces, observations, info and reward as PokeRogueEnv.
+        :param max_waves: truncate a run after this wave, None = play until the party fainted
+        :param telemetry_dir: per-step telemetry (telemetry.py), off by default, thousands of steps/sec make big files
+        :param trajectory_dir: record the games (trajectory_store.py), e.g. of a heuristic policy for pretrain_bc.py
+        """
+        super(SimulatedPokeRogueEnv, self).__init__()
+        self.worker_id = worker_id
+        self.action_space = spaces.MultiDiscrete([4, 2, 4, 2])
+        self.observation_space = obs_schema.observation_space(type_effectiveness=type_effectiveness, ids=id_observations)
+        self.encoder = create_encoder(type_effectiveness, id_observations)
+        self.simulator = BattleSimulator(load_battle_data(), self.encoder, party_size, double_fight_chance)
+        self.max_waves = max_waves
+        self.last_meta_data = dict()
+        self.new_meta_data = dict()
+        self.new_obs = None
+        self.terminated = False
+        self.truncated = False
+        self.reward = 0.0
+        self.reward_components = dict.fromkeys(reward_function.COMPONENTS, 0.0)
+        self.episode = -1
+        self.episode_step = 0
+        self.step_latency = 0.0
+        self.telemetry = TelemetryWriter(telemetry_dir, worker_id=worker_id) if telemetry_dir is not None else None
+        self.recorder = TrajectoryRecorder(self.encoder.obs_size, trajectory_dir, worker_id=worker_id) if trajectory_dir is not None else None
+
+    def _encode(self, scene: dict):
+        # own array per step, like PokeRogueEnv
+        self.new_obs, self.new_meta_data = self.encoder.encode(scene, out=np.empty(self.encoder.obs_size, dtype=np.float32))
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.simulator.new_run(random.Random(int(self.np_random.integers(2 ** 63))))
+        scene = self.simulator.scene()
+        self._encode(scene)
+        self.last_meta_data = self.new_meta_data
+        self.reward = 0.0
+        self.terminated = False
+        self.truncated = False
+        self.episode += 1
+        self.episode_step = 0
+        if self.recorder is not None:
+            self.recorder.start_episode(scene, self.new_obs)
+        return self.new_obs, {}
+
+    def step(self, action):
+        step_start = time.perf_counter()
+        self.terminated = self.simulator.play_turn(action)
+        scene = self.simulator.scene("GameOverPhase" if self.terminated else "CommandPhase")
+        self._encode(scene)
+        self.reward_components = reward_function.reward_components(self.last_meta_data, self.new_meta_data)
+        self.reward = reward_function.total_reward(self.reward_components)
+        self.last_meta_data = self.new_meta_data
+        self.truncated = self.max_waves is not None and self.simulator.wave > self.max_waves and not self.terminated
+        self.episode_step += 1
+        self.step_latency = time.perf_counter() - step_start
+        info = self._get_info()
+        if self.recorder is not None:
+            self.recorder.record_step(scene, self.new_obs, action, self.reward, self.terminated)
+        if self.telemetry is not None:
+            self.telemetry.write(dict(info))
+        return self.new_obs, self.reward, self.terminated, self.truncated, info
+
+    def action_masks(self) -> np.ndarray:
+        """see PokeRogueEnv.action_masks"""
+        mask = self.new_meta_data.get("action_mask")
+        if mask is None:
+            return np.ones(int(self.action_space.nvec.sum()), dtype=bool)
+        return np.array(mask, dtype=bool)
+
+    def _get_info(self) -> dict:
+        """same keys as PokeRogueEnv._get_info"""
+        return {"time": time.time(), "worker": self.worker_id, "episode_index": self.episode, "episode_step": self.episode_step,
+                "reward": self.reward, "components": self.reward_components, "stage": self.new_meta_data["stage"],
+                "phase": self.new_meta_data.get("phaseName"), "step_latency": self.step_latency, "terminated": bool(self.terminated),
+                "encoder_cache": self.encoder.cache_stats()}
+
+    def close(self):
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+def make_simulated_vec_env(n_envs: int, seed: int = 0, subprocess: bool = False, start_method: str = "spawn", **env_kwargs):
+    """
+    :param n_envs: number of simulators
+    :param subprocess: one process per simulator (SubprocVecEnv) to use several cores, else all in this process (DummyVecEnv)
+    :param env_kwargs: further SimulatedPokeRogueEnv options
+    """
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+    env_fns = [functools.partial(SimulatedPokeRogueEnv, worker_id=worker_id, **env_kwargs) for worker_id in range(n_envs)]
+    vec_env = SubprocVecEnv(env_fns, start_method=start_method) if subprocess else DummyVecEnv(env_fns)
+    vec_env.seed(seed)
+    return vec_env
+
+
+def benchmark(n_steps: int = 20000, n_envs: int = 16, seed: int = 0) -> dict:
+    """random actions, :return: steps/sec of one env and of a DummyVecEnv with n_envs (one core)"""
+    results = {}
+    env = SimulatedPokeRogueEnv()
+    env.action_space.seed(seed)
+    env.reset(seed=seed)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        if terminated or truncated:
+            episodes += 1
+            env.reset()
+    results["env"] = n_steps / (time.perf_counter() - start)
+    print(f"single env: {results['env']:.0f} steps/sec, {episodes} runs, {n_steps / max(1, episodes):.0f} steps per run")
+
+    vec_env = make_simulated_vec_env(n_envs, seed=seed)
+    vec_env.reset()
+    actions = np.array([vec_env.action_space.sample() for _ in range(n_envs)])
+    start = time.perf_counter()
+    for _ in range(n_steps // n_envs):
+        vec_env.step(actions)
+    results["vec_env"] = n_steps // n_envs * n_envs / (time.perf_counter() - start)
+    print(f"DummyVecEnv({n_envs}): {results['vec_env']:.0f} steps/sec")
+    vec_env.close()
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
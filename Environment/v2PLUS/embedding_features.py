@@ -0,0 +1,95 @@
+"""
+Features extractor for the id observations (PokeRogueEnv(id_observations=True), IdObservationEncoder).
+The pokemon and move ids are looked up in nn.Embedding tables that start as the PCA embeddings of the embedding store
+and are trained with the policy. The output has the layout of the embedding observation (210 / 226 floats), so with
+the initial weights the policy sees exactly what it would see with the precomputed embeddings.
+
+    model = PPO("MlpPolicy", env, policy_kwargs=dict(features_extractor_class=EmbeddingFeaturesExtractor))
+"""
+import json
+
+import gymnasium as gym
+import numpy as np
+import torch
+import torch.nn as nn
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+from DataExtraction import observation_schema as obs_schema
+from Embeddings import embedding_store
+
+
+def load_tables(store_path: str = embedding_store.STORE_PATH) -> tuple:
+    """(pokemon_table, move_table) in the row order of the encoder, move row 0 is the zero row"""
+    from DataExtraction.observation_encoder import ObservationEncoder
+
+    store = embedding_store.load_current(store_path)
+    if store is not None:
+        return np.array(store.pokemon_table), np.array(store.move_table)
+    with open(embedding_store.POKEMON_EMBEDDINGS_PATH, "r") as f:
+        pokemon_embeddings_data = json.loads(f.read())
+    with open(embedding_store.MOVE_EMBEDDINGS_PATH, "r") as f:
+        move_embeddings_data = json.loads(f.read())
+    encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data)
+    return encoder.pokemon_table, encoder.move_table
+
+
+class EmbeddingFeaturesExtractor(BaseFeaturesExtractor):
+    def __init__(self, observation_space: gym.spaces.Box, pokemon_table: np.ndarray = None, move_table: np.ndarray = None,
+                 store_path: str = embedding_store.STORE_PATH, freeze: bool = False):
+        """
+        :param pokemon_table: (rows, 8) initial pokemon embeddings, None = from the embedding store
+        :param move_table: (rows, 4) initial move embeddings with the zero row 0, None = from the embedding store
+        :param freeze: keep the embeddings fixed (then it is the embedding observation, just with smaller rollout buffers)
+        """
+        type_effectiveness = observation_space.shape[0] == obs_schema.ID_EFFECTIVENESS_OBS_SIZE
+        if observation_space.shape[0] != obs_schema.obs_size(type_effectiveness, ids=True):
+            raise ValueError(f"Expected an id observation space, got shape {observation_space.shape}")
+        super().__init__(observation_space, obs_schema.obs_size(type_effectiveness))
+
+        if pokemon_table is None or move_table is None:
+            pokemon_table, move_table = load_tables(store_path)
+        # pokemon id 0 is the empty slot, the table rows start at id 1
+        pokemon_weights = np.zeros((len(pokemon_table) + 1, obs_schema.POKEMON_EMBEDDING_SIZE), dtype=np.float32)
+        pokemon_weights[1:] = pokemon_table
+        self.pokemon_embedding = nn.Embedding.from_pretrained(torch.from_numpy(pokemon_weights), freeze=freeze, padding_idx=0)
+        self.move_embedding = nn.Embedding.from_pretrained(torch.as_tensor(np.asarray(move_table, dtype=np.float32)), freeze=freeze,
+                                                           padding_idx=0)
+
+        pokemon_columns = obs_schema.id_columns("pokemon", type_effectiveness)
+        move_columns = obs_schema.id_columns("moves", type_effectiveness)
+        id_columns = set(pokemon_columns.tolist()) | set(move_columns.tolist())
+        scalar_columns = np.array([column for column in range(observation_space.shape[0]) if column not in id_columns], dtype=np.int64)
+        self.register_buffer("pokemon_columns", torch.from_numpy(pokemon_columns), persistent=False)
+        self.register_buffer("move_columns", torch.from_numpy(move_columns), persistent=False)
+        self.register_buffer("scalar_columns", torch.from_numpy(scalar_columns), persistent=False)
+        self.register_buffer("order", torch.from_numpy(self._feature_order(type_effectiveness)), persistent=False)
+
+    @staticmethod
+    def _feature_order(type_effectiveness: bool) -> np.ndarray:
+        """
+        forward concatenates [pokemon embeddings, move embeddings, scalars],
+        order[i] = position in that concatenation of float i of the embedding observation
+        """
+        size = obs_schema.obs_size(type_effectiveness)
+        # every float of the embedding layout gets its own number, read back through the named views of both layouts
+        source = obs_schema.observation_view(np.arange(size, dtype=np.float32))
+        ids = np.zeros(obs_schema.obs_size(type_effectiveness, ids=True), dtype=np.float32)
+        target = obs_schema.observation_view(ids)
+        for segment in ("enemies", "party"):
+            for name in target[segment].dtype.names:
+                if name not in obs_schema.ID_FIELDS:
+                    target[segment][name] = source[segment][name]
+        if type_effectiveness:
+            target["effectiveness"] = source["effectiveness"]
+        pokemon = np.concatenate([source["enemies"]["embedding"], source["party"]["embedding"]]).reshape(-1)
+        moves = source["party"]["moves"].reshape(-1)
+        scalars = np.delete(ids, np.concatenate([obs_schema.id_columns(field, type_effectiveness) for field in obs_schema.ID_FIELDS]))
+        concatenation = np.concatenate([pokemon, moves, scalars]).astype(np.int64)
+        order = np.empty(size, dtype=np.int64)
+        order[concatenation] = np.arange(size)
+        return order
+
+    def forward(self, observations: torch.Tensor) -> torch.Tensor:
+        pokemon = self.pokemon_embedding(observations[:, self.pokemon_columns].long()).flatten(1)
+        moves = self.move_embedding(observations[:, self.move_columns].long()).flatten(1)
+        return torch.cat([pokemon, moves, observations[:, self.scalar_columns]], dim=1)[:, self.order]
@@ -0,0 +1,101 @@
+"""
+Pool of N PokeRogue games for vectorized training.
+Every worker runs in its own process with its own firefox profile (and therefore its own localStorage save).
+"""
+import logging
+import os
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+from Environment.v2PLUS.environmentv2PLUS import PokeRogueEnv
+
+logger = logging.getLogger(__name__)
+
+# every worker gets browser_profiles/worker_<id>
+PROFILE_ROOT = "browser_profiles"
+
+
+class IsolatedWorkerEnv(gym.Env):
+    """
+    Wraps one PokeRogueEnv and restarts its browser if the game or the driver crashes.
+    A crash ends the current episode (truncated=True) instead of taking the whole VecEnv down.
+    """
+
+    def __init__(self, worker_id: int, profile_dir: str, turbo: bool = False, max_restarts: int = 5, **env_kwargs):
+        """:param env_kwargs: further PokeRogueEnv options, e.g. type_effectiveness"""
+        super(IsolatedWorkerEnv, self).__init__()
+        self.worker_id = worker_id
+        self.profile_dir = profile_dir
+        self.turbo = turbo
+        self.max_restarts = max_restarts
+        self.env_kwargs = env_kwargs
+        self.restarts = 0
+        self.env = PokeRogueEnv(worker_id=worker_id, profile_dir=profile_dir, turbo=turbo, **env_kwargs)
+        self.action_space = self.env.action_space
+        self.observation_space = self.env.observation_space
+        self.last_obs = np.zeros(self.observation_space.shape, dtype=np.float32)
+
+    def _restart(self, error: Exception):
+        self.restarts += 1
+        logger.error(f"Worker {self.worker_id} crashed ({error}) - restart {self.restarts}/{self.max_restarts}")
+        if self.restarts > self.max_restarts:
+            raise RuntimeError(f"Worker {self.worker_id} crashed more than {self.max_restarts} times") from error
+        try:
+            self.env.close()
+        except Exception as close_error:
+            logger.warning(f"Worker {self.worker_id} could not close its browser: {close_error}")
+        self.env = PokeRogueEnv(worker_id=self.worker_id, profile_dir=self.profile_dir, turbo=self.turbo, **self.env_kwargs)
+
+    def reset(self, seed=None, options=None):
+        try:
+            obs, info = self.env.reset(seed=seed, options=options)
+        except Exception as e:
+            self._restart(e)
+            obs, info = self.env.reset(seed=seed, options=options)
+        self.last_obs = obs
+        return obs, info
+
+    def step(self, action):
+        try:
+            obs, reward, terminated, truncated, info = self.env.step(action)
+        except Exception as e:
+            self._restart(e)
+            return self.last_obs, 0.0, False, True, {"worker_id": self.worker_id, "worker_failure": str(e)}
+        self.last_obs = obs
+        return obs, reward, terminated, truncated, info
+
+    def action_masks(self) -> np.ndarray:
+        return self.env.action_masks()
+
+    def close(self):
+        self.env.close()
+
+
+def make_env(worker_id: int, profile_root: str = PROFILE_ROOT, turbo: bool = False, **env_kwargs):
+    """:return: factory for one isolated worker, as needed by the SB3 VecEnvs"""
+    def _init():
+        return IsolatedWorkerEnv(worker_id, os.path.join(profile_root, f"worker_{worker_id}"), turbo=turbo, **env_kwargs)
+    return _init
+
+
+def make_vec_env(n_envs: int, seed: int = 0, profile_root: str = PROFILE_ROOT, turbo: bool = False, start_method: str = "spawn",
+                 **env_kwargs):
+    """
+    Starts n_envs game workers and exposes them as one SB3 VecEnv.
+    :param n_envs: number of browsers/games
+    :param seed: worker i is seeded with seed + i
+    :param profile_root: folder for the per-worker firefox profiles
+    :param turbo: run all workers headless in turbo mode
+    :param start_method: multiprocessing start method, spawn works on Windows and Linux
+    :param env_kwargs: further PokeRogueEnv options for every worker
+    :return: SubprocVecEnv (DummyVecEnv for a single worker)
+    """
+    env_fns = [make_env(worker_id, profile_root, turbo, **env_kwargs) for worker_id in range(n_envs)]
+    if n_envs == 1:
+        vec_env = DummyVecEnv(env_fns)
+    else:
+        vec_env = SubprocVecEnv(env_fns, start_method=start_method)
+    vec_env.seed(seed)
+    return vec_env
@@ -5,6 +5,7 @@ import gymnasium as gym  # <--- WE MUST USE GYMNASIUM
 from gymnasium import spaces # <--- NOT GYM
 import numpy as np
 import json
+import random
 import time
 import keyboard
 import sys
@@ -23,11 +24,16 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 # Import modules from AIAgentAsh package
 try:
     from DataExtraction.automated_session_startup import setup_driver
-    import settings
     import button_combinations
-    import DataExtraction.create_input as input_creator
-    from Environment.send_key_inputs import press_button
+    from DataExtraction.observation_encoder import IdObservationEncoder, IncrementalObservationEncoder
+    import DataExtraction.observation_schema as obs_schema
+    from Embeddings import embedding_store
+    from Environment.send_key_inputs import press_sequence
+    from telemetry import TelemetryWriter, TELEMETRY_DIR
+    from trajectory_store import TrajectoryRecorder
     from . import phase_handler
+    from . import reward as reward_function
+    from . import session_snapshot
 except ModuleNotFoundError as e:
     # Fallback: try importing with relative path adjustment
     print(f"Warning: Import error detected: {e}")
@@ -38,91 +44,122 @@ except ModuleNotFoundError as e:
 
 
 class PokeRogueEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, worker_id: int = 0, profile_dir: str = None, turbo: bool = False, backend: str = "selenium",
+                 reset_snapshot_path: str = None, type_effectiveness: bool = False, id_observations: bool = False,
+                 telemetry_dir: str = TELEMETRY_DIR, trajectory_dir: str = None):
+        """
+        :param worker_id: index of this env in a vectorized pool (see env_pool.py)
+        :param profile_dir: own firefox profile for this env, None = temporary profile
+        :param turbo: headless browser with a faster game clock and without rendering
+        :param backend: "selenium" or "cdp", see Environment/browser_driver.py
+        :param reset_snapshot_path: session snapshot (see capture_reset_snapshot) that every new run starts from
+        :param type_effectiveness: append the type effectiveness block to the observation (226 instead of 210 floats)
+        :param id_observations: pokemon/move ids instead of the embeddings (82 instead of 210 floats),
+                                for a policy with Environment/v2PLUS/embedding_features.EmbeddingFeaturesExtractor
+        :param telemetry_dir: folder for the per-step telemetry (telemetry.py), None = no telemetry
+        :param trajectory_dir: record scenes, observations, actions and rewards there (trajectory_store.py), None = no recording
+        """
         super(PokeRogueEnv, self).__init__()
+        self.worker_id = worker_id
 
         # --- 1. Define Action Space (Multi-Head) ---
         # [P1 Move (0-3), P1 Target (0-1), P2 Move (0-3), P2 Target (0-1)]
         self.action_space = spaces.MultiDiscrete([4, 2, 4, 2])
         # --- 2. Define Observation Space ---
-        # Size 210 floats as calculated
-        self.observation_space = spaces.Box(low=-100, high=100, shape=(210,), dtype=np.float32)
+        # Layout and size see DataExtraction/observation_schema.py
+        self.observation_space = obs_schema.observation_space(type_effectiveness=type_effectiveness, ids=id_observations)
         self.last_obs = []
         self.new_obs = []
         self.last_meta_data = dict()
         self.new_meta_data = dict()
         self.terminated = False
         self.truncated = False
-        self.driver = setup_driver()
+        self.driver = setup_driver(profile_dir=profile_dir, turbo=turbo, backend=backend, worker_id=worker_id)
         self.reward = 0.0  # Store reward for debugging display
-        self.all_infos = []
+        self.reward_components = dict.fromkeys(reward_function.COMPONENTS, 0.0)
+        self.episode = -1
+        self.episode_step = 0
+        self.step_latency = 0.0
+        self.telemetry = TelemetryWriter(telemetry_dir, worker_id=worker_id) if telemetry_dir is not None else None
+        self.reset_snapshot = None
+        if reset_snapshot_path is not None and os.path.exists(reset_snapshot_path):
+            self.reset_snapshot = session_snapshot.load_snapshot(reset_snapshot_path)
+            print(f"Loaded reset snapshot (wave {self.reset_snapshot['wave']}).")
 
-        with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
-            self.pokemon_embeddings_data = json.loads(f.read())
-            print(f"Loaded {len(self.pokemon_embeddings_data)} Pokemon embeddings.")
-        with open("Embeddings/moves/move_embeddings.json", "r") as f:
-            self.move_embeddings_data = json.loads(f.read())
-            print(f"Loaded {len(self.move_embeddings_data)} Move embeddings.")
+        # ids are cheap to write, the slot cache only pays off for the embeddings
+        encoder_class = IdObservationEncoder if id_observations else IncrementalObservationEncoder
+        store = embedding_store.load_current()  # None if missing or older than the JSONs
+        if store is not None:
+            # memory-mapped tables, shared by all workers; the dicts are only needed without encoder
+            self.pokemon_embeddings_data = None
+            self.move_embeddings_data = None
+            self.encoder = encoder_class.from_store(store, type_effectiveness=type_effectiveness)
+            print(f"Loaded {store.pokemon_table.shape[0]} Pokemon and {store.move_table.shape[0] - 1} Move embeddings from the embedding store.")
+        else:
+            with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+                self.pokemon_embeddings_data = json.loads(f.read())
+                print(f"Loaded {len(self.pokemon_embeddings_data)} Pokemon embeddings.")
+            with open("Embeddings/moves/move_embeddings.json", "r") as f:
+                self.move_embeddings_data = json.loads(f.read())
+                print(f"Loaded {len(self.move_embeddings_data)} Move embeddings.")
+            self.encoder = encoder_class.from_embeddings(self.pokemon_embeddings_data, self.move_embeddings_data,
+                                                         type_effectiveness=type_effectiveness)
+
+        self.recorder = TrajectoryRecorder(self.encoder.obs_size, trajectory_dir, worker_id=worker_id) if trajectory_dir is not None else None
 
         self._get_obs()
         _, reward_meta, reward_obs = phase_handler.phase_handler(self.new_meta_data, self.new_obs, self.driver, self.pokemon_embeddings_data,
                                                                  self.move_embeddings_data, phase_counter=0, reward_meta=self.new_meta_data,
-                                                                 reward_obs=self.new_obs, ongoing_save=False)
+                                                                 reward_obs=self.new_obs, ongoing_save=False, reset_snapshot=self.reset_snapshot,
+                                                                 encoder=self.encoder)
 
         self.reset()
 
     def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            random.seed(seed)  # phase_handler decides with the random module
         self._get_obs()
         self.last_obs = self.new_obs
         self.last_meta_data = self.new_meta_data
         self.reward = 0.0
         self.terminated = False
         self.truncated = False
-        self.all_infos.append([])
+        self.episode += 1
+        self.episode_step = 0
+        if self.recorder is not None:
+            self.recorder.start_episode(self.new_meta_data.get("scene"), self.new_obs)
         return self.new_obs, {}
 
     def step(self, action):
+        step_start = time.perf_counter()
         self._apply_action(action)
+        phase_handler.wait_for_phase_change(self.driver, self.new_meta_data.get("phase_seq", 0))
         self._get_obs()
         self.terminated, reward_meta, reward_obs = phase_handler.phase_handler(self.new_meta_data, self.new_obs, self.driver,
                                                                                self.pokemon_embeddings_data, self.move_embeddings_data,
-                                                                               reward_meta=self.new_meta_data, reward_obs=self.new_obs)
+                                                                               reward_meta=self.new_meta_data, reward_obs=self.new_obs,
+                                                                               reset_snapshot=self.reset_snapshot, encoder=self.encoder,
+                                                                               recorder=self.recorder)
         self.new_meta_data = reward_meta
         self.new_obs = reward_obs
         self.reward = self._get_reward()
         self.last_obs = reward_obs
         self.last_meta_data = reward_meta
-        self.all_infos[-1].append(self._get_info())
-        return self.new_obs, self.reward, self.terminated, self.truncated, {}
+        self.episode_step += 1
+        self.step_latency = time.perf_counter() - step_start
+        info = self._get_info()
+        if self.recorder is not None:
+            self.recorder.record_step(self.new_meta_data.get("scene"), self.new_obs, action, self.reward, self.terminated)
+        if self.telemetry is not None:
+            self.telemetry.write(dict(info))  # copy, the VecEnv/Monitor add their own entries to info
+        return self.new_obs, self.reward, self.terminated, self.truncated, info
 
     def _get_reward(self) -> float:
-        reward = 0.0
-        # hp delta
-        for pkm_id, hp_value in self.new_meta_data["hp_values"]["enemies"].items():
-            if pkm_id in self.last_meta_data["hp_values"]["enemies"].keys():
-                reward += ((self.last_meta_data["hp_values"]["enemies"][pkm_id] -
-                            self.new_meta_data["hp_values"]["enemies"][pkm_id])
-                           * settings.reward_weights["hp"] * settings.reward_weights["damage_dealt"])
-        for pkm_id, hp_value in self.last_meta_data["hp_values"]["enemies"].items():
-            if pkm_id not in self.new_meta_data["hp_values"]["enemies"].keys():
-                reward += hp_value * settings.reward_weights["hp"] * settings.reward_weights["damage_dealt"]
-        if self.new_meta_data["stage"] % 10 != 0 or self.new_meta_data["stage"] == self.last_meta_data["stage"]:
-            for pkm_id, hp_value in self.new_meta_data["hp_values"]["players"].items():
-                if pkm_id in self.last_meta_data["hp_values"]["players"].keys():
-                    dmg_delta = (self.last_meta_data["hp_values"]["players"][pkm_id] -
-                                 self.new_meta_data["hp_values"]["players"][pkm_id])
-                    reward -= (dmg_delta * settings.reward_weights["hp"] * settings.reward_weights["damage_taken"])
-                    if self.new_meta_data["hp_values"]["players"][pkm_id] <= 0.0 < dmg_delta:
-                        reward += settings.reward_weights["member_died"]
-
-        # wave progress
-        if self.new_meta_data["stage"] != self.last_meta_data["stage"]:
-            if self.new_meta_data["stage"] % 10 != 0:
-                reward += settings.reward_weights["wave_done"]
-            else:
-                reward += settings.reward_weights["tenth_wave_done"]
-        return reward
-        
+        """total of reward.reward_components, the components are kept in self.reward_components"""
+        self.reward_components = reward_function.reward_components(self.last_meta_data, self.new_meta_data)
+        return reward_function.total_reward(self.reward_components)
+
     def _apply_action(self, action):
         """
         Takes the NN action [0, 1, 2, 0] and prints instructions.
@@ -147,23 +184,49 @@ class PokeRogueEnv(gym.Env):
         print(">>> Executing moves in browser.")
 
         # Pokemon 1
-        for button in ["LEFT", "UP", "SPACE"]:
-            press_button(self.driver, button)
-        for button in button_combinations.SELECT_MOVE[p1_move]:
-            press_button(self.driver, button)
+        buttons = ["LEFT", "UP", "SPACE"] + button_combinations.SELECT_MOVE[p1_move]
 
         if self.new_meta_data["is_double_fight"]:  # TODO: attack can only select target, if it doesn't always hit everyone e.g. land's wrath
-            for button in button_combinations.SELECT_TARGET[p1_target]:
-                press_button(self.driver, button)
+            buttons += button_combinations.SELECT_TARGET[p1_target]
 
         # Pokemon 2, if we are in a double fight and the second Pokemon is alive
-        if self.new_meta_data["is_double_fight"] and list(self.new_meta_data["hp_values"]["players"].values())[1] > 0.0:
-            for button in ["LEFT", "UP", "SPACE"]:
-                press_button(self.driver, button)
-            for button in button_combinations.SELECT_MOVE[p2_move]:
-                press_button(self.driver, button)
-            for button in button_combinations.SELECT_TARGET[p2_target]:
-                press_button(self.driver, button)
+        if self.new_meta_data["second_pokemon_acts"]:
+            buttons += ["LEFT", "UP", "SPACE"] + button_combinations.SELECT_MOVE[p2_move]
+            buttons += button_combinations.SELECT_TARGET[p2_target]
+
+        # the whole turn is sent to the browser in one call
+        press_sequence(self.driver, buttons)
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Valid actions of the current CommandPhase for sb3_contrib's MaskablePPO (12 bools, see create_input.create_action_mask).
+        Everything is allowed if there is no scene data yet.
+        """
+        mask = self.new_meta_data.get("action_mask") if isinstance(self.new_meta_data, dict) else None
+        if mask is None:
+            return np.ones(int(self.action_space.nvec.sum()), dtype=bool)
+        return np.array(mask, dtype=bool)
+
+    def capture_reset_snapshot(self, path: str) -> bool:
+        """
+        Saves the running session (e.g. wave 1 with the party we want to train with) as start point for all further runs.
+        :return: False if the game has no saved session yet
+        """
+        snapshot = session_snapshot.capture_session_snapshot(self.driver)
+        if not snapshot:
+            return False
+        session_snapshot.save_snapshot(snapshot, path)
+        self.reset_snapshot = snapshot
+        return True
+
+    def close(self):
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
 
     def _check_truncated(self) -> bool:
         pass
@@ -171,10 +234,21 @@ class PokeRogueEnv(gym.Env):
     def _check_terminated(self) -> bool:
         pass
 
-    def _get_info(self):
+    def _get_info(self) -> dict:
+        """one telemetry record, also the info dict of step"""
         info = dict()
+        info["time"] = time.time()
+        info["worker"] = self.worker_id
+        info["episode_index"] = self.episode  # not "episode", SB3's Monitor puts its episode summary there
+        info["episode_step"] = self.episode_step
         info["reward"] = self.reward
-        info["stage"] = self.new_meta_data["stage"]
+        info["components"] = self.reward_components
+        info["stage"] = self.new_meta_data["stage"]  # wave, the checkpoint callback averages it over finished episodes
+        info["phase"] = self.new_meta_data.get("phaseName")
+        info["step_latency"] = self.step_latency
+        info["terminated"] = bool(self.terminated)
+        info["encoder_cache"] = self.encoder.cache_stats()
+        return info
 
     def _get_obs(self):
         try:
@@ -183,19 +257,19 @@ class PokeRogueEnv(gym.Env):
 
             # If the script returned null or valid data wasn't found
             if not isinstance(raw_data, dict) or 'enemy' not in raw_data:
-                return np.zeros(210, dtype=np.float32)
-            self.new_obs, self.new_meta_data = input_creator.create_input_vector(raw_data,
-                                                                                 self.pokemon_embeddings_data,
-                                                                                 self.move_embeddings_data)
-            self.new_obs = np.array(self.new_obs, dtype=np.float32)
+                return np.zeros(self.encoder.obs_size, dtype=np.float32)
+            # own array per step, last_obs still references the previous one
+            self.new_obs, self.new_meta_data = self.encoder.encode(raw_data, out=np.empty(self.encoder.obs_size, dtype=np.float32))
+            if self.recorder is not None:
+                self.new_meta_data["scene"] = raw_data
 
         except WebDriverException as e:
             # Catch "scene.currentBattle is null" errors silently
-            self.new_obs = np.zeros(210, dtype=np.float32)
+            self.new_obs = np.zeros(self.encoder.obs_size, dtype=np.float32)
 
         except Exception as e:
             # Catch other Python errors
             print(f" Warning in _get_obs: {e}")
-            self.new_obs = np.zeros(210, dtype=np.float32)
+            self.new_obs = np.zeros(self.encoder.obs_size, dtype=np.float32)
 
         return self.new_obs
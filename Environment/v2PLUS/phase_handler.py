@@ -1,14 +1,16 @@
 import keyboard
-from pyautogui import press
 import logging
 
 import settings
-from Environment.send_key_inputs import press_button
+from Environment.send_key_inputs import press_sequence
 import DataExtraction.create_input as input_creator
 import button_combinations
+from Environment.v2PLUS.phaseManagerSkippy import phases_skip_logic
+from Environment.v2PLUS.session_snapshot import restore_session_snapshot
 import random
 import time
 import json
+import numpy as np
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,163 +28,314 @@ ch.setFormatter(formatter)
 if not logger.handlers:
     logger.addHandler(ch)
 
+# how long we wait for the game to leave a phase after we pressed something (seconds)
+PHASE_CHANGE_TIMEOUT = 2.0
 
-def phase_handler(meta_data, obs, driver, pokemon_embeddings_data, move_embeddings_data, phase_counter=0, terminated=False, reward_meta=dict(), reward_obs=list(), ongoing_save=True):
+# Wartet im Browser auf den nächsten Phasenwechsel (Hook aus DataExtraction/v3/global-scene.ts).
+# Liefert null, wenn der Hook fehlt, damit wir auf das alte Polling zurückfallen können.
+JS_WAIT_FOR_PHASE_CHANGE = """
+    const since = arguments[0];
+    const timeoutMs = arguments[1];
+    const done = arguments[arguments.length - 1];
+    if (typeof window.__WAIT_FOR_PHASE_CHANGE__ !== 'function') {
+        done(null);
+        return;
+    }
+    window.__WAIT_FOR_PHASE_CHANGE__(since, timeoutMs, done);
+"""
+
+
+# what a phase handler reports back to the phase loop
+PHASE_HANDLED = "handled"  # we did something (or nothing), wait for the game and look again
+PHASE_STUCK = "stuck"  # the game did not move on, give it time before looking again
+PHASE_TERMINATED = "terminated"  # run is over, a new one was started
+PHASE_DECISION = "decision"  # the agent has to act, return control
+
+
+class PhaseStats:
+    """Counts the visits and the wall-clock time per phase over the whole run and for the last phase_handler call."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """forgets everything, e.g. between two benchmark runs"""
+        self.counts = dict()
+        self.seconds = dict()
+        self.last_call = dict()  # phase name -> seconds spent during the last phase_handler call
+
+    def start_call(self):
+        self.last_call = dict()
+
+    def record(self, phase_name: str, seconds: float):
+        self.counts[phase_name] = self.counts.get(phase_name, 0) + 1
+        self.seconds[phase_name] = self.seconds.get(phase_name, 0.0) + seconds
+        self.last_call[phase_name] = self.last_call.get(phase_name, 0.0) + seconds
+
+    def summary(self) -> list:
+        """:return: [(phase name, visits, seconds)] sorted by time spent, most expensive first"""
+        return sorted(((name, self.counts[name], self.seconds[name]) for name in self.counts), key=lambda entry: -entry[2])
+
+
+phase_stats = PhaseStats()
+
+
+def _handle_title_phase(meta_data, driver, phase_counter, options):
+    logger.info("Detected TitlePhase - Starting new run")
+    if options["reset_snapshot"] is not None and restore_session_snapshot(driver, options["reset_snapshot"]):
+        logger.debug("Loaded reset snapshot instead of pressing the start combo")
+    elif options["ongoing_save"]:
+        logger.debug(f"Pressing buttons: {button_combinations.ONGOING_SAVE}")
+        press_sequence(driver, button_combinations.ONGOING_SAVE)
+    else:
+        logger.debug(f"Pressing buttons: {button_combinations.FIRST_SAVE}")
+        press_sequence(driver, button_combinations.FIRST_SAVE)
+    logger.info("TitlePhase completed - Run terminated")
+    return PHASE_TERMINATED
+
+
+def _handle_check_switch_phase(meta_data, driver, phase_counter, options):
+    logger.info("Detected CheckSwitchPhase - No switch action")
+    logger.debug("Pressing DOWN and SPACE")
+    buttons = ["DOWN", "SPACE"]
+    if meta_data["is_double_fight"]:
+        buttons += ["DOWN", "SPACE"]
+    press_sequence(driver, buttons)
+    logger.debug("CheckSwitchPhase buttons pressed")
+    return PHASE_HANDLED
+
+
+def _handle_learn_move_phase(meta_data, driver, phase_counter, options):
+    # Implement special case if pokemon doesnt know 4 moves, we dont need to forget one
+    logger.info("Detected LearnMovePhase - Randomly selecting move to learn/forget")
+    logger.debug("Pressing SPACE 4 times to cycle through moves")
+    if meta_data["learn_move_phase"]["member_move_count"] <= 3:
+        buttons = ["SPACE"] * 4
+        forget_move = random.randint(0, 4)
+        logger.debug(f"Randomly selected move index: {forget_move}")
+        buttons += ["UP"] * forget_move
+        logger.debug("Pressing SPACE 4 times to confirm move")
+        if forget_move == 0:
+            press_range = 3
+        else:
+            press_range = 5
+        buttons += ["SPACE"] * press_range
+        press_sequence(driver, buttons)
+    else:
+        press_sequence(driver, ["SPACE"])
+    logger.info("LearnMovePhase completed")
+    return PHASE_HANDLED
+
+
+def _handle_select_modifier_phase(meta_data, driver, phase_counter, options):
+    logger.info("Detected SelectModifierPhase - Selecting modifier/item")
+    if phase_counter <= 10:
+        selected_item, weight = select_item(meta_data)
+        if weight <= 4:
+            press_sequence(driver, ["DOWN", "SPACE"])
+        else:
+            logger.info(f"Selected item index: {selected_item} with weight: {weight}")
+            logger.debug(f"Pressing RIGHT {selected_item} times to navigate to item, then SPACE to confirm selection")
+            press_sequence(driver, ["RIGHT"] * selected_item + ["SPACE"])
+            logger.info("SelectModifierPhase completed")
+    else:
+        while True:
+            if keyboard.is_pressed("o"):
+                break
+        logger.warning(f"SelectModifierPhase encountered {phase_counter} times - may be in loop")
+        # TODO: this might occur, if we can't select an item with "simple" selection
+    return PHASE_HANDLED
+
+
+def _handle_switch_phase(meta_data, driver, phase_counter, options):
+    logger.info("Detected SwitchPhase - Switching Pokemon")
+    try:
+        new_pkm_index = 1
+        if len(meta_data["hp_values"]["players"].keys()) > 2:
+            if sum(meta_data["hp_values"]["players"].values()[2:]) > 0.0:
+                pkm_id = random.choices(list(meta_data["hp_values"]["players"].keys())[2:],
+                                        weights=list(meta_data["hp_values"]["players"].values())[2:], k=1)
+                new_pkm_index = list(meta_data["hp_values"]["players"].keys()).index(pkm_id[0])
+        logger.debug(f"Switching to Pokemon on index {new_pkm_index}")
+        press_sequence(driver, ["DOWN"] * new_pkm_index + ["SPACE", "SPACE"])
+    except (KeyError, ValueError) as e:
+        logger.error(f"Error in SwitchPhase: {e}")
+    return PHASE_HANDLED
+
+
+def _handle_backspace_phase(meta_data, driver, phase_counter, options):
+    logger.info(f"Detected {meta_data['phaseName']} - Closing with BACKSPACE")
+    press_sequence(driver, ["BACKSPACE"])
+    return PHASE_HANDLED
+
+
+def _handle_command_phase(meta_data, driver, phase_counter, options):
+    logger.info("Detected CommandPhase - Player action required, returning control")
+    return PHASE_DECISION
+
+
+def _handle_skip_phase(meta_data, driver, phase_counter, options):
+    if phase_counter >= 2:
+        # SPACE did not get us out, same escalation as an unknown phase
+        return _handle_unknown_phase(meta_data, driver, phase_counter, options)
+    logger.debug(f"Skipping {meta_data['phaseName']} with SPACE")
+    press_sequence(driver, ["SPACE"])
+    return PHASE_HANDLED
+
+
+def _handle_unknown_phase(meta_data, driver, phase_counter, options):
+    logger.debug(f"Unhandled phase: {meta_data.get('phaseName', 'UNKNOWN')}")
+    if 2 <= phase_counter <= 4:
+        logger.error(f"Phase {meta_data.get('phaseName', 'UNKNOWN')} repeated {phase_counter} times - possible stuck state")
+        return PHASE_STUCK  # give the game time to move on by itself
+    elif phase_counter >= 5:
+        while True:  # Observer has to fix the state
+            if keyboard.is_pressed("p"):
+                break
+    else:
+        logger.debug("Attempting generic skip with SPACE")
+        press_sequence(driver, ["SPACE"])
+    return PHASE_HANDLED
+
+
+def _handle_nothing_to_do_phase(meta_data, driver, phase_counter, options):
+    # the game leaves these phases by itself, only nudge it if it didn't
+    if phase_counter == 0:
+        return PHASE_HANDLED
+    return _handle_unknown_phase(meta_data, driver, phase_counter, options)
+
+
+# phaseManagerSkippy action -> handler, actions without a handler here use _handle_unknown_phase
+SKIP_LOGIC_HANDLERS = {
+    "no_switch": _handle_check_switch_phase,
+    "start_run": _handle_title_phase,
+    "choose_move": _handle_command_phase,
+    "learn_move_random": _handle_learn_move_phase,
+    "select_modifier_random": _handle_select_modifier_phase,
+    "smart_switch": _handle_switch_phase,
+    "backspace": _handle_backspace_phase,
+    "skip": _handle_skip_phase,
+}
+
+
+def build_phase_table() -> dict:
+    """
+    Dispatch table phase name -> handler, seeded from settings.phases and phaseManagerSkippy.phases_skip_logic.
+    Later entries win: nothing_to_do < skip_information < explicit skip logic.
     """
-    Handles the different phases that might occur during playthrough
+    table = dict()
+    for phase_name in settings.phases["nothing_to_do"]:
+        table[phase_name] = _handle_nothing_to_do_phase
+    for phase_name in settings.phases["skip_information"]:
+        table[phase_name] = _handle_skip_phase
+    for phase_name, rule in phases_skip_logic.items():
+        if rule["action"] in SKIP_LOGIC_HANDLERS:
+            table[phase_name] = SKIP_LOGIC_HANDLERS[rule["action"]]
+    return table
+
+
+PHASE_TABLE = build_phase_table()
+
+
+def phase_handler(meta_data, obs, driver, pokemon_embeddings_data, move_embeddings_data, phase_counter=0, terminated=False, reward_meta=dict(), reward_obs=list(), ongoing_save=True,
+                  reset_snapshot=None, encoder=None, recorder=None):
+    """
+    Handles the different phases that might occur during playthrough, until the agent has to act (CommandPhase)
     :param phase_counter: how often we have been in this phase in a row
     :param terminated: if we encountered a TitlePhase while handling
     :param meta_data: current meta_data
     :param driver: the selenium driver
     :param pokemon_embeddings_data: pre-loaded pokemon data
     :param move_embeddings_data: pre-loaded move data
+    :param ongoing_save: start the new run with ONGOING_SAVE (else FIRST_SAVE)
+    :param reset_snapshot: session snapshot (session_snapshot.py) to load in the TitlePhase instead of pressing the start combo
+    :param encoder: ObservationEncoder to build the observations with, None = create_input_vector
+    :param recorder: trajectory_store.TrajectoryRecorder, records the scene of every phase handled here (needs meta_data["scene"])
     :return: bool => are we terminated or is the run still ongoing
     """
-    logger.debug(f"phase_handler called - Phase: {meta_data.get('phaseName', 'UNKNOWN')}, Counter: {phase_counter}, Terminated: {terminated}")
-
-    if meta_data["phaseName"] == "TitlePhase":
-        logger.info("Detected TitlePhase - Starting new run")
-        if ongoing_save:
-            for button_name in button_combinations.ONGOING_SAVE:
-                logger.debug(f"Pressing button: {button_name}")
-                press_button(driver, button_name)
-        else:
-            for button_name in button_combinations.FIRST_SAVE:
-                logger.debug(f"Pressing button: {button_name}")
-                press_button(driver, button_name)
-        terminated = True
-        reward_meta = meta_data
-        reward_obs = obs
-        logger.info("TitlePhase completed - Run terminated")
-
-    elif meta_data["phaseName"] == "CheckSwitchPhase":
-        logger.info("Detected CheckSwitchPhase - No switch action")
-        logger.debug("Pressing DOWN and SPACE")
-        press_button(driver, "DOWN")
-        press_button(driver, "SPACE")
-        if meta_data["is_double_fight"]:
-            press_button(driver, "DOWN")
-            press_button(driver, "SPACE")
-        logger.debug("CheckSwitchPhase buttons pressed")
-
-    elif meta_data["phaseName"] == "LearnMovePhase":  # Implement special case if pokemon doesnt know 4 moves, we dont need to forget one
-        logger.info("Detected LearnMovePhase - Randomly selecting move to learn/forget")
-        logger.debug("Pressing SPACE 4 times to cycle through moves")
-        if meta_data["learn_move_phase"]["member_move_count"] <= 3:
-            for _ in range(4):
-                press_button(driver, "SPACE")
-            forget_move = random.randint(0, 4)
-            logger.debug(f"Randomly selected move index: {forget_move}")
-            for move in range(forget_move):
-                logger.debug(f"Pressing DOWN for move selection {move + 1}/{forget_move}")
-                press_button(driver, "UP")
-            logger.debug("Pressing SPACE 4 times to confirm move")
-            if forget_move == 0:
-                press_range = 3
-            else:
-                press_range = 5
-            for _ in range(press_range):
-                press_button(driver, "SPACE")
-        else:
-            press_button(driver, "SPACE")
-        logger.info("LearnMovePhase completed")
-
-    elif meta_data["phaseName"] == "SelectModifierPhase":
-        logger.info("Detected SelectModifierPhase - Selecting modifier/item")
-        if phase_counter <= 10:
-            selected_item, weight = select_item(meta_data)
-            if weight <= 4:
-                press_button(driver, "DOWN")
-                press_button(driver, "SPACE")
-            else:
-                logger.info(f"Selected item index: {selected_item} with weight: {weight}")
-                logger.debug(f"Pressing RIGHT {selected_item} times to navigate to item")
-                for i in range(selected_item):
-                    logger.debug(f"RIGHT press {i + 1}/{selected_item}")
-                    press_button(driver, "RIGHT")
-                logger.debug("Pressing SPACE to confirm selection")
-                press_button(driver, "SPACE")
-                logger.info("SelectModifierPhase completed")
-        else:
-            while True:
-                if keyboard.is_pressed("o"):
-                    break
-            logger.warning(f"SelectModifierPhase encountered {phase_counter} times - may be in loop")
-            # TODO: this might occur, if we can't select an item with "simple" selection
-            pass
-
-    elif meta_data["phaseName"] == "SwitchPhase":
-        logger.info("Detected SwitchPhase - Switching Pokemon")
-        try:
-            new_pkm_index = 1
-            if len(meta_data["hp_values"]["players"].keys()) > 2:
-                if sum(meta_data["hp_values"]["players"].values()[2:]) > 0.0:
-                    pkm_id = random.choices(list(meta_data["hp_values"]["players"].keys())[2:],
-                                            weights=list(meta_data["hp_values"]["players"].values())[2:], k=1)
-                    new_pkm_index = list(meta_data["hp_values"]["players"].keys()).index(pkm_id[0])
-            logger.debug(f"Switching to Pokemon on index {new_pkm_index}")
-            for _ in range(new_pkm_index):
-                press_button(driver, "DOWN")
-            press_button(driver, "SPACE")
-            press_button(driver, "SPACE")
-        except (KeyError, ValueError) as e:
-            logger.error(f"Error in SwitchPhase: {e}")
-
-    elif meta_data["phaseName"] == "EggSummaryPhase":
-        logger.info("Detected EggSummaryPhase - Closing egg summary")
-        logger.debug("Pressing BACKSPACE to close")
-        press_button(driver, "BACKSPACE")
-        logger.info("EggSummaryPhase completed")
-
-    elif meta_data["phaseName"] == "CommandPhase":
-        logger.info("Detected CommandPhase - Player action required, returning control")
-        return terminated, reward_meta, reward_obs
+    options = {"ongoing_save": ongoing_save, "reset_snapshot": reset_snapshot}
+    phase_stats.start_call()
+    while True:
+        phase_name = meta_data.get("phaseName", "UNKNOWN")
+        logger.debug(f"phase_handler - Phase: {phase_name}, Counter: {phase_counter}, Terminated: {terminated}")
+        phase_start = time.perf_counter()
 
-    else:
-        logger.debug(f"Unhandled phase: {meta_data.get('phaseName', 'UNKNOWN')}")
-        if 2 <= phase_counter <= 4:
-            logger.error(f"Phase {meta_data.get('phaseName', 'UNKNOWN')} repeated {phase_counter} times - possible stuck state")
-            time.sleep(1)
-
-        elif phase_counter >= 5:
-            while True:  # Observer has to fix the state
-                if keyboard.is_pressed("p"):
-                    break
-        else:
-            logger.debug("Attempting generic skip with SPACE")
-            press_button(driver, "SPACE")
+        result = PHASE_TABLE.get(phase_name, _handle_unknown_phase)(meta_data, driver, phase_counter, options)
+        if result == PHASE_DECISION:
+            return terminated, reward_meta, reward_obs
+        if recorder is not None:
+            recorder.record_phase(meta_data.get("scene"), obs)
+        if result == PHASE_TERMINATED:
+            terminated = True
+            reward_meta = meta_data
+            reward_obs = obs
+
+        # wait until the phase got resolved, then continue with the new obs
+        logger.debug("Fetching new observation after phase action")
+        try:
+            transition = wait_for_phase_change(driver, meta_data.get("phase_seq", 0))
+            if transition is None and result == PHASE_STUCK:
+                time.sleep(1)  # page without phase hook -> old fixed wait
+            new_obs, new_meta_data = get_new_obs(driver, pokemon_embeddings_data, move_embeddings_data, encoder, keep_scene=recorder is not None)
+        except Exception as e:
+            logger.error(f"Error fetching new observation: {e}")
+            phase_stats.record(phase_name, time.perf_counter() - phase_start)
+            return terminated, reward_meta, reward_obs
+        phase_stats.record(phase_name, time.perf_counter() - phase_start)
 
-    # if the phase got resolved -> recursive call with new obs
-    logger.debug("Fetching new observation after phase action")
-    try:
-        new_obs, new_meta_data = get_new_obs(driver, pokemon_embeddings_data, move_embeddings_data)
         new_phase = new_meta_data.get("phaseName", "UNKNOWN")
-        old_phase = meta_data.get("phaseName", "UNKNOWN")
         if not terminated:
             reward_meta = new_meta_data
             reward_obs = new_obs
-        
-        if new_phase == old_phase:
+
+        if new_phase == phase_name:
             phase_counter += 1
             logger.debug(f"Same phase detected, counter incremented to {phase_counter}")
         else:
             phase_counter = 0
-            logger.info(f"Phase transition: {old_phase} -> {new_phase}")
+            logger.info(f"Phase transition: {phase_name} -> {new_phase}")
+        meta_data, obs = new_meta_data, new_obs
 
-        return phase_handler(new_meta_data, new_obs, driver, pokemon_embeddings_data, move_embeddings_data, phase_counter, terminated, reward_meta, reward_obs)
+
+def wait_for_phase_change(driver, since: int, timeout: float = PHASE_CHANGE_TIMEOUT):
+    """
+    Blocks until the game has left the phase with sequence number `since`, without polling __GLOBAL_SCENE_DATA__.
+    Returns immediately if the phase already changed in the meantime.
+    :param driver: the selenium driver
+    :param since: phase sequence number of the last observation (meta_data["phase_seq"])
+    :param timeout: max seconds to wait, has to stay below the driver's script timeout
+    :return: the transition {"seq", "from", "phaseName", "time"}, False on timeout, None if the page has no phase hook
+    """
+    try:
+        transition = driver.execute_async_script(JS_WAIT_FOR_PHASE_CHANGE, since, int(timeout * 1000))
     except Exception as e:
-        logger.error(f"Error fetching new observation: {e}")
-        return terminated, reward_meta, reward_obs
+        logger.error(f"Error in wait_for_phase_change: {e}")
+        return None
+    if transition:
+        logger.debug(f"Phase change: {transition.get('from')} -> {transition.get('phaseName')} (seq {transition.get('seq')})")
+    elif transition is False:
+        logger.debug(f"No phase change within {timeout}s")
+    return transition
 
 
-def get_new_obs(driver, pokemon_embeddings_data, move_embeddings_data):
-    """Fetch new observation from the game."""
+def get_new_obs(driver, pokemon_embeddings_data, move_embeddings_data, encoder=None, keep_scene=False):
+    """
+    Fetch new observation from the game.
+    :param encoder: ObservationEncoder, if given the obs is a float32 array instead of a list
+    :param keep_scene: put the raw scene dict into meta_data["scene"] (for the trajectory recorder)
+    """
     try:
         logger.debug("Executing script to fetch __GLOBAL_SCENE_DATA__")
         obs = driver.execute_script("return window.__GLOBAL_SCENE_DATA__();")
         if not obs:
             logger.warning("__GLOBAL_SCENE_DATA__ not found or not a function")
-        result = input_creator.create_input_vector(obs, pokemon_embeddings_data, move_embeddings_data)
+        if encoder is not None:
+            # own array per observation, reward_obs has to survive the next encode
+            result = encoder.encode(obs, out=np.empty(encoder.obs_size, dtype=np.float32))
+        else:
+            result = input_creator.create_input_vector(obs, pokemon_embeddings_data, move_embeddings_data)
+        if keep_scene:
+            result[1]["scene"] = obs
         logger.debug("Successfully created input vector from observation")
         return result
     except Exception as e:
@@ -0,0 +1,45 @@
+"""
+Reward of PokeRogueEnv, split into its components so they can be logged separately (telemetry.py).
+The weights are settings.reward_weights, the total is the sum of the components.
+"""
+import settings
+
+COMPONENTS = ["damage_dealt", "damage_taken", "member_died", "wave_done"]
+
+
+def reward_components(last_meta_data: dict, new_meta_data: dict) -> dict:
+    """
+    :param last_meta_data: meta_data before the step (create_input.create_meta_data)
+    :param new_meta_data: meta_data after the step
+    :return: component -> reward, see COMPONENTS
+    """
+    weights = settings.reward_weights
+    components = dict.fromkeys(COMPONENTS, 0.0)
+    last_enemies = last_meta_data["hp_values"]["enemies"]
+    new_enemies = new_meta_data["hp_values"]["enemies"]
+    # hp delta, an enemy that is gone counts as defeated
+    for pkm_id, hp_value in new_enemies.items():
+        if pkm_id in last_enemies:
+            components["damage_dealt"] += (last_enemies[pkm_id] - hp_value) * weights["hp"] * weights["damage_dealt"]
+    for pkm_id, hp_value in last_enemies.items():
+        if pkm_id not in new_enemies:
+            components["damage_dealt"] += hp_value * weights["hp"] * weights["damage_dealt"]
+
+    # after a tenth wave the party is healed, that is no damage taken
+    if new_meta_data["stage"] % 10 != 0 or new_meta_data["stage"] == last_meta_data["stage"]:
+        last_players = last_meta_data["hp_values"]["players"]
+        for pkm_id, hp_value in new_meta_data["hp_values"]["players"].items():
+            if pkm_id in last_players:
+                dmg_delta = last_players[pkm_id] - hp_value
+                components["damage_taken"] -= dmg_delta * weights["hp"] * weights["damage_taken"]
+                if hp_value <= 0.0 < dmg_delta:
+                    components["member_died"] += weights["member_died"]
+
+    # wave progress
+    if new_meta_data["stage"] != last_meta_data["stage"]:
+        components["wave_done"] += weights["wave_done"] if new_meta_data["stage"] % 10 != 0 else weights["tenth_wave_done"]
+    return components
+
+
+def total_reward(components: dict) -> float:
+    return sum(components.values())
@@ -0,0 +1,67 @@
+"""
+Fast reset: instead of replaying button_combinations.ONGOING_SAVE/FIRST_SAVE through the title menu, a saved game session
+(e.g. wave 1 with a fixed party) is written back into localStorage and loaded directly by the TitlePhase.
+The game saves the session at the start of every wave, so capture the snapshot while you are in that wave.
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Liest den Session-Spielstand des aktuellen Slots so, wie das Spiel ihn im localStorage ablegt (verschlüsselt)
+JS_CAPTURE_SESSION = """
+    const scene = window.globalScene;
+    if (!scene) {
+        return null;
+    }
+    const slot = scene.sessionSlotId ?? 0;
+    const prefix = `sessionData${slot ? slot : ""}_`;
+    const key = Object.keys(localStorage).find(name => name.startsWith(prefix));
+    if (!key) {
+        return null;
+    }
+    return { slot: slot, key: key, data: localStorage.getItem(key), wave: scene.currentBattle?.waveIndex ?? false };
+"""
+
+# Schreibt den Spielstand zurück und lässt die TitlePhase ihn laden -> direkt in den ersten Kampf
+JS_RESTORE_SESSION = """
+    const snapshot = arguments[0];
+    localStorage.setItem(snapshot.key, snapshot.data);
+    const phase = window.globalScene?.phaseManager?.currentPhase;
+    if (!phase || phase.phaseName !== "TitlePhase" || typeof phase.loadSaveSlot !== "function") {
+        return false;
+    }
+    phase.loadSaveSlot(snapshot.slot);
+    return true;
+"""
+
+
+def capture_session_snapshot(driver) -> dict:
+    """
+    :return: {"slot", "key", "data", "wave"} of the running session, None if the game has no saved session yet
+    """
+    snapshot = driver.execute_script(JS_CAPTURE_SESSION)
+    if snapshot:
+        logger.info(f"Captured session snapshot of slot {snapshot['slot']} at wave {snapshot['wave']}")
+    return snapshot
+
+
+def restore_session_snapshot(driver, snapshot: dict) -> bool:
+    """
+    Loads the snapshot into the game. Only works while the game is in the TitlePhase.
+    :return: False if the game could not load it directly, the caller has to start the run via the menu then
+    """
+    restored = bool(driver.execute_script(JS_RESTORE_SESSION, snapshot))
+    if not restored:
+        logger.warning("Session snapshot could not be loaded directly")
+    return restored
+
+
+def save_snapshot(snapshot: dict, path: str):
+    with open(path, "w") as f:
+        f.write(json.dumps(snapshot))
+
+
+def load_snapshot(path: str) -> dict:
+    with open(path, "r") as f:
+        return json.loads(f.read())
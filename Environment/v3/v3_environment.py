@@ -1,11 +1,11 @@
 """
 custom environment for PokeRogue.
 """
-import gym
+import gymnasium as gym
 import keyboard
-from gym import spaces
-import numpy as np
+from gymnasium import spaces
 import DataExtraction.v3.v3_create_input as input_creator
+import DataExtraction.observation_schema as obs_schema
 import json
 import DataExtraction.automated_session_startup as session_startup
 import settings
@@ -18,7 +18,8 @@ class PokeRogueEnv(gym.Env):
         # Define action and observation space
         # They must be gym.spaces objects
         self.action_space = spaces.MultiDiscrete([4, 2, 4, 2])
-        self.observation_space = spaces.Box(low=-100, high=100, shape=(82,), dtype=np.float32)  # TODO change dimension
+        # Layout and size see DataExtraction/observation_schema.py
+        self.observation_space = obs_schema.observation_space()
         self.last_obs = []
         self.new_obs = []
         self.last_meta_data = dict()
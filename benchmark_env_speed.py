@@ -0,0 +1,45 @@
+"""
+Measures env steps/sec of PokeRogueEnv in normal mode and in turbo mode (headless, faster game clock, no rendering).
+Needs the game running on localhost:8000, same as train_v2+.py.
+
+Usage: python benchmark_env_speed.py [steps]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Environment.v2PLUS.environmentv2PLUS import PokeRogueEnv
+from Environment.v2PLUS.phase_handler import phase_stats
+
+
+def measure_steps_per_sec(turbo: bool, n_steps: int, seed: int = 0) -> float:
+    """Plays n_steps random actions and returns the env steps per second (browser start not included)."""
+    env = PokeRogueEnv(turbo=turbo)
+    env.action_space.seed(seed)
+    env.reset(seed=seed)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        if terminated or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    print(f"        encoder cache: {env.encoder.cache_stats()}")
+    env.close()
+    return n_steps / elapsed
+
+
+if __name__ == "__main__":
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    results = dict()
+    for turbo in (False, True):
+        mode = "turbo" if turbo else "normal"
+        phase_stats.reset()
+        results[mode] = measure_steps_per_sec(turbo, n_steps)
+        print(f"{mode:>6}: {results[mode]:.2f} steps/sec over {n_steps} steps")
+        for phase_name, visits, seconds in phase_stats.summary()[:5]:
+            print(f"        {phase_name:<25} {visits:>5}x {seconds:8.2f}s")
+
+    print(f"turbo speed-up: {results['turbo'] / results['normal']:.2f}x")
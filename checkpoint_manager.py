@@ -0,0 +1,154 @@
+"""
+Checkpoints for the SB3 models without stalling training:
+- the policy and optimizer state (everything model.save would write) is copied in memory on the training thread,
+- the zip is written by one background thread,
+- every file is written to <name>.tmp and renamed, an interrupted save never leaves a half-written zip behind,
+- retention: the newest keep_last checkpoints plus the keep_best ones with the highest mean wave are kept, the rest is deleted.
+
+The files are normal SB3 zips, PPO.load / MaskablePPO.load work on them as before. latest_model.zip is updated with
+every checkpoint, checkpoints.json in the same folder lists the kept checkpoints and their mean wave.
+"""
+import copy
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "checkpoints.json"
+LATEST_NAME = "latest_model.zip"
+
+
+def snapshot_model(model) -> dict:
+    """
+    Copy of everything BaseAlgorithm.save writes, taken on the calling thread.
+    Training can go on right after, the copy is not touched by it.
+    """
+    from stable_baselines3.common.save_util import recursive_getattr
+
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for torch_var in state_dicts_names + torch_variable_names:
+        exclude.add(torch_var.split(".")[0])
+    for param_name in exclude:
+        data.pop(param_name, None)
+    pytorch_variables = {name: recursive_getattr(model, name) for name in torch_variable_names}
+    # deepcopy clones the tensors of the policy and the optimizer state
+    return copy.deepcopy({"data": data, "params": model.get_parameters(), "pytorch_variables": pytorch_variables})
+
+
+def write_snapshot(snapshot: dict, path: str):
+    """writes the snapshot as SB3 zip, atomically"""
+    from stable_baselines3.common.save_util import save_to_zip_file
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        save_to_zip_file(f, data=snapshot["data"], params=snapshot["params"], pytorch_variables=snapshot["pytorch_variables"])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointManager:
+    def __init__(self, directory: str = "models", keep_last: int = 3, keep_best: int = 2, prefix: str = "checkpoint"):
+        """
+        :param keep_last: number of newest checkpoints that are kept
+        :param keep_best: number of checkpoints with the highest mean wave that are kept (additionally)
+        """
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.prefix = prefix
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.latest_path = os.path.join(directory, LATEST_NAME)
+        os.makedirs(directory, exist_ok=True)
+        # leftovers of a save that was interrupted
+        for name in os.listdir(directory):
+            if name.endswith(".zip.tmp"):
+                os.remove(os.path.join(directory, name))
+        self.records = self._load_index()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")  # one writer, saves stay in order
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def _load_index(self) -> list:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r") as f:
+            records = json.loads(f.read())
+        return [record for record in records if os.path.exists(record["path"])]
+
+    def save(self, model, timesteps: int, mean_wave: float = None) -> Future:
+        """
+        Snapshots the model now and writes it in the background.
+        :param mean_wave: mean wave reached over the recent episodes, None = unknown (only kept as one of the newest)
+        """
+        start = time.perf_counter()
+        snapshot = snapshot_model(model)
+        record = {"path": os.path.join(self.directory, f"{self.prefix}_{timesteps}.zip"), "timesteps": int(timesteps),
+                  "mean_wave": mean_wave, "time": time.time()}
+        logger.debug(f"Checkpoint snapshot took {(time.perf_counter() - start) * 1000:.1f} ms")
+        future = self._executor.submit(self._write, snapshot, record)
+        future.add_done_callback(self._log_failure)
+        with self._lock:
+            self._pending = [pending for pending in self._pending if not pending.done()] + [future]
+        return future
+
+    def _write(self, snapshot: dict, record: dict) -> str:
+        start = time.perf_counter()
+        write_snapshot(snapshot, record["path"])
+        shutil.copyfile(record["path"], self.latest_path + ".tmp")
+        os.replace(self.latest_path + ".tmp", self.latest_path)
+        with self._lock:
+            self.records = [old for old in self.records if old["path"] != record["path"]] + [record]
+            self._apply_retention()
+            records = list(self.records)
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(records, f, indent=2)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        logger.info(f"Checkpoint saved: {record['path']} (mean wave {record['mean_wave']}, {time.perf_counter() - start:.2f}s in background)")
+        return record["path"]
+
+    def kept(self, records: list) -> list:
+        """records that survive the retention policy"""
+        newest = sorted(records, key=lambda record: record["timesteps"])[-self.keep_last:] if self.keep_last > 0 else []
+        rated = [record for record in records if record["mean_wave"] is not None]
+        best = sorted(rated, key=lambda record: (record["mean_wave"], record["timesteps"]))[-self.keep_best:] if self.keep_best > 0 else []
+        keep = {record["path"] for record in newest + best}
+        return [record for record in records if record["path"] in keep]
+
+    def _apply_retention(self):
+        kept = self.kept(self.records)
+        for record in self.records:
+            if record not in kept and os.path.exists(record["path"]):
+                os.remove(record["path"])
+                logger.info(f"Checkpoint removed: {record['path']}")
+        self.records = kept
+
+    @property
+    def best_path(self):
+        """path of the checkpoint with the highest mean wave, None if no checkpoint has one"""
+        with self._lock:
+            rated = [record for record in self.records if record["mean_wave"] is not None]
+        return max(rated, key=lambda record: (record["mean_wave"], record["timesteps"]))["path"] if rated else None
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if future.exception() is not None:
+            logger.error(f"Checkpoint could not be saved: {future.exception()!r}")
+
+    def wait(self):
+        """blocks until all submitted checkpoints are written, raises the error of a failed one"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
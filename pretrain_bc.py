@@ -0,0 +1,223 @@
+"""
+Offline behavior cloning: pretrains the PPO policy of train_v2+.py on recorded games (trajectory_store.py),
+so live training starts from a policy that already plays instead of from random moves.
+
+Any PokeRogueEnv/SimulatedPokeRogueEnv with trajectory_dir records usable games, two sources are ready to run:
+- Environment/manual_play_debug.py: you play in the browser, every command typed in a CommandPhase is recorded
+- record_heuristic_games.py: the greedy heuristic plays in the battle simulator, thousands of games without a browser
+The (observation, action) pairs are streamed from the memory-mapped recordings by several DataLoader workers,
+the network is the same MlpPolicy (with the EmbeddingFeaturesExtractor for id observations) and is trained on CPU.
+
+    python record_heuristic_games.py --episodes 500
+    python pretrain_bc.py --epochs 10                       # all recordings in trajectories/ -> models/pretrained_bc.zip
+    python pretrain_bc.py --min-wave 5 --as-latest          # only games that got to wave 5, train_v2+.py resumes from it
+    python pretrain_bc.py --maskable --as-latest            # MaskablePPO, for train_v2+.py with use_action_masking = True
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+
+import gymnasium as gym
+import numpy as np
+import torch
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+import DataExtraction.observation_schema as obs_schema
+from trajectory_store import KIND_PHASE, KIND_STEP, TRAJECTORY_DIR, TrajectoryReader, recordings
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_PATH = "models/pretrained_bc.zip"
+LATEST_PATH = "models/latest_model.zip"
+
+
+def decision_pairs(rows: np.ndarray):
+    """
+    (observation the agent saw, action it took) of one episode.
+    A step row holds the action together with the observation *after* it, the one before is the previous reset/step row.
+    :param rows: TrajectoryReader.episode_rows
+    :return: obs (n, obs_size), actions (n, 4)
+    """
+    decisions = rows[rows["kind"] != KIND_PHASE]
+    steps = decisions["kind"][1:] == KIND_STEP
+    return decisions["obs"][:-1][steps], decisions["action"][1:][steps]
+
+
+def observation_mode(obs_size: int):
+    """:return: (type_effectiveness, ids) of the encoder that wrote observations of that size"""
+    for type_effectiveness in (False, True):
+        for ids in (False, True):
+            if obs_schema.obs_size(type_effectiveness, ids) == obs_size:
+                return type_effectiveness, ids
+    raise ValueError(f"Unknown observation size {obs_size}, re-encode the recording (TrajectoryReader.reencode)")
+
+
+class BehaviorCloningDataset(IterableDataset):
+    def __init__(self, paths: list, min_wave: int = 0, shuffle_buffer: int = 10000, seed: int = 0):
+        """
+        :param paths: recordings (TrajectoryRecorder.path), all with the same observation size
+        :param min_wave: only episodes that got at least to this wave, to clone the better games only
+        :param shuffle_buffer: pairs that are shuffled together, consecutive steps are very similar
+        """
+        self.paths = paths
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0  # set before every epoch, the workers get a fresh copy of the dataset each time
+        self.obs_size = None
+        self.episodes = []  # (path, episode), split between the DataLoader workers
+        self.pairs = 0
+        for path in paths:
+            reader = TrajectoryReader(path)
+            if self.obs_size is None:
+                self.obs_size = reader.meta["obs_size"]
+            elif reader.meta["obs_size"] != self.obs_size:
+                raise ValueError(f"{path} has {reader.meta['obs_size']} instead of {self.obs_size} observation floats")
+            for episode in reader.episodes():
+                rows = reader.episode_rows(episode)
+                count = len(decision_pairs(rows)[1])
+                if count and rows["wave"].max() >= min_wave:
+                    self.episodes.append((path, episode))
+                    self.pairs += count
+            reader.close()
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+        rng = random.Random(hash((self.seed, self.epoch, worker_id)))
+        episodes = self.episodes[worker_id::workers]
+        rng.shuffle(episodes)
+        readers = {}
+        buffer = []
+        for path, episode in episodes:
+            if path not in readers:
+                readers[path] = TrajectoryReader(path)
+            observations, actions = decision_pairs(readers[path].episode_rows(episode))
+            for pair in zip(observations, actions.astype(np.int64)):
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(pair)
+                    continue
+                index = rng.randrange(len(buffer))
+                yield buffer[index]
+                buffer[index] = pair
+        rng.shuffle(buffer)
+        yield from buffer
+        for reader in readers.values():
+            reader.close()
+
+
+class SpacesOnlyEnv(gym.Env):
+    """Carries the spaces of PokeRogueEnv, so PPO can be built without starting a browser"""
+
+    def __init__(self, type_effectiveness: bool = False, ids: bool = False):
+        self.observation_space = obs_schema.observation_space(type_effectiveness=type_effectiveness, ids=ids)
+        self.action_space = spaces.MultiDiscrete([4, 2, 4, 2])
+
+    def reset(self, seed=None, options=None):
+        raise RuntimeError("SpacesOnlyEnv can not be played, use PokeRogueEnv")
+
+    def step(self, action):
+        raise RuntimeError("SpacesOnlyEnv can not be played, use PokeRogueEnv")
+
+
+def create_model(type_effectiveness: bool = False, ids: bool = False, learning_rate: float = 3e-4, init_path: str = None,
+                 maskable: bool = False):
+    """
+    same PPO as train_v2+.load_or_create_model, so the saved zip can be resumed there
+    :param maskable: MaskablePPO (sb3-contrib) for use_action_masking = True, a PPO zip can not be resumed as MaskablePPO
+    """
+    algorithm = PPO
+    if maskable:
+        # optional dependency, only needed for masked training
+        from sb3_contrib import MaskablePPO
+        algorithm = MaskablePPO
+    env = SpacesOnlyEnv(type_effectiveness, ids)
+    if init_path is not None:
+        return algorithm.load(init_path, env=env, device="cpu")
+    policy_kwargs = None
+    if ids:
+        from Environment.v2PLUS.embedding_features import EmbeddingFeaturesExtractor
+        policy_kwargs = dict(features_extractor_class=EmbeddingFeaturesExtractor)
+    return algorithm(policy="MlpPolicy", env=env, policy_kwargs=policy_kwargs, learning_rate=learning_rate, n_steps=2048, batch_size=64,
+               n_epochs=10, gamma=0.99, gae_lambda=0.95, clip_range=0.2, device="cpu", verbose=0)
+
+
+def pretrain(paths: list, epochs: int = 10, batch_size: int = 256, learning_rate: float = 3e-4, num_workers: int = 4, min_wave: int = 0,
+             entropy_coef: float = 0.0, output_path: str = OUTPUT_PATH, init_path: str = None, seed: int = 0, maskable: bool = False):
+    """
+    Maximizes the log-likelihood of the recorded actions under the policy (the value head is left to PPO).
+    The recordings carry no action masks, the maskable policy is cloned unmasked.
+    :param init_path: continue from this SB3 zip instead of a new network
+    :param maskable: train and save a MaskablePPO instead of a PPO, see create_model
+    :param entropy_coef: entropy bonus, keeps the cloned policy from becoming too sure for PPO to still explore
+    :return: the model, saved to output_path
+    """
+    torch.manual_seed(seed)
+    dataset = BehaviorCloningDataset(paths, min_wave=min_wave, seed=seed)
+    if not dataset.pairs:
+        raise ValueError(f"No recorded agent steps in {len(paths)} recording(s)")
+    type_effectiveness, ids = observation_mode(dataset.obs_size)
+    model = create_model(type_effectiveness, ids, learning_rate, init_path, maskable)
+    policy = model.policy
+    for group in policy.optimizer.param_groups:
+        group["lr"] = learning_rate
+    logger.info(f"Behavior cloning on {dataset.pairs} steps of {len(dataset.episodes)} episodes ({dataset.obs_size} observation floats)")
+
+    for epoch in range(epochs):
+        dataset.epoch = epoch
+        loader = DataLoader(dataset, batch_size=batch_size, num_workers=num_workers)
+        policy.set_training_mode(True)
+        total_loss, correct, samples = 0.0, np.zeros(len(model.action_space.nvec)), 0
+        for observations, actions in loader:
+            distribution = policy.get_distribution(observations)
+            loss = -distribution.log_prob(actions).mean() - entropy_coef * distribution.entropy().mean()
+            policy.optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(policy.parameters(), model.max_grad_norm)
+            policy.optimizer.step()
+
+            total_loss += loss.item() * len(actions)
+            samples += len(actions)
+            # MultiCategoricalDistribution.distribution, MaskableMultiCategoricalDistribution.distributions
+            categoricals = distribution.distributions if maskable else distribution.distribution
+            for head, categorical in enumerate(categoricals):
+                correct[head] += (categorical.probs.argmax(dim=1) == actions[:, head]).sum().item()
+        accuracy = " ".join(f"{value:.2f}" for value in correct / samples)
+        logger.info(f"epoch {epoch + 1}/{epochs}: loss {total_loss / samples:.4f}, accuracy per action head {accuracy}")
+
+    policy.set_training_mode(False)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    model.save(output_path)
+    logger.info(f"Pretrained model saved: {output_path}")
+    return model
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Behavior cloning pretraining on recorded games")
+    parser.add_argument("--dir", default=TRAJECTORY_DIR, help="folder with the recordings")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=3e-4)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="DataLoader worker processes")
+    parser.add_argument("--min-wave", type=int, default=0, help="only episodes that reached this wave")
+    parser.add_argument("--entropy-coef", type=float, default=0.0)
+    parser.add_argument("--init", default=None, help="start from this SB3 zip, e.g. models/latest_model.zip")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--as-latest", action="store_true", help="also copy the result to models/latest_model.zip for train_v2+.py")
+    parser.add_argument("--maskable", action="store_true", help="MaskablePPO (sb3-contrib), for train_v2+.py with use_action_masking = True")
+    args = parser.parse_args()
+
+    pretrain(recordings(args.dir), args.epochs, args.batch_size, args.lr, args.workers, args.min_wave, args.entropy_coef, args.output, args.init,
+             maskable=args.maskable)
+    if args.as_latest:
+        if not args.maskable:
+            logger.warning("This is a PPO model, train_v2+.py only resumes it with use_action_masking = False (else use --maskable)")
+        if os.path.exists(LATEST_PATH):
+            shutil.copyfile(LATEST_PATH, LATEST_PATH + ".before_bc")
+            logger.info(f"Previous latest model kept as {LATEST_PATH}.before_bc")
+        shutil.copyfile(args.output, LATEST_PATH)
+        logger.info(f"Copied to {LATEST_PATH}, train_v2+.py continues from the pretrained policy")
@@ -0,0 +1,55 @@
+"""
+Records games of a heuristic policy for pretrain_bc.py, without a browser:
+SimulatedPokeRogueEnv plays with BattleSimulator.greedy_action (strongest expected damage per active) and writes
+its trajectories like any PokeRogueEnv with trajectory_dir (trajectory_store.py).
+
+    python record_heuristic_games.py --episodes 500                  # -> trajectories/w0_<start>/
+    python pretrain_bc.py --min-wave 8 --as-latest                   # clone only the better runs
+"""
+import argparse
+import logging
+
+from Environment.v2PLUS.battle_simulator import SimulatedPokeRogueEnv
+from trajectory_store import TRAJECTORY_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def record_heuristic_games(episodes: int, trajectory_dir: str = TRAJECTORY_DIR, seed: int = 0, max_waves: int = 50, **env_kwargs) -> tuple:
+    """
+    :param episodes: runs to play
+    :param max_waves: truncate a run after this wave, the greedy policy rarely gets that far
+    :param env_kwargs: further SimulatedPokeRogueEnv options, type_effectiveness/id_observations have to match the policy to pretrain
+    :return: (recording path, wave reached per episode)
+    """
+    env = SimulatedPokeRogueEnv(max_waves=max_waves, trajectory_dir=trajectory_dir, **env_kwargs)
+    waves = []
+    env.reset(seed=seed)
+    try:
+        while len(waves) < episodes:
+            _, _, terminated, truncated, _ = env.step(env.simulator.greedy_action())
+            if terminated or truncated:
+                waves.append(env.simulator.wave)
+                if len(waves) % 50 == 0:
+                    logger.info(f"{len(waves)}/{episodes} episodes, mean wave {sum(waves) / len(waves):.1f}")
+                if len(waves) < episodes:
+                    env.reset()
+    finally:
+        env.close()
+    logger.info(f"Recorded {episodes} episodes to {env.recorder.path}, mean wave {sum(waves) / max(1, len(waves)):.1f}, best {max(waves, default=0)}")
+    return env.recorder.path, waves
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Record games of the greedy heuristic in the battle simulator")
+    parser.add_argument("--episodes", type=int, default=500)
+    parser.add_argument("--dir", default=TRAJECTORY_DIR, help="folder for the recordings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-waves", type=int, default=50)
+    parser.add_argument("--type-effectiveness", action="store_true", help="observations with the type effectiveness block")
+    parser.add_argument("--id-observations", action="store_true", help="id observations for the EmbeddingFeaturesExtractor")
+    args = parser.parse_args()
+
+    record_heuristic_games(args.episodes, args.dir, args.seed, args.max_waves, type_effectiveness=args.type_effectiveness,
+                           id_observations=args.id_observations)
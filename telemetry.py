@@ -0,0 +1,127 @@
+"""
+Per-step telemetry of the envs as rotating JSONL files, written by a background thread.
+Memory stays flat over long runs: the records wait in a bounded queue and are written (and flushed) in batches,
+if the writer can not keep up, records are dropped and counted instead of stalling the env.
+Every process writes its own files, logs/telemetry/telemetry_w<worker>_<start>_<part>.jsonl, one JSON object per line:
+
+    {"time": ..., "worker": 0, "episode_index": 3, "episode_step": 41, "reward": 4.2, "components": {"damage_dealt": 6.0, ...},
+     "stage": 12, "phase": "CommandPhase", "step_latency": 0.83, "terminated": false, ...}
+
+"stage" is the wave, see PokeRogueEnv._get_info.
+
+A crash loses at most the records of the last flush interval; close() (also registered with atexit) writes the rest.
+training_plotter.py reads these files.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_DIR = "logs/telemetry"
+FILE_PATTERN = "telemetry_w{worker}_{start}_{part:04d}.jsonl"
+
+_CLOSE = object()
+
+
+class TelemetryWriter:
+    def __init__(self, directory: str = TELEMETRY_DIR, worker_id: int = 0, records_per_file: int = 100000, queue_size: int = 10000,
+                 flush_interval: float = 1.0):
+        """
+        :param records_per_file: a new file is started after that many records
+        :param queue_size: records waiting to be written at most, further ones are dropped
+        :param flush_interval: seconds between flushes while records keep coming
+        """
+        self.directory = directory
+        self.worker_id = worker_id
+        self.records_per_file = records_per_file
+        self.flush_interval = flush_interval
+        self.start = time.strftime("%Y%m%d_%H%M%S")
+        self.dropped = 0
+        self.written = 0
+        self.part = 0
+        self._file = None
+        self._file_records = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"telemetry-{worker_id}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def path(self) -> str:
+        """file that is currently written"""
+        return os.path.join(self.directory, FILE_PATTERN.format(worker=self.worker_id, start=self.start, part=self.part))
+
+    def write(self, record: dict):
+        """queues one record, never blocks"""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+            self.part += 1
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._file_records = 0
+
+    def _run(self):
+        closing = False
+        last_flush = time.monotonic()
+        while not closing:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # everything that is already waiting goes into the same write
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _CLOSE:
+                closing = True
+                batch.pop()
+            try:
+                self._write_batch(batch)
+                if self._file is not None and (closing or time.monotonic() - last_flush >= self.flush_interval or self._queue.empty()):
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Telemetry could not be written to {self.path}: {e}")
+        if self._file is not None:
+            self._file.close()
+
+    def _write_batch(self, batch: list):
+        lines = []
+        for record in batch:
+            if self._file is None or self._file_records >= self.records_per_file:
+                if lines:
+                    self._file.write("".join(lines))
+                    lines = []
+                self._open_next()
+            lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file_records += 1
+        if lines:
+            self._file.write("".join(lines))
+        self.written += len(batch)
+
+    def close(self, timeout: float = 10.0):
+        """writes what is still queued and stops the thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)  # blocks while the queue is full, the thread is emptying it
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+        if self.dropped:
+            logger.warning(f"Telemetry of worker {self.worker_id}: {self.dropped} records dropped (queue full)")
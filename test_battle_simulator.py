@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+
+import DataExtraction.create_input as input_creator
+from Environment.v2PLUS import reward as reward_function
+from Environment.v2PLUS.battle_simulator import (BattleSimulator, Combatant, SimulatedPokeRogueEnv, calculate_stats, create_encoder,
+                                                 load_battle_data, make_simulated_vec_env)
+from Embeddings.type_effectiveness import TYPE_NAMES
+from pretrain_bc import decision_pairs
+from record_heuristic_games import record_heuristic_games
+from trajectory_store import TrajectoryReader
+
+with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+    pokemon_embeddings_data = json.loads(f.read())
+with open("Embeddings/moves/move_embeddings.json", "r") as f:
+    move_embeddings_data = json.loads(f.read())
+
+
+def play(env, steps: int, seed: int = 0):
+    """random actions, :return: [(obs, reward, terminated, info)]"""
+    env.action_space.seed(seed)
+    env.reset(seed=seed)
+    transitions = []
+    for _ in range(steps):
+        obs, reward, terminated, truncated, info = env.step(env.action_space.sample())
+        transitions.append((obs, reward, terminated, info))
+        if terminated or truncated:
+            env.reset()
+    return transitions
+
+
+def test_scene_has_the_shape_of_the_game():
+    env = SimulatedPokeRogueEnv(double_fight_chance=1.0)
+    env.reset(seed=3)
+    scene = env.simulator.scene()
+    expected, expected_meta = input_creator.create_input_vector(scene, pokemon_embeddings_data, move_embeddings_data)
+    obs, meta_data = env.encoder.encode(scene)
+    assert np.array_equal(obs, np.array(expected, dtype=np.float32))
+    assert meta_data == expected_meta
+    assert env.observation_space.contains(env.new_obs)
+    assert meta_data["is_double_fight"] and meta_data["second_pokemon_acts"] and env.action_masks().all()
+
+
+def test_reward_is_the_reward_of_the_real_env():
+    env = SimulatedPokeRogueEnv()
+    env.action_space.seed(1)
+    env.reset(seed=1)
+    for _ in range(200):
+        last_meta_data = env.last_meta_data
+        _, reward, terminated, _, info = env.step(env.action_space.sample())
+        assert reward == reward_function.total_reward(reward_function.reward_components(last_meta_data, env.new_meta_data))
+        assert info["stage"] == env.simulator.wave
+        if terminated:
+            env.reset()
+    # a run ends and waves are cleared on the way
+    transitions = play(SimulatedPokeRogueEnv(), 2000, seed=2)
+    assert any(terminated for _, _, terminated, _ in transitions)
+    assert max(info["stage"] for _, _, _, info in transitions) > 3
+    assert all(np.isfinite(reward) for _, reward, _, _ in transitions)
+
+
+def test_same_seed_same_games():
+    first = play(SimulatedPokeRogueEnv(), 300, seed=7)
+    second = play(SimulatedPokeRogueEnv(), 300, seed=7)
+    assert all(np.array_equal(a[0], b[0]) and a[1] == b[1] for a, b in zip(first, second))
+
+
+def test_type_immunity_and_stab():
+    data = load_battle_data()
+    simulator = BattleSimulator(data, create_encoder())
+    gengar = next(species for species in data.species if species.dex == 94)  # ghost/poison
+    rattata = next(species for species in data.species if species.dex == 19)  # normal
+    tackle = data.moves[33]  # normal, physical
+    assert TYPE_NAMES[tackle.type] == "normal"
+    attacker, ghost, normal = Combatant(1, rattata, 20, [tackle]), Combatant(2, gengar, 20, [tackle]), Combatant(3, rattata, 20, [tackle])
+    assert simulator.damage(attacker, ghost, tackle) == 0
+    assert simulator.damage(attacker, normal, tackle) > 0
+    assert calculate_stats(rattata.base_stats, 100)[0] == 2 * 30 + 15 + 110
+
+
+def test_vec_env_and_recording(tmp_path):
+    vec_env = make_simulated_vec_env(4, seed=0, trajectory_dir=str(tmp_path))
+    obs = vec_env.reset()
+    assert obs.shape == (4, 210)
+    for _ in range(50):
+        obs, rewards, dones, infos = vec_env.step(np.array([vec_env.action_space.sample() for _ in range(4)]))
+    vec_env.close()
+    reader = TrajectoryReader(next(str(path) for path in tmp_path.iterdir()))
+    steps = reader.steps(0)
+    assert len(steps) > 0 and steps["obs"].shape[1] == 210
+
+
+def test_greedy_heuristic_records_games_for_pretraining(tmp_path):
+    path, greedy_waves = record_heuristic_games(10, str(tmp_path), seed=4)
+    random_waves = []
+    env = SimulatedPokeRogueEnv()
+    env.action_space.seed(4)
+    env.reset(seed=4)
+    while len(random_waves) < 10:
+        _, _, terminated, _, _ = env.step(env.action_space.sample())
+        if terminated:
+            random_waves.append(env.simulator.wave)
+            env.reset()
+    assert np.mean(greedy_waves) > np.mean(random_waves)
+
+    reader = TrajectoryReader(path)
+    assert reader.episodes() == list(range(10))
+    observations, actions = decision_pairs(reader.episode_rows(0))
+    assert len(actions) == len(reader.steps(0)) > 0 and observations.shape[1] == 210
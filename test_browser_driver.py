@@ -0,0 +1,69 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import DataExtraction.automated_session_startup as session_startup
+from Environment import browser_driver
+from Environment.browser_driver import CDP_BASE_PORT, CDPDriver, CDPError
+
+
+class SilentWebSocket:
+    """accepts every request, the browser never answers"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def recv(self):
+        self.closed.wait()
+        raise ConnectionError("closed")
+
+    def close(self):
+        self.closed.set()
+
+
+def test_call_without_answer_raises_cdp_error(monkeypatch):
+    monkeypatch.setattr(browser_driver, "create_connection", lambda url, **kwargs: SilentWebSocket())
+    driver = CDPDriver("ws://fake", timeout=0.05)
+    with pytest.raises(CDPError):
+        driver.call("Runtime.evaluate", {"expression": "1"})
+    assert driver._pending == {}
+    driver.quit()
+
+
+def test_every_worker_gets_its_own_debugging_port(monkeypatch):
+    launched = []
+
+    def fake_launch_chrome(**kwargs):
+        launched.append(kwargs)
+        return MagicMock()
+
+    monkeypatch.setattr(browser_driver, "launch_chrome", fake_launch_chrome)
+    monkeypatch.setattr(session_startup.time, "sleep", lambda seconds: None)
+    for worker_id in range(3):
+        session_startup.setup_driver(backend="cdp", worker_id=worker_id)
+    assert [kwargs["port"] for kwargs in launched] == [CDP_BASE_PORT, CDP_BASE_PORT + 1, CDP_BASE_PORT + 2]
+    assert len({kwargs["profile_dir"] for kwargs in launched}) == 3
+
+
+def test_closed_connection_fails_fast(monkeypatch):
+    websocket = SilentWebSocket()
+    monkeypatch.setattr(browser_driver, "create_connection", lambda url, **kwargs: websocket)
+    driver = CDPDriver("ws://fake", timeout=5.0)
+    pending = driver.send("Page.reload")
+    driver.quit()
+    driver._reader.join(timeout=1)
+    with pytest.raises(CDPError):
+        pending.result(timeout=1)
+    with pytest.raises(CDPError):
+        driver.call("Runtime.evaluate", {"expression": "1"})
+    assert driver._pending == {}
+
+
+def test_browser_driver_is_abstract():
+    with pytest.raises(TypeError):
+        browser_driver.BrowserDriver()
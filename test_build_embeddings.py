@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from Embeddings import build_embeddings, embedding_store
+
+NEW_SPECIES = '{dex:9999,img:"9999",t1:3,t2:7,a1:1,ha:2,pa:3,bst:500,hp:80,atk:90,def:80,spa:90,spd:80,spe:80,co:3,et:0,sh:3,ge:9,st:1,fa:9999,fs:1},\n'
+
+
+@pytest.fixture
+def build_dir(tmp_path, monkeypatch):
+    """all inputs and outputs of the pipeline in tmp_path, the repo files stay untouched"""
+    shutil.copyfile(build_embeddings.POKEDEX_JS_PATH, str(tmp_path / "pokedex_data.js"))
+    shutil.copyfile(build_embeddings.COLLECTED_MOVES_PATH, str(tmp_path / "collected_move_data.json"))
+    paths = {"BUILD_DIR": "build", "POKEDEX_JS_PATH": "pokedex_data.js", "POKEDEX_JSON_PATH": "pokedex_data.json",
+             "COLLECTED_MOVES_PATH": "collected_move_data.json", "POKEMON_MODEL_PATH": "build/pokemon_model.pkl",
+             "MOVE_MODEL_PATH": "build/move_model.pkl", "TYPE_MODEL_PATH": "build/type_model.pkl"}
+    for name, path in paths.items():
+        monkeypatch.setattr(build_embeddings, name, str(tmp_path / path))
+    for name, path in {"STORE_PATH": "embedding_store.npy", "POKEMON_EMBEDDINGS_PATH": "pokemon_embeddings.json",
+                       "MOVE_EMBEDDINGS_PATH": "move_embeddings.json", "TYPE_EMBEDDINGS_PATH": "type_embeddings.json"}.items():
+        monkeypatch.setattr(embedding_store, name, str(tmp_path / path))
+    return tmp_path
+
+
+def run_build(directory, **kwargs) -> list:
+    return build_embeddings.build(manifest_path=str(directory / "build" / "manifest.json"), **kwargs)
+
+
+def read_json(path) -> dict:
+    with open(path, "r") as f:
+        return json.loads(f.read())
+
+
+def test_unchanged_inputs_are_skipped(build_dir):
+    assert run_build(build_dir) == ["pokedex_json", "pokemon", "moves", "types", "store"]
+    assert run_build(build_dir) == []
+    assert run_build(build_dir, force=True) == ["pokedex_json", "pokemon", "moves", "types", "store"]
+
+
+def test_edited_or_deleted_output_is_rebuilt(build_dir):
+    run_build(build_dir)
+    original = read_json(build_dir / "pokemon_embeddings.json")
+
+    edited = dict(original, **{"1-0": [0.0] * 8})
+    with open(build_dir / "pokemon_embeddings.json", "w") as f:
+        f.write(json.dumps(edited))
+    assert run_build(build_dir) == ["pokemon"]  # rebuilt to the same file, the store stays current
+    assert read_json(build_dir / "pokemon_embeddings.json") == original
+
+    os.remove(build_dir / "move_embeddings.json")
+    assert run_build(build_dir) == ["moves"]
+    assert os.path.exists(build_dir / "move_embeddings.json")
+
+
+def test_game_update_keeps_existing_embeddings(build_dir):
+    run_build(build_dir)
+    before = read_json(build_dir / "pokemon_embeddings.json")
+
+    with open(build_dir / "pokedex_data.js", "r") as f:
+        text = f.read()
+    with open(build_dir / "pokedex_data.js", "w") as f:
+        f.write(text[:text.rindex("];")] + NEW_SPECIES + "];\n")
+    assert run_build(build_dir) == ["pokedex_json", "pokemon", "store"]
+
+    after = read_json(build_dir / "pokemon_embeddings.json")
+    assert set(after) == set(before) | {"9999-0"}
+    assert all(np.allclose(after[key], before[key], atol=1e-9) for key in before)
+    projected = build_embeddings.project_pokemon(read_json(build_dir / "pokedex_data.json")[-1:], build_embeddings.POKEMON_MODEL_PATH)
+    assert np.allclose(after["9999-0"], projected["9999-0"])
+
+    # only an explicit refit fits new models (and may move everything)
+    assert run_build(build_dir, refit=True) == ["pokemon", "moves", "types", "store"]
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("stable_baselines3")
+import torch
+from stable_baselines3 import PPO
+
+from checkpoint_manager import CheckpointManager
+
+
+def parameters(model) -> list:
+    return [parameter.detach().clone() for parameter in model.policy.parameters()]
+
+
+def test_snapshot_is_taken_at_save_time_and_loads(tmp_path):
+    model = PPO("MlpPolicy", "CartPole-v1", n_steps=32, batch_size=32, n_epochs=1)
+    manager = CheckpointManager(str(tmp_path))
+    expected = parameters(model)
+    future = manager.save(model, 100, mean_wave=3.0)
+    with torch.no_grad():
+        for parameter in model.policy.parameters():
+            parameter.add_(1.0)  # training goes on while the checkpoint is written
+    assert future.result() == os.path.join(str(tmp_path), "checkpoint_100.zip")
+    manager.close()
+
+    loaded = PPO.load(future.result())
+    assert all(torch.equal(a, b) for a, b in zip(parameters(loaded), expected))
+    assert loaded.policy.optimizer.state_dict()["param_groups"] == model.policy.optimizer.state_dict()["param_groups"]
+    assert os.path.exists(os.path.join(str(tmp_path), "latest_model.zip"))
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
+
+
+def test_retention_keeps_newest_and_best(tmp_path):
+    model = PPO("MlpPolicy", "CartPole-v1", n_steps=32, batch_size=32, n_epochs=1)
+    manager = CheckpointManager(str(tmp_path), keep_last=2, keep_best=1)
+    for timesteps, mean_wave in [(1, 4.0), (2, 9.0), (3, None), (4, 5.0), (5, 6.0)]:
+        manager.save(model, timesteps, mean_wave)
+    manager.close()
+
+    zips = sorted(name for name in os.listdir(str(tmp_path)) if name.startswith("checkpoint_"))
+    assert zips == ["checkpoint_2.zip", "checkpoint_4.zip", "checkpoint_5.zip"]
+    assert manager.best_path == os.path.join(str(tmp_path), "checkpoint_2.zip")
+    with open(os.path.join(str(tmp_path), "checkpoints.json"), "r") as f:
+        assert [record["timesteps"] for record in json.loads(f.read())] == [2, 4, 5]
+
+    # a new run continues with the kept checkpoints
+    manager = CheckpointManager(str(tmp_path), keep_last=2, keep_best=1)
+    manager.save(model, 6, 1.0)
+    manager.close()
+    assert [record["timesteps"] for record in manager.records] == [2, 5, 6]
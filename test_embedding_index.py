@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+
+from Embeddings.Pokemon import create_pokemon_data, embedding_index
+from Embeddings.Pokemon.embedding_index import PokemonEmbeddingIndex
+
+with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+    pokemon_embeddings_data = json.loads(f.read())
+
+index = PokemonEmbeddingIndex.from_embeddings(pokemon_embeddings_data)
+QUERIES = ["6-0", "25-0", "150-1", "1-0", list(pokemon_embeddings_data)[-1]]
+
+
+def brute_force_similarities(key: str) -> dict:
+    """cosine similarity of key to every pokemon, in float64 like sklearn's cosine_similarity"""
+    keys = list(pokemon_embeddings_data)
+    embeddings = np.array([pokemon_embeddings_data[other] for other in keys], dtype=np.float64)
+    query = np.array(pokemon_embeddings_data[key], dtype=np.float64)
+    similarities = embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+    return dict(zip(keys, similarities))
+
+
+def test_top_k_matches_brute_force():
+    for key, result in zip(QUERIES, index.top_k(QUERIES, k=10)):
+        similarities = brute_force_similarities(key)
+        expected = sorted((similarity for other, similarity in similarities.items() if other != key), reverse=True)[:10]
+        assert key not in [other for other, _ in result]
+        # same values in the same order, tied forms may swap places
+        assert np.allclose([similarity for _, similarity in result], expected, atol=1e-5)
+        assert all(np.isclose(similarity, similarities[other], atol=1e-5) for other, similarity in result)
+
+
+def test_top_k_with_self_and_chunked(monkeypatch):
+    for key, result in zip(QUERIES, index.top_k(QUERIES, k=3, exclude_self=False)):
+        assert key in [other for other, _ in result] and np.isclose(result[0][1], 1.0, atol=1e-5)
+
+    unchunked = index.top_k(index.keys, k=5)
+    monkeypatch.setattr(embedding_index, "QUERY_CHUNK", 7)
+    assert index.top_k(index.keys, k=5) == unchunked
+    assert len(index.top_k([(6, 0)], k=len(index.keys) + 10)[0]) == len(index.keys) - 1
+
+
+def test_create_pokemon_data_uses_the_index():
+    result = create_pokemon_data.get_similar_pokemon_embeddings(6, 0, top_k=5, embeddings_data=pokemon_embeddings_data)
+    assert result == index.top_k([(6, 0)], k=5)[0]
+
+
+def test_distances_match_linalg_norm():
+    pairs = [(6, 0), (25, 0), (150, 1), (1, 0)]
+    distances = create_pokemon_data.get_distances_between_pokemon(pairs, embeddings_data=pokemon_embeddings_data)
+    for i, first in enumerate(pairs):
+        for j, second in enumerate(pairs):
+            expected = create_pokemon_data.get_distance_between_pokemon(*first, *second, embeddings_data=pokemon_embeddings_data)
+            assert np.isclose(distances[i, j], expected, atol=1e-5)
+    assert np.allclose(np.diag(distances), 0.0)
+    assert index.distances(pairs[:2], pairs).shape == (2, 4)
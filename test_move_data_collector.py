@@ -0,0 +1,102 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from Embeddings.moves.compute_move_data import collect_move_data, http_fetcher
+
+
+def fake_move(move_id: int) -> dict:
+    resource = lambda kind, resource_id: {"name": kind, "url": f"https://pokeapi.co/api/v2/{kind}/{resource_id}/"}
+    return {"id": move_id, "accuracy": 100, "power": 40 + move_id, "pp": 35, "priority": 0,
+            "damage_class": resource("move-damage-class", 2), "target": resource("move-target", 10), "type": resource("type", 1),
+            "meta": {"ailment": resource("move-ailment", 0), "ailment_chance": 0, "category": resource("move-category", 0),
+                     "crit_rate": 0, "drain": 0, "flinch_chance": 0, "healing": 0, "min_hits": None, "max_hits": None,
+                     "min_turns": None, "max_turns": None, "stat_chance": 0}}
+
+
+@pytest.fixture
+def move_server():
+    """local stand-in for PokeAPI: moves 1-5, move 3 does not exist, move 4 has no meta data"""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            move_id = int(self.path.rstrip("/").split("/")[-1])
+            requests_seen.append(move_id)
+            if move_id == 3 or move_id > 5:
+                self.send_response(404)
+                self.end_headers()
+                return
+            move = fake_move(move_id)
+            if move_id == 4:
+                move["meta"] = None
+            body = json.dumps(move).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/v2/move/", requests_seen
+    server.shutdown()
+
+
+def test_collect_cache_resume_offline(move_server, tmp_path):
+    base_url, requests_seen = move_server
+    cache_dir = str(tmp_path / "cache")
+    output_file = str(tmp_path / "collected_move_data.json")
+
+    moves = collect_move_data(range(1, 7), output_file, cache_dir, fetch=http_fetcher(base_url, retries=0), max_workers=4)
+    assert list(moves.keys()) == [1, 2, 5]
+    assert moves[2]["power"] == 42 and moves[2]["damage_class"] == 2 and moves[2]["min_hits"] == 0
+    assert sorted(requests_seen) == [1, 2, 3, 4, 5, 6]
+    with open(output_file, "r") as f:
+        assert json.loads(f.read()) == {str(move_id): move for move_id, move in moves.items()}
+
+    # resume: everything (including the 404s) is cached, nothing is requested again
+    assert collect_move_data(range(1, 7), output_file, cache_dir, fetch=http_fetcher(base_url, retries=0)) == moves
+    assert len(requests_seen) == 6
+
+    # offline: only the cache, move 7 is missing and stays missing
+    assert collect_move_data(range(1, 8), output_file, cache_dir, offline=True) == moves
+    assert len(requests_seen) == 6
+
+
+def test_failed_moves_are_fetched_on_the_next_run(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    output_file = str(tmp_path / "collected_move_data.json")
+
+    def flaky_fetch(move_id):
+        if move_id == 2:
+            raise ConnectionError("offline")
+        return fake_move(move_id)
+
+    assert list(collect_move_data([1, 2], output_file, cache_dir, fetch=flaky_fetch).keys()) == [1]
+    assert list(collect_move_data([1, 2], output_file, cache_dir, fetch=fake_move).keys()) == [1, 2]
+
+
+def test_incomplete_cache_keeps_the_old_output(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    output_file = str(tmp_path / "collected_move_data.json")
+    collect_move_data([1, 2], output_file, cache_dir, fetch=fake_move)
+    with open(output_file, "r") as f:
+        complete = f.read()
+
+    # move 3 was never fetched, offline there is no way to get it
+    assert list(collect_move_data([1, 2, 3], output_file, cache_dir, offline=True).keys()) == [1, 2]
+    with open(output_file, "r") as f:
+        assert f.read() == complete
+
+    def failing_fetch(move_id):
+        raise ConnectionError("offline")
+
+    collect_move_data([1, 2, 3], output_file, cache_dir, fetch=failing_fetch)
+    with open(output_file, "r") as f:
+        assert f.read() == complete
@@ -0,0 +1,195 @@
+import copy
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import DataExtraction.create_input as input_creator
+from DataExtraction.observation_encoder import ObservationEncoder, SAMPLE_SCENE
+
+with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+    pokemon_embeddings_data = json.loads(f.read())
+with open("Embeddings/moves/move_embeddings.json", "r") as f:
+    move_embeddings_data = json.loads(f.read())
+
+encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data)
+
+
+def assert_same_as_create_input_vector(scene):
+    expected, expected_meta = input_creator.create_input_vector(scene, pokemon_embeddings_data, move_embeddings_data)
+    obs, meta_data = encoder.encode(scene)
+    assert np.array_equal(obs, np.array(expected, dtype=np.float32))
+    assert meta_data == expected_meta
+
+
+def test_full_scene():
+    assert_same_as_create_input_vector(SAMPLE_SCENE)
+
+
+def test_single_enemy_small_party_unknown_move():
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["enemy"] = scene["enemy"][:1]
+    scene["player"] = scene["player"][:3]
+    scene["player"][0]["moveset"] = [{"id": 99999}, {"id": 1}, {"id": 33}]
+    scene["player"][1]["moveset"] = []
+    assert_same_as_create_input_vector(scene)
+
+
+def test_buffer_is_reused_unless_out_given():
+    first, _ = encoder.encode(SAMPLE_SCENE)
+    second, _ = encoder.encode(SAMPLE_SCENE)
+    assert first is second
+    out = np.empty(210, dtype=np.float32)
+    own, _ = encoder.encode(SAMPLE_SCENE, out=out)
+    assert own is out and np.array_equal(own, first)
+
+
+def test_store_encoder_matches(tmp_path):
+    from Embeddings.embedding_store import EmbeddingStore, export_store
+
+    with open("Embeddings/type_embeddings.json", "r") as f:
+        type_embeddings_data = json.loads(f.read())
+    path = str(tmp_path / "store.npy")
+    export_store(pokemon_embeddings_data, move_embeddings_data, type_embeddings_data, path=path)
+    store = EmbeddingStore.load(path)
+    assert isinstance(store.data, np.memmap) and not store.data.flags.writeable
+    store_obs, _ = ObservationEncoder.from_store(store).encode(SAMPLE_SCENE)
+    assert np.array_equal(store_obs, encoder.encode(SAMPLE_SCENE)[0])
+    assert store.get_move_embedding(99999).tolist() == [0.0] * 4
+
+
+def test_incremental_encoder_follows_changes():
+    from DataExtraction.observation_encoder import IncrementalObservationEncoder
+
+    incremental = IncrementalObservationEncoder(encoder.pokemon_table, encoder.pokemon_index, encoder.move_table, encoder.move_index)
+    scenes = [SAMPLE_SCENE]
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["enemy"][0]["hp"] = 3
+    scene["player"][2]["visible"] = True
+    scenes.append(scene)
+    scene = copy.deepcopy(scene)
+    scene["player"][0]["moveset"] = scene["player"][0]["moveset"][:2]  # forgot moves -> stale move slots must be cleared
+    scene["player"][3]["stats"] = [25, 15, 9, 12, 10, 14]  # level up
+    scene["enemy"] = [{"id": 13, "dex_nr": 263, "formIndex": 0, "hp": 14, "stats": [14, 5, 6, 6, 6, 8]}]
+    scenes.append(scene)
+    scene = copy.deepcopy(scene)
+    scene["player"] = scene["player"][:4]
+    scenes.append(scene)
+    scenes.append(SAMPLE_SCENE)
+
+    for scene in scenes:
+        expected, expected_meta = input_creator.create_input_vector(scene, pokemon_embeddings_data, move_embeddings_data)
+        obs, meta_data = incremental.encode(scene)
+        assert np.array_equal(obs, np.array(expected, dtype=np.float32))
+        assert meta_data == expected_meta
+    assert incremental.cache_stats()["misses"] == 8 + 3 + 6
+
+
+def test_schema_views_share_memory_and_match_offsets():
+    from DataExtraction import observation_schema as schema
+
+    obs, _ = encoder.encode(SAMPLE_SCENE, out=np.empty(schema.OBS_SIZE, dtype=np.float32))
+    view = schema.observation_view(obs)
+    assert schema.OBS_SIZE == 210
+    assert [schema.offset("enemies", 0, "hp"), schema.offset("enemies", 1, "hp"),
+            schema.offset("party", 0, "hp"), schema.offset("party", 1, "hp")] == [8, 17, 26, 58]
+    assert np.shares_memory(view, obs)
+    assert schema.enemy_hp(obs).tolist() == [obs[8], obs[17]]
+    assert view["party"]["visible"].tolist() == [1.0, 1.0, 0.0, 0.0, 0.0, 0.0]
+    assert np.array_equal(view["party"]["moves"][0, 1], obs[schema.offset("party", 0, "moves") + 4:schema.offset("party", 0, "moves") + 8])
+    view["party"]["hp"][0] = 0.5
+    assert obs[26] == 0.5
+    assert schema.party_hp(np.stack([obs, obs])).shape == (2, 6)
+
+
+def test_type_effectiveness_block():
+    from DataExtraction import observation_schema as schema
+    from Embeddings.type_effectiveness import COMBINATION_INDEX, TYPE_NAMES, build_effectiveness_table
+
+    table = build_effectiveness_table()
+    assert table.shape == (18, 171)
+    fire, grass, steel, ghost, normal = (TYPE_NAMES.index(name) for name in ("fire", "grass", "steel", "ghost", "normal"))
+    assert table[fire, COMBINATION_INDEX[grass, steel]] == 4.0
+    assert table[normal, COMBINATION_INDEX[ghost, ghost]] == 0.0
+
+    effectiveness_encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data, type_effectiveness=True)
+    obs, _ = effectiveness_encoder.encode(SAMPLE_SCENE)
+    assert obs.shape == (schema.EFFECTIVENESS_OBS_SIZE,)
+    assert np.array_equal(obs[:schema.OBS_SIZE], encoder.encode(SAMPLE_SCENE)[0])
+    # Dedenne: Tail Whip (status), Nuzzle (electric), Tackle, Boomburst vs. Zigzagoon (normal) and Pidgey (normal/flying)
+    assert schema.observation_view(obs)["effectiveness"]["moves"][0].tolist() == [[0, 0], [1, 2], [1, 1], [1, 1]]
+
+    single = copy.deepcopy(SAMPLE_SCENE)
+    single["metaData"]["isDoubleFight"] = False
+    single["enemy"] = single["enemy"][:1]
+    block = schema.observation_view(effectiveness_encoder.encode(single)[0])["effectiveness"]["moves"]
+    assert block[:, :, 1].sum() == 0 and block[1].sum() == 0
+
+
+def test_action_mask():
+    _, meta_data = encoder.encode(SAMPLE_SCENE)
+    assert meta_data["action_mask"] == [True] * 12
+    assert meta_data["second_pokemon_acts"]
+
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["enemy"][1]["hp"] = 0
+    scene["player"][0]["moveset"] = [{"id": 33, "pp": 0}, {"id": 39, "pp": 5}, {"id": 609}]
+    scene["player"][1]["hp"] = 0
+    mask = encoder.encode(scene)[1]["action_mask"]
+    assert mask == [False, True, True, False, True, False] + [True, False, False, False, True, False]
+    assert not encoder.encode(scene)[1]["second_pokemon_acts"]
+
+    single = copy.deepcopy(SAMPLE_SCENE)
+    single["metaData"]["isDoubleFight"] = False
+    single["enemy"] = single["enemy"][:1]
+    single["player"][0]["moveset"] = [{"id": 33, "pp": 0}]  # nothing left -> struggle via slot 0
+    assert encoder.encode(single)[1]["action_mask"] == [True, False, False, False, True, False] * 2
+
+
+def test_id_observations_through_embedding_layers_match_embedding_observations():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("stable_baselines3")
+    from DataExtraction import observation_schema as schema
+    from DataExtraction.observation_encoder import IdObservationEncoder
+    from Environment.v2PLUS.embedding_features import EmbeddingFeaturesExtractor
+
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["enemy"] = scene["enemy"][:1]
+    scene["player"][0]["moveset"] = [{"id": 99999}, {"id": 1}, {"id": 33}]
+    for type_effectiveness in (False, True):
+        embedding_encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data, type_effectiveness=type_effectiveness)
+        id_encoder = IdObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data, type_effectiveness=type_effectiveness)
+        ids, meta_data = id_encoder.encode(scene)
+        assert ids.shape == (schema.obs_size(type_effectiveness, ids=True),)
+        assert meta_data == embedding_encoder.encode(scene)[1]
+        view = schema.observation_view(ids)
+        assert view["enemies"]["pokemon"].tolist() == [id_encoder.pokemon_row(263, 0) + 1, 0]
+        assert view["party"]["moves"][0].tolist() == [0, id_encoder.move_row(1), 0, 0]
+
+        extractor = EmbeddingFeaturesExtractor(schema.observation_space(type_effectiveness=type_effectiveness, ids=True),
+                                               id_encoder.pokemon_table, id_encoder.move_table)
+        features = extractor(torch.from_numpy(np.stack([ids, ids])))
+        assert features.shape == (2, extractor.features_dim)
+        assert np.array_equal(features[0].detach().numpy(), embedding_encoder.encode(scene)[0])
+
+
+def test_stale_store_is_not_used(tmp_path, monkeypatch):
+    from Embeddings import embedding_store
+
+    for name in ("POKEMON_EMBEDDINGS_PATH", "MOVE_EMBEDDINGS_PATH", "TYPE_EMBEDDINGS_PATH"):
+        copy = str(tmp_path / os.path.basename(getattr(embedding_store, name)))
+        shutil.copyfile(getattr(embedding_store, name), copy)
+        monkeypatch.setattr(embedding_store, name, copy)
+    path = str(tmp_path / "store.npy")
+    embedding_store.export_from_json(path)
+    assert embedding_store.load_current(path) is not None
+
+    # the JSON changes (e.g. create_pokemon_data re-run by hand), the store does not
+    changed = dict(pokemon_embeddings_data, **{"1-0": [0.0] * 8})
+    with open(embedding_store.POKEMON_EMBEDDINGS_PATH, "w") as f:
+        f.write(json.dumps(changed))
+    assert embedding_store.EmbeddingStore.load(path).stale_tables() == ["pokemon"]
+    assert embedding_store.load_current(path) is None
+    assert embedding_store.load_current(str(tmp_path / "missing.npy")) is None
@@ -0,0 +1,63 @@
+import copy
+import json
+
+import DataExtraction.create_input as input_creator
+from DataExtraction.observation_encoder import SAMPLE_SCENE
+from Environment.send_key_inputs import JS_PRESS_SEQUENCE
+from Environment.v2PLUS import phase_handler
+
+with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+    pokemon_embeddings_data = json.loads(f.read())
+with open("Embeddings/moves/move_embeddings.json", "r") as f:
+    move_embeddings_data = json.loads(f.read())
+
+
+def scene_in(phase_name: str) -> dict:
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["phase"]["phaseName"] = phase_name
+    return scene
+
+
+class FakeDriver:
+    """hands out the given scenes one after the other, the page has no phase hook"""
+
+    def __init__(self, scenes: list):
+        self.scenes = scenes
+        self.pressed = []
+
+    def execute_script(self, script):
+        return self.scenes.pop(0)
+
+    def execute_async_script(self, script, *args):
+        if script == JS_PRESS_SEQUENCE:
+            self.pressed.append(args[0])
+            return True
+        return None
+
+
+def test_repeated_skip_phase_is_detected_as_stuck(monkeypatch):
+    results = []
+
+    def spy(meta_data, driver, phase_counter, options):
+        results.append(phase_handler._handle_skip_phase(meta_data, driver, phase_counter, options))
+        return results[-1]
+
+    sleeps = []
+    monkeypatch.setitem(phase_handler.PHASE_TABLE, "MessagePhase", spy)
+    monkeypatch.setattr(phase_handler.time, "sleep", sleeps.append)
+    driver = FakeDriver([scene_in("MessagePhase")] * 3 + [scene_in("CommandPhase")])
+    meta_data = input_creator.create_meta_data(scene_in("MessagePhase"))
+
+    terminated, reward_meta, _ = phase_handler.phase_handler(meta_data, [], driver, pokemon_embeddings_data, move_embeddings_data)
+
+    assert results == [phase_handler.PHASE_HANDLED, phase_handler.PHASE_HANDLED, phase_handler.PHASE_STUCK, phase_handler.PHASE_STUCK]
+    assert len(driver.pressed) == 2  # SPACE only while it still could help
+    assert sleeps == [1, 1]
+    assert not terminated and reward_meta["phaseName"] == "CommandPhase"
+
+
+def test_phase_stats_reset():
+    stats = phase_handler.PhaseStats()
+    stats.record("MessagePhase", 0.5)
+    stats.reset()
+    assert stats.summary() == [] and stats.last_call == {}
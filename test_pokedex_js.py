@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from Embeddings.Pokemon.pokedex_js import iter_pokedex_js, pokedex_columns, write_json
+
+POKEDEX_JSON_PATH = "Embeddings/Pokemon/pokedex_data.json"
+
+
+@pytest.fixture(scope="module")
+def pokedex_data():
+    with open(POKEDEX_JSON_PATH, "r", encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+@pytest.mark.parametrize("chunk_size", [5, 1 << 16])
+def test_stream_matches_pokedex_json(pokedex_data, chunk_size):
+    # small chunks cut through numbers, keys and strings
+    assert list(iter_pokedex_js(chunk_size=chunk_size)) == pokedex_data
+
+
+def test_write_json_same_bytes_as_json_dump(pokedex_data, tmp_path):
+    write_json(iter_pokedex_js(), str(tmp_path / "pokedex.json"), indent=2)
+    with open(POKEDEX_JSON_PATH, "rb") as f:
+        assert (tmp_path / "pokedex.json").read_bytes() == f.read()
+    write_json(pokedex_data[:3], str(tmp_path / "compact.json"))
+    assert (tmp_path / "compact.json").read_text(encoding="utf-8") == json.dumps(pokedex_data[:3], ensure_ascii=False, separators=(",", ":"))
+
+
+def test_numerical_keys_and_columns(tmp_path):
+    path = tmp_path / "pokedex.js"
+    path.write_text('// test\nconst items=[\n{dex:1,img:"a:b",t1:9,876:204,12:-1,1197:[80, 3]},\n{dex:1,img:"1-mega",t1:9,t2:13,e1:-5},\n];\n')
+    assert list(iter_pokedex_js(str(path), chunk_size=3)) == [{"dex": 1, "img": "a:b", "t1": 9},
+                                                              {"dex": 1, "img": "1-mega", "t1": 9, "t2": 13, "e1": -5}]
+    assert list(iter_pokedex_js(str(path), drop_numerical_keys=False))[0] == {"dex": 1, "img": "a:b", "t1": 9, "876": 204, "12": -1,
+                                                                              "1197": [80, 3]}
+    columns = pokedex_columns(iter_pokedex_js(str(path)), fields=["dex", "t2", "e1"])
+    assert columns["t2"].tolist() == [-1, 13] and columns["e1"].tolist() == [-1, -5]
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from stable_baselines3 import PPO
+from torch.utils.data import DataLoader
+
+import DataExtraction.observation_schema as obs_schema
+from pretrain_bc import BehaviorCloningDataset, decision_pairs, pretrain
+from trajectory_store import TrajectoryReader, TrajectoryRecorder
+
+
+def expert_action(obs: np.ndarray) -> list:
+    """a policy the network can learn: first move slot = strongest of the first four floats"""
+    return [int(np.argmax(obs[:4])), int(obs[4] > 0), 0, 0]
+
+
+def random_obs(rng, n: int = None) -> np.ndarray:
+    """only the floats the expert looks at are set, the network can not overfit on noise in the others"""
+    obs = np.zeros((n or 1, obs_schema.OBS_SIZE), dtype=np.float32)
+    obs[:, :5] = rng.normal(size=(n or 1, 5))
+    return obs if n else obs[0]
+
+
+def record_expert(directory: str, episodes: int = 20, steps: int = 30, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    recorder = TrajectoryRecorder(obs_schema.OBS_SIZE, directory, chunk_size=256)
+    for episode in range(episodes):
+        obs = random_obs(rng)
+        recorder.start_episode({"metaData": {"waveIndex": 1}}, obs)
+        for step in range(steps):
+            action = expert_action(obs)
+            if step % 10 == 5:
+                recorder.record_phase(None, random_obs(rng))  # e.g. a shop in between
+            obs = random_obs(rng)
+            recorder.record_step({"metaData": {"waveIndex": 1 + episode % 3}}, obs, action, 1.0, step == steps - 1)
+    recorder.close()
+    return recorder.path
+
+
+def test_pairs_use_the_observation_before_the_action(tmp_path):
+    path = record_expert(str(tmp_path), episodes=1, steps=12)
+    observations, actions = decision_pairs(TrajectoryReader(path).episode_rows(0))
+    assert len(actions) == 12
+    assert all(action.tolist() == expert_action(obs) for obs, action in zip(observations, actions))
+
+
+def test_workers_split_the_episodes(tmp_path):
+    dataset = BehaviorCloningDataset([record_expert(str(tmp_path))], min_wave=3, shuffle_buffer=50)
+    assert len(dataset.episodes) == 6 and dataset.pairs == 6 * 30
+    batches = list(DataLoader(dataset, batch_size=64, num_workers=2))
+    assert sum(len(actions) for _, actions in batches) == dataset.pairs
+
+
+def test_pretrained_model_loads_and_imitates(tmp_path):
+    path = record_expert(str(tmp_path / "recordings"), episodes=40)
+    output = str(tmp_path / "bc.zip")
+    pretrain([path], epochs=15, learning_rate=1e-3, num_workers=0, output_path=output)
+
+    model = PPO.load(output, device="cpu")
+    rng = np.random.default_rng(1)
+    observations = random_obs(rng, 200)
+    predicted, _ = model.predict(observations, deterministic=True)
+    expected = np.array([expert_action(obs) for obs in observations])
+    assert (predicted[:, 0] == expected[:, 0]).mean() > 0.6  # chance: 0.25
+    assert (predicted[:, 1] == expected[:, 1]).mean() > 0.8  # chance: 0.5
+
+
+def test_maskable_model_for_masked_training(tmp_path):
+    sb3_contrib = pytest.importorskip("sb3_contrib")
+    path = record_expert(str(tmp_path / "recordings"), episodes=5)
+    output = str(tmp_path / "bc_maskable.zip")
+    pretrain([path], epochs=1, num_workers=0, output_path=output, maskable=True)
+    assert isinstance(sb3_contrib.MaskablePPO.load(output, device="cpu"), sb3_contrib.MaskablePPO)
@@ -0,0 +1,62 @@
+import glob
+import json
+import os
+import threading
+
+import settings
+from Environment.v2PLUS.reward import reward_components, total_reward
+from telemetry import TelemetryWriter
+
+
+def read_records(directory: str) -> list:
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path, "r") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def test_rotation_and_close_writes_everything(tmp_path):
+    writer = TelemetryWriter(str(tmp_path), worker_id=3, records_per_file=40)
+    for step in range(100):
+        writer.write({"episode_step": step, "components": {"damage_dealt": 0.5}})
+    writer.close()
+    writer.write({"episode_step": 100})  # ignored after close
+
+    assert len(glob.glob(os.path.join(str(tmp_path), "telemetry_w3_*.jsonl"))) == 3
+    assert [record["episode_step"] for record in read_records(str(tmp_path))] == list(range(100))
+    assert writer.written == 100 and writer.dropped == 0
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    release = threading.Event()
+
+    class StalledWriter(TelemetryWriter):
+        def _run(self):
+            release.wait()  # e.g. a slow disk
+            super()._run()
+
+    writer = StalledWriter(str(tmp_path), queue_size=5)
+    for step in range(8):
+        writer.write({"episode_step": step})
+    assert writer.dropped == 3
+    release.set()
+    writer.close()
+    assert [record["episode_step"] for record in read_records(str(tmp_path))] == list(range(5))
+
+
+def test_reward_components():
+    weights = settings.reward_weights
+    last = {"stage": 9, "hp_values": {"enemies": {11: 1.0, 12: 0.5}, "players": {1: 1.0, 2: 0.25}}}
+    new = {"stage": 9, "hp_values": {"enemies": {11: 0.75}, "players": {1: 0.5, 2: 0.0}}}
+    components = reward_components(last, new)
+    assert components["damage_dealt"] == (0.25 + 0.5) * weights["hp"] * weights["damage_dealt"]
+    assert components["damage_taken"] == -(0.5 + 0.25) * weights["hp"] * weights["damage_taken"]
+    assert components["member_died"] == weights["member_died"]
+    assert components["wave_done"] == 0.0
+    assert total_reward(components) == sum(components.values())
+
+    # tenth wave: the party is healed, no damage taken, bigger wave bonus
+    cleared = {"stage": 10, "hp_values": {"enemies": {}, "players": {1: 1.0, 2: 1.0}}}
+    components = reward_components(new, cleared)
+    assert components["damage_taken"] == 0.0 and components["wave_done"] == weights["tenth_wave_done"]
@@ -0,0 +1,47 @@
+import json
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from training_plotter import Dashboard, TelemetryTail
+
+
+def append(path, records, tail: str = ""):
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records) + tail)
+
+
+def step(worker, episode_index, reward, stage, terminated=False, phase="CommandPhase", time=1000.0):
+    return {"worker": worker, "episode_index": episode_index, "reward": reward, "stage": stage, "terminated": terminated,
+            "phase": phase, "step_latency": 0.5, "time": time}
+
+
+def test_tail_reads_only_new_complete_lines(tmp_path):
+    path = tmp_path / "telemetry_w0_x_0000.jsonl"
+    append(path, [step(0, 0, 1.0, 1)], tail='{"worker": 0, "rew')
+    tail = TelemetryTail(str(tmp_path))
+    assert len(tail.poll()) == 1
+    assert tail.poll() == []
+    with open(path, "a") as f:
+        f.write('ard": 2.0}\n')
+    assert tail.poll() == [{"worker": 0, "reward": 2.0}]
+
+
+def test_dashboard_aggregates_and_resumes_from_state(tmp_path):
+    path = tmp_path / "telemetry_w0_x_0000.jsonl"
+    append(path, [step(0, 0, 1.0, 1), step(1, 0, 5.0, 3), step(0, 0, 2.0, 2, terminated=True, phase="SwitchPhase"), step(0, 1, 4.0, 1)])
+    dashboard = Dashboard(str(tmp_path))
+    assert dashboard.update() == 4
+    assert list(dashboard.stats.episodes) == [(3.0, 2)]
+    assert dashboard.stats.phase_time == {"CommandPhase": [1.5, 3], "SwitchPhase": [0.5, 1]}
+    assert dashboard.stats.steps_per_second() == 4 / 60
+
+    # restarted dashboard: continues with the saved offsets and aggregates
+    append(path, [step(1, 1, 1.0, 1)])
+    dashboard = Dashboard(str(tmp_path))
+    assert dashboard.update() == 1
+    assert sorted(dashboard.stats.episodes) == [(3.0, 2), (5.0, 3)]  # worker 1 started a new episode
+    assert dashboard.stats.total_steps == 5 and dashboard.stats.max_wave == 3
+    dashboard.write_html(str(tmp_path / "dashboard.html"), refresh=5)
+    assert "data:image/png;base64," in (tmp_path / "dashboard.html").read_text()
@@ -0,0 +1,80 @@
+import copy
+import json
+
+import numpy as np
+
+from DataExtraction.observation_encoder import IdObservationEncoder, ObservationEncoder, SAMPLE_SCENE
+from trajectory_store import KIND_PHASE, KIND_RESET, KIND_STEP, TrajectoryReader, TrajectoryRecorder, recordings
+
+with open("Embeddings/Pokemon/pokemon_embeddings.json", "r") as f:
+    pokemon_embeddings_data = json.loads(f.read())
+with open("Embeddings/moves/move_embeddings.json", "r") as f:
+    move_embeddings_data = json.loads(f.read())
+
+encoder = ObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data)
+
+
+def scene_at(wave: int, hp: int) -> dict:
+    scene = copy.deepcopy(SAMPLE_SCENE)
+    scene["metaData"]["waveIndex"] = wave
+    scene["enemy"][0]["hp"] = hp
+    return scene
+
+
+def record_episodes(directory: str, chunk_size: int) -> TrajectoryRecorder:
+    """two episodes: reset, 3 steps with a shop phase in between; the second one ends terminated"""
+    recorder = TrajectoryRecorder(encoder.obs_size, directory, worker_id=1, chunk_size=chunk_size)
+    for episode in range(2):
+        scene = scene_at(1, 14)
+        recorder.start_episode(scene, encoder.encode(scene)[0])
+        for step in range(3):
+            if step == 1:
+                shop = scene_at(step + 1, 14)
+                recorder.record_phase(shop, encoder.encode(shop)[0])
+            scene = scene_at(step + 2, 13 - step)
+            recorder.record_step(scene, encoder.encode(scene)[0], [step, 1, 0, 0], 0.5 * step, episode == 1 and step == 2)
+    recorder.close()
+    return recorder
+
+
+def test_random_access_across_chunks(tmp_path):
+    recorder = record_episodes(str(tmp_path), chunk_size=3)
+    assert recordings(str(tmp_path)) == [recorder.path]
+    reader = TrajectoryReader(recorder.path)
+    assert len(reader.chunks) == 4 and len(reader) == 10
+    assert reader.episodes() == [0, 1] and reader.episode_length(1) == 5
+    assert isinstance(reader.chunks[0], np.memmap)
+
+    assert [int(kind) for kind in reader.episode_rows(1)["kind"]] == [KIND_RESET, KIND_STEP, KIND_PHASE, KIND_STEP, KIND_STEP]
+    row = reader.row(1, 3)  # second step, in another chunk than the reset of the episode
+    assert (row["step"], row["wave"], row["reward"]) == (2, 3, 0.5)
+    assert row["action"].tolist() == [1, 1, 0, 0]
+    assert reader.scene(1, 3) == scene_at(3, 12)
+    assert np.array_equal(row["obs"], encoder.encode(scene_at(3, 12))[0])
+    assert reader.row(1, 0)["action"].tolist() == [-1, -1, -1, -1]
+
+    steps = reader.steps(1)
+    assert steps["reward"].tolist() == [0.0, 0.5, 1.0] and steps["terminated"].tolist() == [False, False, True]
+    reader.close()
+
+
+def test_reencode_with_another_encoder(tmp_path):
+    recorder = record_episodes(str(tmp_path), chunk_size=1024)
+    reader = TrajectoryReader(recorder.path)
+    id_encoder = IdObservationEncoder.from_embeddings(pokemon_embeddings_data, move_embeddings_data)
+    observations = reader.reencode(id_encoder, 0)
+    assert observations.shape == (4, id_encoder.obs_size)  # reset + 3 steps, without the phase
+    assert np.array_equal(observations[2], id_encoder.encode(scene_at(3, 12))[0])
+    reader.close()
+
+
+def test_unflushed_rows_are_not_visible(tmp_path):
+    recorder = TrajectoryRecorder(encoder.obs_size, str(tmp_path), chunk_size=4)
+    for step in range(5):
+        recorder.record_phase(None, np.zeros(0))  # failed read: no scene, no observation
+    assert len(TrajectoryReader(recorder.path)) == 4
+    recorder.close()
+    reader = TrajectoryReader(recorder.path)
+    assert len(reader) == 5 and reader.episodes() == [-1]
+    assert reader.scene(-1, 4) is None and reader.row(-1, 4)["wave"] == -1
+    reader.close()
@@ -8,7 +8,7 @@ import logging
 import os
 import sys
 from datetime import datetime
-import json
+from collections import deque
 
 # Ensure imports work
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -33,44 +33,65 @@ from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.utils import get_latest_run_id
 
 from Environment.v2PLUS.environmentv2PLUS import PokeRogueEnv
+from Environment.v2PLUS.env_pool import make_vec_env
+from Environment.v2PLUS.battle_simulator import make_simulated_vec_env
+from checkpoint_manager import CheckpointManager
+from telemetry import TELEMETRY_DIR
 
 
 # ----------------------------------------------------------------------
 # Custom callback for saving checkpoints
 # ----------------------------------------------------------------------
 class SaveCheckpointCallback(BaseCallback):
-    def __init__(self, save_freq: int, save_path: str, verbose=1):
+    """Hands a checkpoint to the CheckpointManager every save_freq steps, it is written in the background"""
+
+    def __init__(self, save_freq: int, manager: CheckpointManager, episodes_for_mean: int = 20, verbose=1):
         super().__init__(verbose)
         self.save_freq = save_freq
-        self.save_path = save_path
-        os.makedirs(save_path, exist_ok=True)
+        self.manager = manager
+        self.waves = deque(maxlen=episodes_for_mean)  # wave reached in the last finished episodes
+
+    def mean_wave(self):
+        return sum(self.waves) / len(self.waves) if self.waves else None
 
     def _on_step(self) -> bool:
+        for done, info in zip(self.locals["dones"], self.locals["infos"]):
+            if done and "stage" in info:
+                self.waves.append(info["stage"])
         if self.n_calls % self.save_freq == 0:
-            ckpt_path = os.path.join(self.save_path, f"checkpoint_{self.num_timesteps}")
-            self.model.save(ckpt_path)
-            if self.verbose:
-                logger.info(f"Checkpoint saved: {ckpt_path}")
+            self.manager.save(self.model, self.num_timesteps, self.mean_wave())
         return True
 
 
 # ----------------------------------------------------------------------
 # Load latest model if available
 # ----------------------------------------------------------------------
-def load_or_create_model(env, learning_rate):
+def load_or_create_model(env, learning_rate, n_envs=1, use_action_masking=False, id_observations=False):
     model_path = "models/latest_model.zip"
+    algorithm = PPO
+    if use_action_masking:
+        # optional dependency, only needed for masked training
+        from sb3_contrib import MaskablePPO
+        algorithm = MaskablePPO
 
     if os.path.exists(model_path):
         logger.info(f"Loading existing model: {model_path}")
-        model = PPO.load(model_path, env=env)
+        model = algorithm.load(model_path, env=env)
         return model
 
-    logger.info("No existing model found → creating new PPO model")
-    return PPO(
+    policy_kwargs = None
+    if id_observations:
+        # learnable embedding tables, initialized with the PCA embeddings
+        from Environment.v2PLUS.embedding_features import EmbeddingFeaturesExtractor
+        policy_kwargs = dict(features_extractor_class=EmbeddingFeaturesExtractor)
+
+    logger.info(f"No existing model found → creating new {algorithm.__name__} model")
+    return algorithm(
         policy="MlpPolicy",
         env=env,
+        policy_kwargs=policy_kwargs,
         learning_rate=learning_rate,
-        n_steps=2048,
+        n_steps=2048 // n_envs,  # rollout size stays 2048 steps over all workers
         batch_size=64,
         n_epochs=10,
         gamma=0.99,
@@ -90,19 +111,38 @@ def main():
 
     total_timesteps = 100000
     save_interval = 5000
+    keep_last_checkpoints = 3  # newest checkpoints that are kept
+    keep_best_checkpoints = 2  # checkpoints with the highest mean wave that are kept additionally
     learning_rate = 3e-4
+    n_envs = 1  # number of parallel browsers/games
+    seed = 0
+    turbo = False  # headless browsers with a faster game clock, see benchmark_env_speed.py
+    type_effectiveness = False  # 16 extra observation floats, a model trained without them can not be resumed with them
+    use_action_masking = False  # MaskablePPO (sb3-contrib) with env.action_masks(), a PPO model can not be resumed as MaskablePPO
+    id_observations = False  # pokemon/move ids + trainable embedding layers instead of fixed PCA embeddings, not resumable across modes
+    trajectory_dir = None  # e.g. "trajectories": record scenes, observations, actions and rewards for offline use (trajectory_store.py)
+    simulated = False  # headless battle simulator instead of the browser (Environment/v2PLUS/battle_simulator.py), same spaces and reward
 
     logger.info("Creating environment...")
-    env = PokeRogueEnv()
-    logger.info("Environment created successfully!")
+    if simulated:
+        env = make_simulated_vec_env(n_envs, seed=seed, type_effectiveness=type_effectiveness, id_observations=id_observations,
+                                     trajectory_dir=trajectory_dir)
+    elif n_envs > 1:
+        env = make_vec_env(n_envs, seed=seed, turbo=turbo, type_effectiveness=type_effectiveness, id_observations=id_observations,
+                           trajectory_dir=trajectory_dir)
+    else:
+        env = PokeRogueEnv(turbo=turbo, type_effectiveness=type_effectiveness, id_observations=id_observations,
+                           trajectory_dir=trajectory_dir)
+    logger.info(f"Environment created successfully! ({n_envs} worker(s))")
 
     # Load model OR create new one
-    model = load_or_create_model(env, learning_rate)
+    model = load_or_create_model(env, learning_rate, n_envs, use_action_masking, id_observations)
 
     # Setup callback
+    checkpoint_manager = CheckpointManager("models", keep_last=keep_last_checkpoints, keep_best=keep_best_checkpoints)
     checkpoint_callback = SaveCheckpointCallback(
         save_freq=save_interval,
-        save_path="models"
+        manager=checkpoint_manager
     )
 
     logger.info(f"Training for {total_timesteps} timesteps...")
@@ -117,24 +157,19 @@ def main():
     except KeyboardInterrupt:
         logger.warning("Training interrupted manually.")
 
-    # Save final & overwrite latest_model.zip for auto-resume
-    model_name = f"pokerogue_ppo_final_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    final_model_path = f"models/{model_name}"
-    model.save(final_model_path)
-    model.save("models/latest_model")  # auto-resume target
+    # Save final & overwrite latest_model.zip for auto-resume, waits for the checkpoints still being written
+    checkpoint_manager.save(model, model.num_timesteps, checkpoint_callback.mean_wave())
+    checkpoint_manager.close()
 
-    logger.info(f"Final model saved: {final_model_path}")
+    logger.info(f"Final model saved: models/checkpoint_{model.num_timesteps}.zip")
     logger.info("Saved as latest_model.zip for quick resume")
+    if checkpoint_manager.best_path is not None:
+        logger.info(f"Best checkpoint (mean wave): {checkpoint_manager.best_path}")
 
-    logger.info("Collecting environment info...")
-
-    # Zugriff auf die gespeicherten Daten
-    all_infos = env.all_infos
-    logger.info(f"Collected {len(all_infos)} episodes of data.")
-    with open(f"logs\\{model_name}_info.json", "w") as f:
-        json.dump(all_infos, f, indent=2)
-
-    logger.info("Saved training info to logs/full_training_info.json")
+    # the per-step infos were streamed to logs/telemetry during training (telemetry.py)
+    logger.info(f"Telemetry written to {TELEMETRY_DIR}")
+    if trajectory_dir is not None:
+        logger.info(f"Trajectories written to {trajectory_dir}")
 
     env.close()
     logger.info("Environment closed.")
@@ -1,8 +1,33 @@
-import matplotlib.pyplot as plt
+"""
+Plots of the training telemetry (telemetry.py, logs/telemetry/*.jsonl).
+
+Live dashboard: follows the JSONL files like "tail -f", every refresh only reads the lines that were appended since
+the last one (file offsets are remembered, also in a state file, so a restarted dashboard continues where it stopped).
+All aggregates are bounded, a refresh costs the same after 10 minutes and after 10 million steps.
+
+    python training_plotter.py                       # matplotlib window, refreshed every 5 s
+    python training_plotter.py --html logs/dashboard.html   # self-refreshing html page instead
+"""
+import argparse
+import base64
+import glob
+import io
+import itertools
 import json
+import os
+import time
+from collections import deque
+
+import matplotlib.pyplot as plt
+
+from telemetry import TELEMETRY_DIR
+
+STATE_NAME = "dashboard_state.json"
+RATE_WINDOW = 60  # seconds for steps/sec
 
 
 def plot_results(data):
+    """old format: list of episodes, each a list of step infos (json dump of PokeRogueEnv.all_infos)"""
     episode_rewards = [sum(step["reward"] for step in ep) for ep in data]
 
     plt.plot(episode_rewards)
@@ -12,8 +37,190 @@ def plot_results(data):
     plt.show()
 
 
+class TelemetryTail:
+    """Reads the records that were appended to the telemetry files since the last poll"""
+
+    def __init__(self, directory: str = TELEMETRY_DIR, offsets: dict = None):
+        self.directory = directory
+        self.offsets = offsets if offsets is not None else {}  # file name -> byte offset of the first unread line
+
+    def poll(self) -> list:
+        records = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl"))):
+            name = os.path.basename(path)
+            offset = self.offsets.get(name, 0)
+            if os.path.getsize(path) <= offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+            # a line that is still being written stays for the next poll
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # cut-off line of a crashed writer
+            self.offsets[name] = offset + end
+        return records
+
+
+class RollingStats:
+    """Aggregates over the telemetry records, memory bounded by max_episodes"""
+
+    def __init__(self, max_episodes: int = 2000):
+        self.episodes = deque(maxlen=max_episodes)  # (reward, max wave) of finished episodes
+        self.running = {}  # worker -> {"episode_index", "reward", "max_wave"}
+        self.phase_time = {}  # phase -> [seconds, steps]
+        self.steps_per_second_bucket = {}  # int(record time) -> steps, only the last RATE_WINDOW seconds
+        self.total_steps = 0
+        self.max_wave = 0
+
+    def add(self, record: dict):
+        self.total_steps += 1
+        worker = str(record.get("worker", 0))
+        wave = record.get("stage") or 0
+        self.max_wave = max(self.max_wave, wave)
+        episode = self.running.get(worker)
+        if episode is not None and episode["episode_index"] != record.get("episode_index"):
+            self._finish(worker)  # new episode without terminated (truncated or worker restart)
+            episode = None
+        if episode is None:
+            episode = self.running[worker] = {"episode_index": record.get("episode_index"), "reward": 0.0, "max_wave": 0}
+        episode["reward"] += record.get("reward", 0.0)
+        episode["max_wave"] = max(episode["max_wave"], wave)
+        if record.get("terminated"):
+            self._finish(worker)
+
+        phase = self.phase_time.setdefault(record.get("phase") or "UNKNOWN", [0.0, 0])
+        phase[0] += record.get("step_latency", 0.0)
+        phase[1] += 1
+        if "time" in record:
+            second = int(record["time"])
+            self.steps_per_second_bucket[second] = self.steps_per_second_bucket.get(second, 0) + 1
+
+    def _finish(self, worker: str):
+        episode = self.running.pop(worker)
+        self.episodes.append((episode["reward"], episode["max_wave"]))
+
+    def steps_per_second(self) -> float:
+        if not self.steps_per_second_bucket:
+            return 0.0
+        newest = max(self.steps_per_second_bucket)
+        for second in [second for second in self.steps_per_second_bucket if second <= newest - RATE_WINDOW]:
+            del self.steps_per_second_bucket[second]
+        return sum(self.steps_per_second_bucket.values()) / RATE_WINDOW
+
+    def to_dict(self) -> dict:
+        return {"episodes": list(self.episodes), "running": self.running, "phase_time": self.phase_time,
+                "total_steps": self.total_steps, "max_wave": self.max_wave}
+
+    @classmethod
+    def from_dict(cls, data: dict, max_episodes: int = 2000):
+        stats = cls(max_episodes)
+        stats.episodes.extend(tuple(episode) for episode in data["episodes"])
+        stats.running = data["running"]
+        stats.phase_time = data["phase_time"]
+        stats.total_steps = data["total_steps"]
+        stats.max_wave = data["max_wave"]
+        return stats
+
+
+class Dashboard:
+    def __init__(self, directory: str = TELEMETRY_DIR, state_path: str = None, rolling: int = 50):
+        """
+        :param state_path: offsets + aggregates are saved there after every refresh, None = directory/dashboard_state.json
+        :param rolling: episodes in the rolling mean
+        """
+        self.state_path = state_path or os.path.join(directory, STATE_NAME)
+        self.rolling = rolling
+        offsets = None
+        self.stats = RollingStats()
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                state = json.loads(f.read())
+            offsets = state["offsets"]
+            self.stats = RollingStats.from_dict(state["stats"])
+        self.tail = TelemetryTail(directory, offsets)
+        self.figure = None
+
+    def update(self) -> int:
+        """reads the new records, :return: their number"""
+        records = self.tail.poll()
+        for record in records:
+            self.stats.add(record)
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump({"offsets": self.tail.offsets, "stats": self.stats.to_dict()}, f)
+        os.replace(self.state_path + ".tmp", self.state_path)
+        return len(records)
+
+    def draw(self):
+        if self.figure is None:
+            self.figure, self.axes = plt.subplots(2, 2, figsize=(12, 8))
+        stats = self.stats
+        rewards = [reward for reward, _ in stats.episodes]
+        waves = [wave for _, wave in stats.episodes]
+        for axis in self.axes.flat:
+            axis.clear()
+
+        axis = self.axes[0, 0]
+        axis.plot(rewards, alpha=0.4, label="episode")
+        if len(rewards) >= self.rolling:
+            sums = [0.0] + list(itertools.accumulate(rewards))
+            window = [(sums[i] - sums[i - self.rolling]) / self.rolling for i in range(self.rolling, len(rewards) + 1)]
+            axis.plot(range(self.rolling - 1, len(rewards)), window, label=f"mean of {self.rolling}")
+        axis.set_title("Episode Total Reward")
+        axis.set_xlabel(f"Episode (last {stats.episodes.maxlen})")
+        axis.legend()
+
+        axis = self.axes[0, 1]
+        axis.plot(waves)
+        axis.set_title(f"Max Wave per Episode (best: {stats.max_wave})")
+
+        axis = self.axes[1, 0]
+        phases = sorted(stats.phase_time.items(), key=lambda item: -item[1][0])[:10]
+        axis.barh([name for name, _ in phases], [seconds for _, (seconds, _) in phases])
+        axis.set_title("Step Time per Phase [s]")
+
+        axis = self.axes[1, 1]
+        axis.axis("off")
+        axis.text(0.0, 0.5, f"steps: {stats.total_steps}\nsteps/sec (last {RATE_WINDOW}s): {stats.steps_per_second():.2f}\n"
+                            f"episodes: {len(stats.episodes)}\nrunning workers: {len(stats.running)}", fontsize=14)
+        self.figure.tight_layout()
+
+    def write_html(self, path: str, refresh: float):
+        self.draw()
+        image = io.BytesIO()
+        self.figure.savefig(image, format="png")
+        html = (f'<html><head><meta http-equiv="refresh" content="{int(refresh)}"><title>PokeRogue Training</title></head>'
+                f'<body><img src="data:image/png;base64,{base64.b64encode(image.getvalue()).decode()}"></body></html>')
+        with open(path + ".tmp", "w") as f:
+            f.write(html)
+        os.replace(path + ".tmp", path)
+
+    def run(self, refresh: float = 5.0, html_path: str = None):
+        if html_path is None:
+            plt.ion()
+        while True:
+            start = time.perf_counter()
+            new_records = self.update()
+            if html_path is not None:
+                self.write_html(html_path, refresh)
+            else:
+                self.draw()
+                plt.pause(0.01)
+                if not plt.fignum_exists(self.figure.number):
+                    return  # window closed
+            print(f"{new_records} new records, refresh took {(time.perf_counter() - start) * 1000:.0f} ms")
+            time.sleep(max(0.0, refresh - (time.perf_counter() - start)))
+
+
 if __name__ == "__main__":
-    info_file = r"logs/abc.json"
-    with open(info_file, "r") as f:
-        data = json.load(f)
-    plot_results(data)
+    parser = argparse.ArgumentParser(description="Live dashboard over the training telemetry")
+    parser.add_argument("--dir", default=TELEMETRY_DIR)
+    parser.add_argument("--refresh", type=float, default=5.0, help="seconds between refreshes")
+    parser.add_argument("--html", default=None, help="write a self-refreshing html page instead of opening a window")
+    args = parser.parse_args()
+    if args.html is not None:
+        plt.switch_backend("Agg")
+    Dashboard(args.dir).run(args.refresh, args.html)
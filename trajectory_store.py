@@ -0,0 +1,206 @@
+"""
+Recording of everything the env saw and did: raw __GLOBAL_SCENE_DATA__ dicts, encoded observations, actions and rewards.
+With it history can be re-encoded with a new encoder, analysed or used for offline RL without replaying the browser.
+
+One folder per env instance (trajectories/w<worker>_<start>/), written in chunks of chunk_size rows:
+- chunk_<n>.npy: structured array, one row per recorded scene (ROW_FIELDS + the observation), memory-mapped by the reader
+- chunk_<n>.scenes: the scene dicts, each one zlib-compressed json on its own, row["scene_offset"/"scene_size"] point into it
+- meta.json: obs_size, worker, chunk size
+
+Row kinds: KIND_RESET (scene after reset), KIND_STEP (scene after an agent action, with action and reward) and
+KIND_PHASE (scene of a phase phase_handler played through on its own, e.g. shop or switch).
+
+    reader = TrajectoryReader("trajectories/w0_20250101_120000")
+    reader.episodes()                      # [0, 1, ...]
+    row = reader.row(episode=1, index=5)   # numpy record: kind, step, action, reward, obs, ...
+    scene = reader.scene(1, 5)             # the raw scene dict
+"""
+import atexit
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+TRAJECTORY_DIR = "trajectories"
+CHUNK_SIZE = 1024
+
+KIND_RESET = 0
+KIND_STEP = 1
+KIND_PHASE = 2
+
+ACTION_SIZE = 4  # MultiDiscrete([4, 2, 4, 2])
+ROW_FIELDS = [("kind", np.uint8), ("episode", np.int32), ("step", np.int32), ("wave", np.int32), ("action", np.int16, (ACTION_SIZE,)),
+              ("reward", np.float32), ("terminated", np.bool_), ("time", np.float64), ("scene_offset", np.int64), ("scene_size", np.int32)]
+
+
+def row_dtype(obs_size: int) -> np.dtype:
+    return np.dtype(ROW_FIELDS + [("obs", np.float32, (obs_size,))])
+
+
+def compress_scene(scene) -> bytes:
+    return zlib.compress(json.dumps(scene, separators=(",", ":")).encode(), 6)
+
+
+def decompress_scene(data: bytes):
+    return json.loads(zlib.decompress(data))
+
+
+class TrajectoryRecorder:
+    def __init__(self, obs_size: int, directory: str = TRAJECTORY_DIR, worker_id: int = 0, chunk_size: int = CHUNK_SIZE):
+        """:param directory: parent folder, the recording gets its own subfolder"""
+        self.obs_size = obs_size
+        self.chunk_size = chunk_size
+        self.path = os.path.join(directory, f"w{worker_id}_{time.strftime('%Y%m%d_%H%M%S')}")
+        suffix = 1
+        while os.path.exists(self.path):  # restarted worker within the same second
+            self.path = os.path.join(directory, f"w{worker_id}_{time.strftime('%Y%m%d_%H%M%S')}_{suffix}")
+            suffix += 1
+        os.makedirs(self.path)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"obs_size": obs_size, "worker": worker_id, "chunk_size": chunk_size}, f)
+        self.episode = -1  # phases before the first reset
+        self.step = 0
+        self.chunk = 0
+        self._rows = np.zeros(chunk_size, dtype=row_dtype(obs_size))
+        self._count = 0
+        self._scenes = []
+        self._scene_bytes = 0
+        self._closed = False
+        atexit.register(self.close)
+
+    def _record(self, kind: int, scene, obs, action=None, reward: float = 0.0, terminated: bool = False):
+        row = self._rows[self._count]
+        row["kind"] = kind
+        row["episode"] = self.episode
+        row["step"] = self.step
+        row["wave"] = scene["metaData"]["waveIndex"] if isinstance(scene, dict) and "metaData" in scene else -1
+        row["action"] = action if action is not None else -1
+        row["reward"] = reward
+        row["terminated"] = terminated
+        row["time"] = time.time()
+        data = compress_scene(scene)
+        row["scene_offset"] = self._scene_bytes
+        row["scene_size"] = len(data)
+        self._scenes.append(data)
+        self._scene_bytes += len(data)
+        obs = np.asarray(obs, dtype=np.float32)
+        if obs.shape == (self.obs_size,):
+            row["obs"] = obs  # else (no observation, e.g. after a failed read) the obs stays zeros
+        self._count += 1
+        if self._count == self.chunk_size:
+            self.flush()
+
+    def start_episode(self, scene, obs):
+        self.episode += 1
+        self.step = 0
+        self._record(KIND_RESET, scene, obs)
+
+    def record_step(self, scene, obs, action, reward: float, terminated: bool):
+        self.step += 1
+        self._record(KIND_STEP, scene, obs, action, reward, terminated)
+
+    def record_phase(self, scene, obs):
+        self._record(KIND_PHASE, scene, obs)
+
+    def flush(self):
+        """writes the rows collected so far as the next chunk"""
+        if self._count == 0:
+            return
+        base = os.path.join(self.path, f"chunk_{self.chunk:05d}")
+        with open(base + ".scenes.tmp", "wb") as f:
+            f.write(b"".join(self._scenes))
+        os.replace(base + ".scenes.tmp", base + ".scenes")
+        # the .npy last, a chunk without .npy is ignored by the reader
+        with open(base + ".npy.tmp", "wb") as f:
+            np.save(f, self._rows[:self._count])
+        os.replace(base + ".npy.tmp", base + ".npy")
+        self.chunk += 1
+        self._count = 0
+        self._scenes = []
+        self._scene_bytes = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        atexit.unregister(self.close)
+
+
+class TrajectoryReader:
+    def __init__(self, path: str):
+        """:param path: folder of one recording (TrajectoryRecorder.path)"""
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.loads(f.read())
+        names = sorted(name[:-len(".npy")] for name in os.listdir(path) if name.startswith("chunk_") and name.endswith(".npy"))
+        self.chunks = [np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in names]
+        self._scene_paths = [os.path.join(path, name + ".scenes") for name in names]
+        self._scene_files = [None] * len(names)
+        # episode -> (chunk, row) of all its rows, only the small episode column is read for that
+        self.index = {}
+        for chunk_index, chunk in enumerate(self.chunks):
+            episodes = np.asarray(chunk["episode"])
+            for episode in np.unique(episodes).tolist():
+                rows = np.nonzero(episodes == episode)[0]
+                self.index.setdefault(episode, []).extend((chunk_index, int(row)) for row in rows)
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def episodes(self) -> list:
+        return sorted(self.index)
+
+    def episode_length(self, episode: int) -> int:
+        return len(self.index[episode])
+
+    def row(self, episode: int, index: int):
+        """index-th recorded row of the episode (reset, steps and phases in recording order)"""
+        chunk, row = self.index[episode][index]
+        return self.chunks[chunk][row]
+
+    def scene(self, episode: int, index: int):
+        chunk, row = self.index[episode][index]
+        record = self.chunks[chunk][row]
+        if self._scene_files[chunk] is None:
+            self._scene_files[chunk] = open(self._scene_paths[chunk], "rb")
+        scene_file = self._scene_files[chunk]
+        scene_file.seek(int(record["scene_offset"]))
+        return decompress_scene(scene_file.read(int(record["scene_size"])))
+
+    def episode_rows(self, episode: int) -> np.ndarray:
+        """all rows of the episode as one array (copy)"""
+        return np.concatenate([self.chunks[chunk][[row]] for chunk, row in self.index[episode]]) if episode in self.index else None
+
+    def steps(self, episode: int) -> np.ndarray:
+        """only the agent steps of the episode, e.g. for offline RL: obs, action, reward, terminated"""
+        rows = self.episode_rows(episode)
+        return rows[rows["kind"] == KIND_STEP]
+
+    def reencode(self, encoder, episode: int, kinds: tuple = (KIND_RESET, KIND_STEP)) -> np.ndarray:
+        """
+        Observations of an episode built again from the raw scenes with another encoder (e.g. after a layout change).
+        :param encoder: ObservationEncoder (or subclass) with the new settings
+        :return: (rows, encoder.obs_size)
+        """
+        observations = []
+        for index in range(self.episode_length(episode)):
+            if self.row(episode, index)["kind"] in kinds:
+                observations.append(encoder.encode(self.scene(episode, index), out=np.empty(encoder.obs_size, dtype=np.float32))[0])
+        return np.array(observations, dtype=np.float32).reshape(-1, encoder.obs_size)
+
+    def close(self):
+        for scene_file in self._scene_files:
+            if scene_file is not None:
+                scene_file.close()
+        self._scene_files = [None] * len(self._scene_files)
+
+
+def recordings(directory: str = TRAJECTORY_DIR) -> list:
+    """folders of all recordings in directory, oldest first"""
+    if not os.path.exists(directory):
+        return []
+    return sorted((os.path.join(directory, name) for name in os.listdir(directory) if os.path.exists(os.path.join(directory, name, "meta.json"))),
+                  key=os.path.getmtime)